@@ -19,6 +19,36 @@ behaviors
 
 swarm
     Allow the creation of simple virtual swarms.
+
+batched
+    All-pairs counterparts of the behaviors, evaluated for the whole swarm at once.
+
+graph
+    Consensus behaviors over sparse communication graphs.
+
+regions
+    Regions with exact gradients for the geofencing behaviors.
+
+geometry
+    Per-step cache of the displacements and distances between the robots.
+
+neighbors
+    Neighbor queries (cell lists, k nearest) restricting the behaviors to nearby robots.
+
+tree
+    Barnes-Hut approximation of the long-range behaviors.
+
+state
+    Structure-of-arrays state of a swarm, updated in place.
+
+sweep
+    Parameter sweeps of a swarm on a pool of processes.
+
+trajectory
+    Sinks storing the poses of a swarm while it is stepped.
+
+jit
+    Optional Numba-compiled kernels of the branchy batched behaviors.
 """
 
 import os
@@ -27,10 +57,23 @@ import sys
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
 # To get sub-modules
+from . import regions
+from . import geometry
+from . import neighbors
+from . import tree
+from . import jit
+from . import state
+from . import trajectory
 from . import behaviors
 from . import swarm
+from . import batched
+from . import graph
+from . import sweep
 
-modules = [behaviors.__all__.copy(), swarm.__all__.copy()]
+modules = [behaviors.__all__.copy(), swarm.__all__.copy(), batched.__all__.copy(),
+           graph.__all__.copy(), regions.__all__.copy(), geometry.__all__.copy(),
+           neighbors.__all__.copy(), tree.__all__.copy(), jit.__all__.copy(),
+           state.__all__.copy(), trajectory.__all__.copy(), sweep.__all__.copy()]
 
 __all__ = []
 for module_i in modules:
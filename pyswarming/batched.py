@@ -0,0 +1,1267 @@
+"""
+``pyswarming.batched``
+========================
+
+The PySwarming batched functions are all-pairs counterparts of the behaviors
+in ``pyswarming.behaviors``. Instead of one robot ``r_i`` and its neighborhood
+``r_j``, they take the positions of the whole swarm and return the contribution
+of every robot in one vectorized call. The functions in ``pyswarming.behaviors``
+remain the reference implementation, the neighborhood of robot i being all the
+other robots (i.e. ``np.delete(r, i, axis=0)``).
+
+The displacements and distances between the robots are taken from a
+``pyswarming.geometry.Geometry`` cache, which can be computed once per step
+and passed to several behaviors through ``geometry=``. A geometry built on
+sparse neighborhoods (e.g. ``pyswarming.neighbors.cell_list`` or
+``pyswarming.neighbors.nearest``) restricts every behavior to those
+neighbors, the averages being taken over the neighbors and a robot without
+neighbors getting no neighbor contribution.
+
+Functions present in pyswarming.batched are listed below.
+
+Batched Behaviors
+-----------------
+
+    leaderless_heading_consensus
+    inverse_power
+    spring
+    force_law
+    repulsive_force
+    body_force
+    inter_robot_spacing
+    leader_following
+    collision_avoidance
+    lennard_jones
+    heading_consensus
+    perimeter_defense
+    environment_exploration
+    aggregation
+    alignment
+    geofencing
+    repulsion
+    target
+
+Combined Behaviors
+------------------
+
+   area_coverage = geofencing + repulsion
+   collective_navigation = target + repulsion
+   flocking = aggregation + repulsion + alignment
+
+Force Engine
+------------
+
+   pairwise_forces = any combination of inverse_power, spring, force_law,
+   repulsive_force, body_force, inter_robot_spacing and lennard_jones
+
+Tiled Evaluation
+----------------
+
+   tiled = any batched behavior taking geometry=, evaluated block of
+   robots by block of robots with bounded memory
+
+Consensus
+---------
+
+   consensus = leaderless_heading_consensus, heading_consensus
+   or leader_following of all the robots
+
+Backends
+--------
+
+   set_backend, get_backend = 'numpy' (default) or 'numba', the
+   compiled kernels of pyswarming.jit for body_force, lennard_jones
+   and environment_exploration
+"""
+
+__all__ = ['leaderless_heading_consensus', 'inverse_power', 'spring', 'force_law',
+           'repulsive_force', 'body_force', 'inter_robot_spacing', 'leader_following',
+           'collision_avoidance', 'lennard_jones', 'heading_consensus',
+           'perimeter_defense', 'environment_exploration', 'aggregation', 'alignment',
+           'geofencing', 'repulsion', 'target', 'area_coverage', 'collective_navigation',
+           'flocking', 'pairwise_forces', 'tiled', 'consensus', 'set_backend', 'get_backend']
+
+import numpy as np
+
+import regions as rg
+import geometry as gm
+import jit as jt
+
+_BACKENDS = ('numpy', 'numba')
+_BACKEND = 'numpy'
+
+
+def set_backend(backend):
+    """
+    Selects the implementation of the behaviors having compiled kernels
+    (body_force, lennard_jones and environment_exploration).
+
+    Parameters
+    ----------
+    backend : str
+        'numpy' (default) for the vectorized implementation or 'numba'
+        for the compiled loops of pyswarming.jit, which need numba.
+    """
+
+    global _BACKEND
+
+    _BACKEND = _backend(backend)
+
+
+def get_backend():
+    """
+    Returns the backend selected with set_backend.
+
+    Returns
+    -------
+    backend : str
+        'numpy' or 'numba'
+    """
+
+    return _BACKEND
+
+
+def _backend(backend=None):
+    """
+    Returns the backend of a call, the selected one when it is not given,
+    checking that it is known and available.
+    """
+
+    if backend is None:
+        return _BACKEND
+
+    if backend not in _BACKENDS:
+        raise Exception("The backend must be 'numpy' or 'numba'.")
+
+    if backend == 'numba' and not jt.available:
+        raise Exception("The numba backend requires numba (pip install numba).")
+
+    return backend
+
+
+def _geometry(r, geometry=None):
+    """
+    Returns the geometry cache of the step, computing it from r
+    when it is not given.
+    """
+
+    if geometry is None:
+        geometry = gm.Geometry(r)
+
+    return geometry
+
+
+def _per_robot(value, n):
+    """
+    Returns a scalar or a per-robot coefficient as an array of shape (n,).
+    """
+
+    return np.broadcast_to(np.asarray(value, dtype=float), (n,))
+
+
+def _per_pair(value, index):
+    """
+    Returns a scalar or a per-robot coefficient for each pair, given the
+    robot index (i or j) of the pairs. Scalars are returned unchanged.
+    """
+
+    value = np.asarray(value, dtype=float)
+
+    if value.ndim == 0:
+        return value
+
+    return value[index]
+
+
+def _inverse_power(geometry, c_w, sigma_w):
+
+    c_w = np.asarray(c_w, dtype=float)
+    sigma_w = np.asarray(sigma_w, dtype=float)
+
+    f_0 = np.zeros(geometry.norm_r_ij.shape)
+
+    for w in range(c_w.shape[-1]):
+        c = _per_pair(c_w[..., w], geometry.i)
+        sigma = _per_pair(sigma_w[..., w], geometry.i)
+        if sigma.ndim == 0:
+            f_0 += c * geometry.inv_power(float(sigma))
+        else:
+            f_0 += c / np.power(geometry.norm_r_ij, sigma)
+
+    # as in the reference implementation, the magnitude
+    # accumulates over the neighbors in index order
+    f_0 = geometry.cumsum(f_0)
+
+    return geometry.sum(f_0[:, np.newaxis] * geometry.unit)
+
+
+def _spring(geometry, k, l):
+
+    k = _per_pair(k, geometry.i)
+    l = _per_pair(l, geometry.i)
+
+    magnitude = k * (geometry.norm_r_ij - l)
+
+    return geometry.sum(magnitude[:, np.newaxis] * geometry.unit)
+
+
+def _force_law(geometry, G, m, p):
+
+    G = _per_pair(G, geometry.i)
+    p = _per_pair(p, geometry.i)
+
+    if p.ndim == 0:
+        inv_norm = geometry.inv_power(float(p))
+    else:
+        inv_norm = 1.0 / np.power(geometry.norm_r_ij, p)
+
+    # the reference implementation adds the scalar law to every component
+    magnitude = geometry.sum(G * _per_pair(m, geometry.i) * _per_pair(m, geometry.j) * inv_norm)
+
+    return np.repeat(magnitude[:, np.newaxis], 3, axis=1)
+
+
+def _repulsive_force(geometry, A, B, R):
+
+    A = _per_pair(A, geometry.i)
+    B = _per_pair(B, geometry.i)
+
+    R_ij = _per_pair(R, geometry.i) + _per_pair(R, geometry.j)
+
+    magnitude = A * np.exp((R_ij + geometry.norm_r_ij) / B)
+
+    return geometry.sum(magnitude[:, np.newaxis] * geometry.unit)
+
+
+def _body_force(geometry, Lambda, R):
+
+    Lambda = _per_pair(Lambda, geometry.i)
+
+    R_ij = _per_pair(R, geometry.i) + _per_pair(R, geometry.j)
+
+    h = np.where(geometry.norm_r_ij > R_ij, 0.0, R_ij + geometry.norm_r_ij)
+
+    return geometry.sum((Lambda * h)[:, np.newaxis] * geometry.unit)
+
+
+def _inter_robot_spacing(geometry, alpha, d_0):
+
+    alpha = _per_pair(alpha, geometry.i)
+    d_0 = _per_pair(d_0, geometry.i)
+
+    magnitude = alpha * (geometry.inv_power(1.0) - d_0 * geometry.inv_power(2.0))
+
+    return geometry.sum(magnitude[:, np.newaxis] * geometry.unit)
+
+
+def _lennard_jones(geometry, epsilon, sigma, normalized=False):
+
+    r_ij = geometry.r_ij
+
+    epsilon = _per_pair(epsilon, geometry.i)
+    sigma = _per_pair(sigma, geometry.i)
+
+    if epsilon.ndim == 1:
+        epsilon = epsilon[:, np.newaxis]
+    if sigma.ndim == 1:
+        sigma = sigma[:, np.newaxis]
+
+    # as in the reference implementation, the law is applied to each component
+    f = ((12.0*epsilon)/r_ij) * (np.power(sigma/r_ij, 12) - np.power(sigma/r_ij, 6))
+
+    if normalized == True:
+        f = f * geometry.unit
+
+    return geometry.mean(f)
+
+
+_FORCE_LAWS = {'inverse_power': _inverse_power,
+               'spring': _spring,
+               'force_law': _force_law,
+               'repulsive_force': _repulsive_force,
+               'body_force': _body_force,
+               'inter_robot_spacing': _inter_robot_spacing,
+               'lennard_jones': _lennard_jones}
+
+
+def leaderless_heading_consensus(theta):
+    """
+    Calculate the new heading of every robot based on
+    the "leaderless heading consensus algorithm"
+
+    Parameters
+    ----------
+    theta : numpy.array
+        array must have the orientations of all the robots
+        in euler angles (i.e. np.asarray([[roll1, pitch1, yaw1],
+        [roll2, pitch2, yaw2], ..., [rollN, pitchN, yawN]])).
+
+    Returns
+    -------
+    new_theta : numpy.array
+        array containing the new heading of each robot
+    """
+
+    return consensus(theta)
+
+
+def inverse_power(r, c_w, sigma_w, geometry=None):
+    """
+    Calculates the output force of every robot based on
+    the "inverse-power force laws algorithm".
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    c_w : numpy.array
+        coefficients that depends on w. Where w is the
+        number of inverse-power laws. An array of shape
+        (N, w) gives different coefficients to each robot.
+
+    sigma_w : numpy.array
+        the inverse power coefficients (sigma_w>0)
+        that depends on w, with the same shape as c_w.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the force of each robot
+    """
+
+    return _inverse_power(_geometry(r, geometry), c_w, sigma_w)
+
+
+def spring(r, k, l, geometry=None):
+    """
+    Calculates the output force of every robot based on
+    the "spring laws algorithm".
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    k : float or numpy.array
+        spring constant (k > 0), a scalar or one per robot.
+
+    l : float or numpy.array
+        desired distance between the robots, a scalar or
+        one per robot.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the force of each robot
+    """
+
+    return _spring(_geometry(r, geometry), k, l)
+
+
+def force_law(r, G, m, p, geometry=None):
+    """
+    Calculates the output force of every robot based on
+    the "force law algorithm".
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    G : float or numpy.array
+        coefficient that acts like a gravitational
+        constant, a scalar or one per robot.
+
+    m : float or numpy.array
+        masses of the robots, a scalar or one per robot.
+
+    p : float or numpy.array
+        user-defined power, a scalar or one per robot.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the force of each robot
+    """
+
+    return _force_law(_geometry(r, geometry), G, m, p)
+
+
+def repulsive_force(r, A, B, R, geometry=None):
+    """
+    Calculates the output force of every robot based on
+    the "repulsive force algorithm".
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    A : float or numpy.array
+        user-defined coefficient, a scalar or one per robot.
+
+    B : float or numpy.array
+        user-defined coefficient, a scalar or one per robot.
+
+    R : float or numpy.array
+        radii of the robots, a scalar or one per robot.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the force of each robot
+    """
+
+    return _repulsive_force(_geometry(r, geometry), A, B, R)
+
+
+def body_force(r, Lambda, R, geometry=None, backend=None):
+    """
+    Calculates the output force of every robot based on
+    the "body force algorithm".
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    Lambda : float or numpy.array
+        user-defined coefficient, a scalar or one per robot.
+
+    R : float or numpy.array
+        radii of the robots, a scalar or one per robot.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    backend : str
+        'numpy' or 'numba', the backend selected with set_backend
+        by default.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the force of each robot
+    """
+
+    if _backend(backend) == 'numba':
+        return jt.body_force(r, Lambda, R, geometry)
+
+    return _body_force(_geometry(r, geometry), Lambda, R)
+
+
+def inter_robot_spacing(r, alpha, d_0, geometry=None):
+    """
+    Calculates the output force of every robot based on
+    the "inter-robot spacing algorithm".
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    alpha : float or numpy.array
+        user-defined coefficient, a scalar or one per robot.
+
+    d_0 : float or numpy.array
+        user-defined coefficient, a scalar or one per robot.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the force of each robot
+    """
+
+    return _inter_robot_spacing(_geometry(r, geometry), alpha, d_0)
+
+
+def leader_following(theta, theta_0, b):
+    """
+    Calculate the new heading of every robot based on
+    the "leader following algorithm"
+
+    Parameters
+    ----------
+    theta : numpy.array
+        array must have the orientations of all the robots
+        in euler angles (i.e. np.asarray([[roll1, pitch1, yaw1],
+        [roll2, pitch2, yaw2], ..., [rollN, pitchN, yawN]])).
+
+    theta_0 : numpy.array
+        array must have the leader robot orientation in euler
+        angles (i.e. np.asarray([roll, pitch, yaw])).
+
+    b : integer or numpy.array
+        leader mask, one value per robot, where the value is 1 if
+        the leader robot is a neighbor of the robot, and 0 otherwise.
+
+    Returns
+    -------
+    new_theta : numpy.array
+        array containing the new heading of each robot
+    """
+
+    return consensus(theta, theta_0, b)
+
+
+def collision_avoidance(r, geometry=None):
+    """
+    Calculate the desired heading of every robot
+    based on the "collision avoidance algorithm"
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    new_theta : numpy.array
+        array containing the new heading of each robot
+    """
+
+    geometry = _geometry(r, geometry)
+
+    new_theta = - geometry.sum(geometry.unit)
+
+    return new_theta
+
+
+def lennard_jones(r, epsilon, sigma, normalized=False, geometry=None, backend=None):
+    """
+    Calculates the output force of every robot that produces
+    lattice formations, based on the "Lennard-Jones
+    potential algorithm"
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    epsilon : float or numpy.array
+        depth of the potential well, a scalar or one per robot.
+
+    sigma : float or numpy.array
+        desired distance between the robots, a scalar or
+        one per robot.
+
+    normalized : boolean
+        boolean parameter to normalize each
+        term in the sum when normalized = True.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    backend : str
+        'numpy' or 'numba', the backend selected with set_backend
+        by default.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the force of each robot
+    """
+
+    if _backend(backend) == 'numba':
+        return jt.lennard_jones(r, epsilon, sigma, normalized, geometry)
+
+    return _lennard_jones(_geometry(r, geometry), epsilon, sigma, normalized)
+
+
+def heading_consensus(theta):
+    """
+    Calculate the new heading of every robot based on
+    the "heading consensus algorithm"
+
+    Parameters
+    ----------
+    theta : numpy.array
+        array must have the orientations of all the robots
+        in euler angles (i.e. np.asarray([[roll1, pitch1, yaw1],
+        [roll2, pitch2, yaw2], ..., [rollN, pitchN, yawN]])).
+
+    Returns
+    -------
+    new_theta : numpy.array
+        array containing the new heading of each robot
+    """
+
+    return consensus(theta)
+
+
+def perimeter_defense(r, geometry=None):
+    """
+    Calculate the new "heading" of every robot
+    based on the "perimeter defense algorithm"
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    g : numpy.array
+        array containing g_i of each robot
+    """
+
+    geometry = _geometry(r, geometry)
+
+    g = geometry.sum(geometry.inv_power(1.0)[:, np.newaxis] * geometry.unit)
+
+    return g
+
+
+def environment_exploration(r, theta, H, T, r_0, geometry=None, backend=None):
+    """
+    Calculate the new velocity of every robot
+    based on the "environment exploration algorithm"
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    theta : numpy.array
+        array must have the orientations of all the robots
+        in euler angles (i.e. np.asarray([[roll1, pitch1, yaw1],
+        [roll2, pitch2, yaw2], ..., [rollN, pitchN, yawN]])).
+
+    H : integer or numpy.array
+        binary heading consensus weight, being toward a goal (H_i = 1)
+        or with reference to the others robots (H_i = 0), a scalar or
+        one per robot.
+
+    T : numpy.array
+        array must have the target (goal) position in
+        cartesian coordinates (i.e. np.asarray([x, y, z])).
+
+    r_0 : float or numpy.array
+        reference distance between the robots to create
+        a set of robots within this range, a scalar or one per robot.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    backend : str
+        'numpy' or 'numba', the backend selected with set_backend
+        by default.
+
+    Returns
+    -------
+    v : numpy.array
+        array containing the new velocity of each robot
+    """
+
+    r = np.asarray(r, dtype=float)
+    theta = np.asarray(theta, dtype=float)
+
+    if _backend(backend) == 'numba':
+        rows = gm._rows(len(r)) if geometry is None else geometry.rows
+        return jt.environment_exploration(r, theta, H, target(r[rows], T), r_0, geometry)
+
+    geometry = _geometry(r, geometry)
+
+    H_i = _per_pair(H, geometry.i)
+    r_0 = _per_pair(r_0, geometry.i)
+
+    beta = target(r[geometry.rows], T)
+
+    term_2 = geometry.sum(((1 - H_i) - np.power(r_0, 2) * geometry.inv_power(2.0))[:, np.newaxis] * geometry.unit)
+
+    heading_j = np.stack((np.cos(theta[:, 2]), np.sin(theta[:, 2]), np.zeros(len(theta))), axis=1)[geometry.j]
+    term_3 = geometry.sum(np.where((geometry.norm_r_ij <= r_0)[:, np.newaxis], heading_j, 0.0))
+
+    H = _per_robot(H, len(r))[geometry.rows, np.newaxis]
+    N = np.maximum(geometry.count, 1)[:, np.newaxis]
+
+    v = H*beta + (1.0/N)*term_2 + (H/N)*term_3
+
+    return v
+
+
+def aggregation(r, geometry=None):
+    """
+    Calculates the nondimensional contribution of every
+    robot based on the "aggregation algorithm"
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    g : numpy.array
+        array containing g_i of each robot
+    """
+
+    geometry = _geometry(r, geometry)
+
+    g = geometry.mean(geometry.unit)
+
+    return g
+
+
+def alignment(v, geometry=None):
+    """
+    Calculates the nondimensional contribution of every
+    robot based on the "alignment algorithm"
+
+    Parameters
+    ----------
+    v : numpy.array
+        array must have the velocities of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step, only used for its
+        neighborhoods; the pairs are taken from v when it is not given.
+
+    Returns
+    -------
+    g : numpy.array
+        array containing g_i of each robot
+    """
+
+    if geometry is None:
+        geometry = gm.Geometry(v)
+        v_ij, norm_v_ij = geometry.r_ij, geometry.norm_r_ij
+    else:
+        v_ij, norm_v_ij = geometry.difference(v)
+
+    g = geometry.mean(v_ij / norm_v_ij[:, np.newaxis])
+
+    return g
+
+
+def geofencing(r, A):
+    """
+    Calculates the nondimensional contribution of every
+    robot based on the "geofencing algorithm"
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    A : function or pyswarming.regions.Region
+        function of the interested region or a region object.
+        The built-in regions (e.g. regions.Sphere) and the precomputed
+        grids (i.e. regions.rasterize(A, bounds, resolution)) are
+        evaluated for all the robots at once.
+
+    Returns
+    -------
+    g : numpy.array
+        array containing the contribution of each robot
+    """
+
+    r = np.asarray(r, dtype=float)
+
+    region = rg.as_region(A)
+
+    gradA = region.gradient(r)
+
+    sigmoid = 1.0 / (1.0 + np.exp(-region(r)))
+
+    g = - (sigmoid / np.linalg.norm(gradA, axis=1))[:, np.newaxis] * gradA
+
+    return g
+
+
+def repulsion(r, alpha, d=2, geometry=None):
+    """
+    Calculates the nondimensional contribution of every
+    robot based on the "repulsion algorithm"
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    alpha : float
+        float parameter to determine the strength of
+        the repulsion.
+
+    d : integer
+        integer > 1 parameter is the multipole order.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    g : numpy.array
+        array containing g_i of each robot
+    """
+
+    geometry = _geometry(r, geometry)
+
+    magnitude = np.power(alpha, d) * geometry.inv_power(d)
+
+    g = - geometry.sum(magnitude[:, np.newaxis] * geometry.unit)
+
+    return g
+
+def target(r, T):
+    """
+    Calculates the nondimensional contribution of every
+    robot based on the "target algorithm"
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    T : numpy.array
+        array must have the target position in
+        cartesian coordinates (i.e. np.asarray([x, y, z])).
+
+    Returns
+    -------
+    b_T : numpy.array
+        array containing the contribution of each robot
+    """
+
+    r_T = np.asarray(T, dtype=float) - np.asarray(r, dtype=float)
+
+    b_T = r_T / np.linalg.norm(r_T, axis=1)[:, np.newaxis]
+
+    return b_T
+
+###################################################################
+# Combined behaviors
+###################################################################
+
+def area_coverage(r, A, alpha, d=2, geometry=None):
+    """
+    Calculate the area coverage nondimensional
+    orientation contribution of every robot
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    A : function or pyswarming.regions.Region
+        function of the interested region or a region object.
+
+    alpha : float
+        float parameter to determine the strength of
+        the repulsion.
+
+    d : integer
+        integer > 1 parameter is the multipole order.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    b_AC : numpy.array
+        array containing the contribution of each robot
+    """
+
+    geometry = _geometry(r, geometry)
+
+    # the per-robot term of the robots of the geometry only
+    b_AC = geofencing(np.asarray(r)[geometry.rows], A) + repulsion(r, alpha, d, geometry)
+
+    return b_AC
+
+
+def collective_navigation(r, T, alpha, d=2, geometry=None):
+    """
+    Calculate the collective navigation nondimensional
+    orientation contribution of every robot
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    T : numpy.array
+        array must have the target position in
+        cartesian coordinates (i.e. np.asarray([x, y, z])).
+
+    alpha : float
+        float parameter to determine the strength of
+        the repulsion.
+
+    d : integer
+        integer > 1 parameter is the multipole order.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    b_CN : numpy.array
+        array containing the contribution of each robot
+    """
+
+    geometry = _geometry(r, geometry)
+
+    # the per-robot term of the robots of the geometry only
+    b_CN = target(np.asarray(r)[geometry.rows], T) + repulsion(r, alpha, d, geometry)
+
+    return b_CN
+
+
+def flocking(r, v, alpha, d=2, geometry=None):
+    """
+    Calculate the flocking nondimensional
+    orientation contribution of every robot
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    v : numpy.array
+        array must have the velocities of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    alpha : float
+        float parameter to determine the strength of
+        the repulsion.
+
+    d : integer
+        integer > 1 parameter is the multipole order.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    b_F : numpy.array
+        array containing the contribution of each robot
+    """
+
+    # aggregation and repulsion share the distances of the same geometry
+    geometry = _geometry(r, geometry)
+
+    b_F = aggregation(r, geometry) + repulsion(r, alpha, d, geometry) + alignment(v, geometry)
+
+    return b_F
+
+###################################################################
+# Force engine
+###################################################################
+
+def pairwise_forces(r, laws, geometry=None):
+    """
+    Calculates the sum of several force laws for every robot,
+    computing the displacements and distances between the
+    robots only once.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    laws : dict
+        dictionary mapping the name of each force law ('inverse_power',
+        'spring', 'force_law', 'repulsive_force', 'body_force',
+        'inter_robot_spacing' or 'lennard_jones') to a dictionary with
+        its parameters, named as in the batched function of the law
+        (e.g. {'spring': {'k': 10.0, 'l': 5.0},
+        'body_force': {'Lambda': 0.1, 'R': R}}).
+
+    geometry : pyswarming.geometry.Geometry
+        geometry cache of the current step (i.e. Geometry(r)),
+        computed from r when it is not given.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the total force of each robot
+    """
+
+    for law in laws:
+        if law not in _FORCE_LAWS:
+            raise Exception("Unknown force law: "+law)
+
+    geometry = _geometry(r, geometry)
+
+    f = np.zeros((geometry.n, 3))
+
+    for law, parameters in laws.items():
+        f += _FORCE_LAWS[law](geometry, **parameters)
+
+    return f
+
+###################################################################
+# Tiled evaluation
+###################################################################
+
+# float64 values held per pair by the geometry of a block (the indices
+# j, i and _row, r_ij and its norm), by its unit vectors, and at the
+# peak of its construction (the gathered positions of the difference)
+_GEOMETRY_PAIR = 7
+_UNIT_PAIR = 3
+_BUILD_PAIR = 11
+
+# float64 values per pair at the peak of each behavior, geometry included,
+# i.e. the unit vectors, the cached inverse powers and the per-term arrays
+_BEHAVIOR_PAIR = {aggregation: 12,
+                  repulsion: 16,
+                  alignment: 16,
+                  flocking: 20,
+                  collision_avoidance: 12,
+                  perimeter_defense: 15,
+                  area_coverage: 16,
+                  collective_navigation: 16,
+                  environment_exploration: 18}
+
+# for each force law, the number of inverse powers it caches in the
+# geometry (one per term for inverse_power) and the float64 values
+# per pair of its per-term arrays, the unit vectors aside
+_LAW_PAIR = {'inverse_power': (None, 5),
+             'spring': (0, 5),
+             'force_law': (1, 1),
+             'repulsive_force': (0, 5),
+             'body_force': (0, 6),
+             'inter_robot_spacing': (2, 5),
+             'lennard_jones': (0, 13)}
+
+_BEHAVIOR_LAW = {inverse_power: 'inverse_power',
+                 spring: 'spring',
+                 force_law: 'force_law',
+                 repulsive_force: 'repulsive_force',
+                 body_force: 'body_force',
+                 inter_robot_spacing: 'inter_robot_spacing',
+                 lennard_jones: 'lennard_jones'}
+
+# for the behaviors not listed above
+_DEFAULT_PAIR = 32
+
+
+def _pair_bytes(behavior, args, kwargs):
+    """
+    Returns the bytes per pair at the peak of a batched behavior, the
+    force laws summing the inverse powers they cache while their
+    per-term arrays are only held one law at a time.
+    """
+
+    if behavior is pairwise_forces:
+        laws = args[0] if args else kwargs['laws']
+    elif behavior is inverse_power:
+        laws = {'inverse_power': {'c_w': args[0] if args else kwargs['c_w']}}
+    elif behavior in _BEHAVIOR_LAW:
+        laws = {_BEHAVIOR_LAW[behavior]: {}}
+    else:
+        return 8 * _BEHAVIOR_PAIR.get(behavior, _DEFAULT_PAIR)
+
+    cached = 0
+    terms = 0
+
+    for law, parameters in laws.items():
+        n_cached, n_terms = _LAW_PAIR.get(law, (0, _DEFAULT_PAIR))
+        if n_cached is None:
+            n_cached = np.shape(parameters['c_w'])[-1]
+        cached += n_cached
+        terms = max(terms, n_terms)
+
+    return 8 * max(_BUILD_PAIR, _GEOMETRY_PAIR + _UNIT_PAIR + cached + terms)
+
+
+def tiled(behavior, r, *args, tile_size=None, memory=None, **kwargs):
+    """
+    Evaluates a batched behavior block of robots by block of robots.
+    Each block holds the pairs of tile_size robots with every other
+    robot, so the temporaries take O(tile_size * N) memory instead of
+    O(N^2), and the result is the same as the all-pairs evaluation.
+    The behavior is given the geometry of the block (Geometry(r,
+    rows=start:stop)), so its per-robot terms are also only evaluated
+    for the robots of the block.
+
+    Parameters
+    ----------
+    behavior : function
+        batched behavior taking geometry= (e.g. repulsion, flocking
+        or pairwise_forces).
+
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    *args
+        the other arguments of the behavior.
+
+    tile_size : int
+        number of robots per block.
+
+    memory : int
+        memory budget in bytes of the temporaries of a block, the
+        tile size being the largest one within the budget (and at
+        most tile_size when both are given). The bytes per pair are
+        those of the behavior (for pairwise_forces, of its laws).
+
+    **kwargs
+        the other keyword arguments of the behavior.
+
+    Returns
+    -------
+    out : numpy.array
+        array containing the output of the behavior for each robot
+    """
+
+    n = len(r)
+
+    if tile_size is None:
+        tile_size = n
+
+    if memory is not None:
+        row_bytes = _pair_bytes(behavior, args, kwargs) * max(n - 1, 1)
+        if memory < row_bytes:
+            raise Exception("The memory budget must hold at least one robot ("+str(row_bytes)+" bytes).")
+        tile_size = min(tile_size, memory // row_bytes)
+
+    if tile_size < 1:
+        raise Exception("The tile size must be greater than 0 (tile_size > 0).")
+
+    out = None
+
+    for start in range(0, n, tile_size):
+        stop = min(start + tile_size, n)
+
+        # the pairs of the robots of the block with every other robot
+        block = behavior(r, *args, geometry=gm.Geometry(r, rows=slice(start, stop)), **kwargs)
+
+        if out is None:
+            out = np.empty((n,) + block.shape[1:])
+
+        out[start:stop] = block
+
+    return out
+
+###################################################################
+# Consensus
+###################################################################
+
+def consensus(theta, theta_0=None, b=0):
+    """
+    Calculate the new heading of every robot when the neighborhood
+    of each robot is the whole swarm. The sum over the neighbors is
+    taken from one global sum minus the robot's own term, so the
+    cost is O(N) instead of O(N^2).
+
+    Parameters
+    ----------
+    theta : numpy.array
+        array must have the orientations of all the robots
+        in euler angles (i.e. np.asarray([[roll1, pitch1, yaw1],
+        [roll2, pitch2, yaw2], ..., [rollN, pitchN, yawN]])).
+
+    theta_0 : numpy.array
+        array must have the leader robot orientation in euler
+        angles (i.e. np.asarray([roll, pitch, yaw])), only used
+        by the robots for which b is 1.
+
+    b : integer or numpy.array
+        leader mask, one value per robot, where the value is 1 if
+        the leader robot is a neighbor of the robot, and 0 otherwise.
+
+    Returns
+    -------
+    new_theta : numpy.array
+        array containing the new heading of each robot
+    """
+
+    theta = np.asarray(theta, dtype=float)
+
+    N = len(theta) - 1
+
+    theta_j_sum = np.sum(theta, axis=0) - theta
+
+    b = _per_robot(b, len(theta))[:, np.newaxis]
+
+    if theta_0 is None:
+        leader = 0.0
+    else:
+        leader = b * np.asarray(theta_0, dtype=float)
+
+    new_theta = (1.0/(1.0 + N + b)) * (theta + theta_j_sum + leader)
+
+    return new_theta
@@ -57,7 +57,22 @@ __all__ = ['leaderless_heading_consensus', 'inverse_power', 'spring',
 
 import numpy as np
 
-from numdifftools import Gradient
+import regions as rg
+import geometry as gm
+
+
+def _displacements(r_i, r_j, geometry=None):
+    """
+    Returns r_j - r_i and its norm for every neighbor, taken
+    from the geometry of robot i when it is given.
+    """
+
+    if geometry is not None:
+        return geometry.r_ij, geometry.norm_r_ij
+
+    r_ij = np.asarray(r_j, dtype=float).reshape(-1, len(r_i)) - r_i
+
+    return r_ij, np.linalg.norm(r_ij, axis=-1)
 
 
 def leaderless_heading_consensus(theta_i, theta_j):
@@ -89,7 +104,7 @@ def leaderless_heading_consensus(theta_i, theta_j):
     return new_theta_i
 
 
-def inverse_power(r_i, r_j, c_w, sigma_w):
+def inverse_power(r_i, r_j, c_w, sigma_w, geometry=None):
     """
     Calculates an output force based on
     the "inverse-power force laws algorithm".
@@ -116,6 +131,10 @@ def inverse_power(r_i, r_j, c_w, sigma_w):
         the inverse power coefficients (sigma_w>0)
         that depends on w.
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     f_i : numpy.array
@@ -127,15 +146,15 @@ def inverse_power(r_i, r_j, c_w, sigma_w):
     f_0 = np.zeros(3)
     f_i = np.zeros(3)
 
-    for j in r_j:
+    for r_ij, norm_r_ij in zip(*_displacements(r_i, r_j, geometry)):
         for w in range(L):
-            f_0 += c_w[w] / np.power(np.linalg.norm(j - r_i), sigma_w[w])
-        f_i += f_0 * ((j - r_i) / np.linalg.norm(j - r_i))
+            f_0 += c_w[w] / np.power(norm_r_ij, sigma_w[w])
+        f_i += f_0 * (r_ij / norm_r_ij)
 
     return f_i
 
 
-def spring(r_i, r_j, k, l):
+def spring(r_i, r_j, k, l, geometry=None):
     """
     Calculates an output force based on
     the "spring laws algorithm".
@@ -160,6 +179,10 @@ def spring(r_i, r_j, k, l):
     l : float
         desired distance between the robots.
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     f_i : numpy.array
@@ -168,13 +191,13 @@ def spring(r_i, r_j, k, l):
 
     f_i = np.zeros(3)
 
-    for j in r_j:
-        f_i += k * (np.linalg.norm(j - r_i) - l) * ((j - r_i) / np.linalg.norm(j - r_i))
+    for r_ij, norm_r_ij in zip(*_displacements(r_i, r_j, geometry)):
+        f_i += k * (norm_r_ij - l) * (r_ij / norm_r_ij)
 
     return f_i
 
 
-def force_law(r_i, r_j, G, m_i, m_j, p):
+def force_law(r_i, r_j, G, m_i, m_j, p, geometry=None):
     """
     Calculates an output force based on
     the "force law algorithm".
@@ -203,6 +226,10 @@ def force_law(r_i, r_j, G, m_i, m_j, p):
     p : float
         user-defined power.
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     f_i : numpy.array
@@ -211,15 +238,17 @@ def force_law(r_i, r_j, G, m_i, m_j, p):
 
     N = len(r_j)
 
+    r_ij, norm_r_ij = _displacements(r_i, r_j, geometry)
+
     f_i = np.zeros(3)
 
     for j in range(N):
-        f_i += (G * m_i * m_j[j]) / np.power(np.linalg.norm(r_j[j] - r_i), p)
+        f_i += (G * m_i * m_j[j]) / np.power(norm_r_ij[j], p)
 
     return f_i
 
 
-def repulsive_force(r_i, r_j, A_i, B_i, R_i, R_j):
+def repulsive_force(r_i, r_j, A_i, B_i, R_i, R_j, geometry=None):
     """
     Calculates an output force based on
     the "repulsive force algorithm".
@@ -247,6 +276,10 @@ def repulsive_force(r_i, r_j, A_i, B_i, R_i, R_j):
     R_j : numpy.array
         array with the radii of the robots j.
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     f_i : numpy.array
@@ -255,16 +288,17 @@ def repulsive_force(r_i, r_j, A_i, B_i, R_i, R_j):
 
     N = len(r_j)
 
+    r_ij, norm_r_ij = _displacements(r_i, r_j, geometry)
+
     f_i = np.zeros(3)
 
     for j in range(N):
-        r_ij = r_j[j] - r_i
-        f_i += A_i * np.exp((R_i+R_j[j]+np.linalg.norm(r_ij))/B_i) * (r_ij / np.linalg.norm(r_ij))
+        f_i += A_i * np.exp((R_i+R_j[j]+norm_r_ij[j])/B_i) * (r_ij[j] / norm_r_ij[j])
 
     return f_i
 
 
-def body_force(r_i, r_j, Lambda, R_i, R_j):
+def body_force(r_i, r_j, Lambda, R_i, R_j, geometry=None):
     """
     Calculates an output force based on
     the "body force algorithm".
@@ -289,6 +323,10 @@ def body_force(r_i, r_j, Lambda, R_i, R_j):
     R_j : numpy.array
         array with the radii of the robots j.
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     f_i : numpy.array
@@ -303,16 +341,17 @@ def body_force(r_i, r_j, Lambda, R_i, R_j):
 
     N = len(r_j)
 
+    r_ij, norm_r_ij = _displacements(r_i, r_j, geometry)
+
     f_i = np.zeros(3)
 
     for j in range(N):
-        r_ij = r_j[j] - r_i
-        f_i += Lambda * h(R_i, R_j[j], np.linalg.norm(r_ij)) * (r_ij / np.linalg.norm(r_ij))
+        f_i += Lambda * h(R_i, R_j[j], norm_r_ij[j]) * (r_ij[j] / norm_r_ij[j])
 
     return f_i
 
 
-def inter_robot_spacing(r_i, r_j, alpha, d_0):
+def inter_robot_spacing(r_i, r_j, alpha, d_0, geometry=None):
     """
     Calculates an output force based on
     the "inter-robot spacing algorithm".
@@ -334,6 +373,10 @@ def inter_robot_spacing(r_i, r_j, alpha, d_0):
     d_0 : float
         user-defined coefficient.
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     f_i : numpy.array
@@ -342,9 +385,8 @@ def inter_robot_spacing(r_i, r_j, alpha, d_0):
     
     f_i = np.zeros(3)
 
-    for j in r_j:
-        r_ij = j - r_i
-        f_i += alpha * ((1.0/np.linalg.norm(r_ij)) - (d_0/np.power(np.linalg.norm(r_ij),2))) * (r_ij / np.linalg.norm(r_ij))
+    for r_ij, norm_r_ij in zip(*_displacements(r_i, r_j, geometry)):
+        f_i += alpha * ((1.0/norm_r_ij) - (d_0/np.power(norm_r_ij,2))) * (r_ij / norm_r_ij)
 
     return f_i
 
@@ -415,7 +457,7 @@ def leader_following(theta_i, theta_j, theta_0, b_i):
     return new_theta_i
 
 
-def collision_avoidance(r_i, r_j):
+def collision_avoidance(r_i, r_j, geometry=None):
     """
     Calculate the desired heading of the robot
     based on the "collision avoidance algorithm"
@@ -431,6 +473,10 @@ def collision_avoidance(r_i, r_j):
         cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
         [x2, y2, z2], ..., [xN, yN, zN]])).
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     new_theta_i : numpy.array
@@ -439,13 +485,13 @@ def collision_avoidance(r_i, r_j):
     
     new_theta_i = np.zeros(3)
 
-    for j in r_j:
-        new_theta_i -= ((j - r_i) / np.linalg.norm(j - r_i))
+    for r_ij, norm_r_ij in zip(*_displacements(r_i, r_j, geometry)):
+        new_theta_i -= (r_ij / norm_r_ij)
 
     return new_theta_i
 
 
-def attraction_alignment(r_i, r_j, theta_j):
+def attraction_alignment(r_i, r_j, theta_j, geometry=None):
     """
     Calculate the desired heading of the robot
     based on the "attraction and alignment algorithm"
@@ -466,6 +512,10 @@ def attraction_alignment(r_i, r_j, theta_j):
         in euler angles (i.e. np.asarray([[roll1, pitch1, yaw1],
         [roll2, pitch2, yaw2], ..., [rollN, pitchN, yawN]])).
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     new_theta_i : numpy.array
@@ -474,8 +524,8 @@ def attraction_alignment(r_i, r_j, theta_j):
     
     new_theta_i = np.zeros(3)
 
-    for j in r_j:
-        new_theta_i += ((j - r_i) / np.linalg.norm(j - r_i))
+    for r_ij, norm_r_ij in zip(*_displacements(r_i, r_j, geometry)):
+        new_theta_i += (r_ij / norm_r_ij)
 
     for j in theta_j:
         new_theta_i += (j / np.linalg.norm(j))
@@ -515,7 +565,7 @@ def preferred_direction(theta_i, k_i, w=0.0):
     return new_theta_i
 
 
-def lennard_jones(r_i, r_j, epsilon, sigma, normalized=False):
+def lennard_jones(r_i, r_j, epsilon, sigma, normalized=False, geometry=None):
     """
     Calculates an output force that produces
     lattice formations, based on the "Lennard-Jones
@@ -542,21 +592,24 @@ def lennard_jones(r_i, r_j, epsilon, sigma, normalized=False):
         boolean parameter to normalize each
         term in the sum when normalized = True.
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     f_i : numpy.array
         array containing the force
     """
     
-    N = len(r_j)
+    N = max(len(r_j), 1)
 
     f_i = np.zeros(3)
 
-    for j in r_j:
-        r_ij = (j - r_i)
+    for r_ij, norm_r_ij in zip(*_displacements(r_i, r_j, geometry)):
 
         if normalized == True:
-            normalization_term = (r_ij / np.linalg.norm(r_ij))
+            normalization_term = (r_ij / norm_r_ij)
         else: 
             normalization_term = 1.0
 
@@ -609,7 +662,7 @@ def virtual_viscosity(v_i, xi, xi_dot, xi_conv, xi_stab):
     return f_i
 
 
-def modified_attraction_alignment(r_i, r_j, theta_j, h_j):
+def modified_attraction_alignment(r_i, r_j, theta_j, h_j, geometry=None):
     """
     Calculate the desired heading of the robot
     based on the "attraction and alignment algorithm"
@@ -635,6 +688,10 @@ def modified_attraction_alignment(r_i, r_j, theta_j, h_j):
         array must have the neighborhood "social importance"
         factor (i.e. np.asarray([h_j1, h_j2, ..., h_jN])).
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     new_theta_i : numpy.array
@@ -643,8 +700,8 @@ def modified_attraction_alignment(r_i, r_j, theta_j, h_j):
     
     new_theta_i = np.zeros(3)
 
-    for j,h in zip(r_j,h_j):
-        new_theta_i += h*((j - r_i) / np.linalg.norm(j - r_i))
+    for r_ij, norm_r_ij, h in zip(*_displacements(r_i, r_j, geometry), h_j):
+        new_theta_i += h*(r_ij / norm_r_ij)
 
     for j,h in zip(theta_j,h_j):
         new_theta_i += h*(j / np.linalg.norm(j))
@@ -688,7 +745,7 @@ def heading_consensus(theta_i, theta_j):
     return new_theta_i
 
 
-def perimeter_defense(r_i, r_j):
+def perimeter_defense(r_i, r_j, geometry=None):
     """
     Calculate the new "heading" based on
     the "perimeter defense algorithm"
@@ -704,6 +761,10 @@ def perimeter_defense(r_i, r_j):
         cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
         [x2, y2, z2], ..., [xN, yN, zN]])).
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     g_i : numpy.array
@@ -712,13 +773,13 @@ def perimeter_defense(r_i, r_j):
     
     g_i = np.zeros(3)
 
-    for j in r_j:
-        g_i += ((j - r_i) / np.power(np.linalg.norm(j - r_i), 2))
+    for r_ij, norm_r_ij in zip(*_displacements(r_i, r_j, geometry)):
+        g_i += (r_ij / np.power(norm_r_ij, 2))
 
     return g_i
 
 
-def environment_exploration(r_i, r_j, theta_j, H_i, T, r_0):
+def environment_exploration(r_i, r_j, theta_j, H_i, T, r_0, geometry=None):
     """
     Calculate the new velocity of the robot
     based on the "environment exploration algorithm"
@@ -751,28 +812,34 @@ def environment_exploration(r_i, r_j, theta_j, H_i, T, r_0):
         reference distance between the robots to create
         a set of robots within this range.
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     v_i : numpy.array
         array containing the new velocity v_i
     """
 
-    N = len(r_j)
+    N = max(len(r_j), 1)
 
     beta_i = (T - r_i) / np.linalg.norm(T - r_i)
 
+    r_ij, norm_r_ij = _displacements(r_i, r_j, geometry)
+
     term_2 = 0
 
-    for j in r_j:
+    for j in range(len(r_ij)):
 
-        gamma_ij = (j - r_i) / np.linalg.norm(j - r_i)
+        gamma_ij = r_ij[j] / norm_r_ij[j]
 
-        term_2 += gamma_ij*((1-H_i)-(np.power(r_0,2)/np.power(np.linalg.norm(j - r_i),2)))
+        term_2 += gamma_ij*((1-H_i)-(np.power(r_0,2)/np.power(norm_r_ij[j],2)))
 
     R_i_u_i = []
 
-    for j in range(len(r_j)):
-        if np.linalg.norm(r_j[j] - r_i)<=r_0:
+    for j in range(len(r_ij)):
+        if norm_r_ij[j]<=r_0:
             R_i_u_i.append(j)
 
     term_3 = 0
@@ -786,7 +853,7 @@ def environment_exploration(r_i, r_j, theta_j, H_i, T, r_0):
     return v_i
 
 
-def aggregation(r_i, r_j):
+def aggregation(r_i, r_j, geometry=None):
     """
     Calculates a nondimensional contribution
     based on the "aggregation algorithm"
@@ -802,18 +869,22 @@ def aggregation(r_i, r_j):
         cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
         [x2, y2, z2], ..., [xN, yN, zN]])).
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     g_i : numpy.array
         array containing g_i
     """
 
-    N = len(r_j)
+    N = max(len(r_j), 1)
     
     g_i_sum = np.zeros(3)
 
-    for j in r_j:
-        g_i_sum += ((j - r_i) / np.linalg.norm(j - r_i))
+    for r_ij, norm_r_ij in zip(*_displacements(r_i, r_j, geometry)):
+        g_i_sum += (r_ij / norm_r_ij)
 
     g_i = (1.0/N) * g_i_sum
 
@@ -842,7 +913,7 @@ def alignment(v_i, v_j):
         array containing g_i
     """
 
-    N = len(v_j)
+    N = max(len(v_j), 1)
     
     g_i_sum = np.zeros(3)
 
@@ -865,9 +936,11 @@ def geofencing(r_i, A):
         array must have the robot position in cartesian
         coordinates (i.e. np.asarray([x, y, z])).
 
-    A : function
+    A : function or pyswarming.regions.Region
         function of the interested region.
         e.g. A = lambda x: np.sqrt(x[0]+x[1]+x[2])
+        or a region with an exact gradient (e.g. regions.Sphere),
+        or a precomputed grid (i.e. regions.rasterize(A, bounds, resolution)).
 
     Returns
     -------
@@ -875,16 +948,16 @@ def geofencing(r_i, A):
         array containing contribution
     """
 
-    gradF = Gradient(A)
+    region = rg.as_region(A)
 
-    gradA = gradF([r_i[0],r_i[1],r_i[2]])
+    gradA = region.gradient([r_i[0],r_i[1],r_i[2]])
 
-    g_i = - (1.0 / (1.0 + np.exp(-A([r_i[0],r_i[1],r_i[2]])))) * (gradA / np.linalg.norm(gradA))
+    g_i = - (1.0 / (1.0 + np.exp(-region([r_i[0],r_i[1],r_i[2]])))) * (gradA / np.linalg.norm(gradA))
 
     return g_i
 
 
-def repulsion(r_i, r_j, alpha, d=2):
+def repulsion(r_i, r_j, alpha, d=2, geometry=None):
     """
     Calculates a nondimensional contribution
     based on the "repulsion algorithm"
@@ -907,6 +980,10 @@ def repulsion(r_i, r_j, alpha, d=2):
     d : integer
         integer > 1 parameter is the multipole order.
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     g_i : numpy.array
@@ -915,8 +992,8 @@ def repulsion(r_i, r_j, alpha, d=2):
     
     g_i = np.zeros(3)
 
-    for j in r_j:
-        g_i -= (np.power(alpha,d) / np.power(np.linalg.norm(j - r_i),d)) * ((j - r_i) / np.linalg.norm(j - r_i))
+    for r_ij, norm_r_ij in zip(*_displacements(r_i, r_j, geometry)):
+        g_i -= (np.power(alpha,d) / np.power(norm_r_ij,d)) * (r_ij / norm_r_ij)
 
     return g_i
 
@@ -950,7 +1027,7 @@ def target(r_i, T):
 # Combined behaviors
 ###################################################################
 
-def area_coverage(r_i, r_j, A, alpha, d=2):
+def area_coverage(r_i, r_j, A, alpha, d=2, geometry=None):
     """
     Calculate the area coverage nondimensional
     orientation contribution
@@ -966,7 +1043,7 @@ def area_coverage(r_i, r_j, A, alpha, d=2):
         cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
         [x2, y2, z2], ..., [xN, yN, zN]])).
 
-    A : function
+    A : function or pyswarming.regions.Region
         function of the interested region.
     
     alpha : float
@@ -976,18 +1053,22 @@ def area_coverage(r_i, r_j, A, alpha, d=2):
     d : integer
         integer > 1 parameter is the multipole order.
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     b_AC : numpy.array
         array containing contribution
     """
 
-    b_AC = geofencing(r_i, A) + repulsion(r_i, r_j, alpha, d)
+    b_AC = geofencing(r_i, A) + repulsion(r_i, r_j, alpha, d, geometry)
 
     return b_AC
 
 
-def collective_navigation(r_i, r_j, T, alpha, d=2):
+def collective_navigation(r_i, r_j, T, alpha, d=2, geometry=None):
     """
     Calculate the collective navigation nondimensional
     orientation contribution
@@ -1014,18 +1095,22 @@ def collective_navigation(r_i, r_j, T, alpha, d=2):
     d : integer
         integer > 1 parameter is the multipole order.
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     b_CN : numpy.array
         array containing contribution
     """
 
-    b_CN = target(r_i, T) + repulsion(r_i, r_j, alpha, d)
+    b_CN = target(r_i, T) + repulsion(r_i, r_j, alpha, d, geometry)
 
     return b_CN
 
 
-def flocking(r_i, r_j, v_i, v_j, alpha, d=2):
+def flocking(r_i, r_j, v_i, v_j, alpha, d=2, geometry=None):
     """
     Calculate the flocking nondimensional
     orientation contribution
@@ -1057,12 +1142,20 @@ def flocking(r_i, r_j, v_i, v_j, alpha, d=2):
         cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
         [x2, y2, z2], ..., [xN, yN, zN]])).
 
+    geometry : pyswarming.geometry.GeometryRow
+        optional geometry of robot i (i.e. Geometry(r).row(i)),
+        holding r_j - r_i and its norm for every neighbor in r_j.
+
     Returns
     -------
     b_F : numpy.array
         array containing contribution
     """
 
-    b_F = aggregation(r_i, r_j) + repulsion(r_i, r_j, alpha, d) + alignment(v_i, v_j)
+    # aggregation and repulsion share the distances of the same geometry
+    if geometry is None:
+        geometry = gm.GeometryRow(*_displacements(r_i, r_j), None)
+
+    b_F = aggregation(r_i, r_j, geometry) + repulsion(r_i, r_j, alpha, d, geometry) + alignment(v_i, v_j)
 
     return b_F
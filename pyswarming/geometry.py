@@ -0,0 +1,328 @@
+"""
+``pyswarming.geometry``
+========================
+
+The PySwarming geometry cache holds the displacements, distances, unit
+vectors and inverse powers between each robot and its neighbors. It is
+computed once per step and passed to the behaviors (``geometry=``), so
+combined behaviors (e.g. flocking = aggregation + repulsion + alignment)
+share the same distances instead of recomputing them.
+
+The pairs (i, j) are stored flat, grouped by robot i in the CSR
+(compressed sparse row) layout: the neighbors of robot i are
+``j[indptr[i]:indptr[i+1]]``. By default every other robot is a neighbor,
+in index order, i.e. the neighborhood of robot i is ``np.delete(r, i, axis=0)``.
+Sparse neighborhoods (e.g. from ``pyswarming.neighbors``) are given as
+CSR ``indptr`` and ``indices``, or as an (N, k) array of k neighbors per robot.
+A geometry can be restricted to a block of robots (``rows``), e.g. to
+evaluate the behaviors block by block: only the pairs of those robots are
+computed, and the per-robot results have one entry per robot of the block.
+
+Functions present in pyswarming.geometry are listed below.
+
+Geometry
+--------
+
+    Geometry
+    GeometryRow
+"""
+
+__all__ = ['Geometry', 'GeometryRow']
+
+import numpy as np
+
+
+def _neighbor_table(n, rows=None):
+    """
+    Returns the (n, n-1) array of neighbor indices of every robot,
+    i.e. row i is np.delete(np.arange(n), i), or only the given rows.
+    """
+
+    j = np.arange(n - 1)
+
+    if rows is None:
+        rows = np.arange(n)
+
+    return j[np.newaxis, :] + (j[np.newaxis, :] >= np.asarray(rows)[:, np.newaxis])
+
+
+def _rows(n, rows=None):
+    """
+    Returns a block of robots (a slice start:stop, every robot when
+    rows is None) as a slice with explicit bounds.
+    """
+
+    if rows is None:
+        return slice(0, n)
+
+    start, stop, step = rows.indices(n)
+
+    if step != 1:
+        raise Exception("The rows must be a contiguous block of robots (start:stop).")
+
+    return slice(start, max(start, stop))
+
+
+class GeometryRow:
+    """
+    Geometry of a single robot i, as taken by the behaviors of
+    pyswarming.behaviors (i.e. Geometry(r).row(i)).
+
+    Attributes
+    ----------
+    r_ij : numpy.array
+        displacements r_j - r_i to the neighbors, shape (K, 3).
+
+    norm_r_ij : numpy.array
+        distances to the neighbors, shape (K,).
+
+    j : numpy.array
+        indices of the neighbors, shape (K,).
+    """
+
+    def __init__(self, r_ij, norm_r_ij, j):
+
+        self.r_ij = r_ij
+        self.norm_r_ij = norm_r_ij
+        self.j = j
+
+
+class Geometry:
+    """
+    Creates the geometry cache of a swarm for one step.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    indptr : numpy.array
+        optional CSR row pointers of the neighborhoods (length N + 1),
+        every other robot being a neighbor when it is not given.
+
+    indices : numpy.array
+        optional CSR neighbor indices, i.e. the neighbors of robot i
+        are indices[indptr[i]:indptr[i+1]], or an (N, k) array of k
+        neighbors per robot (e.g. pyswarming.neighbors.nearest) when
+        indptr is not given.
+
+    rows : slice
+        optional block of robots start:stop the geometry is restricted
+        to, every robot by default. The neighborhoods are still those
+        of the whole swarm.
+
+    Attributes
+    ----------
+    n : int
+        number of robots of the geometry (stop - start).
+
+    rows : slice
+        block of robots of the geometry, the k-th robot of the geometry
+        being robot rows.start + k of the swarm.
+
+    i, j : numpy.array
+        robot and neighbor index (in the swarm) of each pair, shape (P,).
+
+    indptr : numpy.array
+        CSR row pointers, the pairs of the k-th robot of the geometry
+        being indptr[k]:indptr[k+1].
+
+    count : numpy.array
+        number of neighbors of each robot of the geometry, shape (n,).
+
+    r_ij : numpy.array
+        displacements r_j - r_i of each pair, shape (P, 3).
+
+    norm_r_ij : numpy.array
+        distances of each pair, shape (P,).
+    """
+
+    def __init__(self, r, indptr=None, indices=None, rows=None):
+
+        r = np.asarray(r, dtype=float)
+
+        self.rows = _rows(len(r), rows)
+        self.n = self.rows.stop - self.rows.start
+
+        if indptr is None and indices is None:
+            self.j = _neighbor_table(len(r), np.arange(self.rows.start, self.rows.stop)).ravel()
+            self.count = np.full(self.n, len(r) - 1)
+        elif indptr is None:
+            indices = np.asarray(indices, dtype=np.intp)[self.rows]
+            self.j = indices.ravel()
+            self.count = np.full(self.n, indices.shape[1])
+        else:
+            indptr = np.asarray(indptr, dtype=np.intp)
+            self.j = np.asarray(indices, dtype=np.intp)[indptr[self.rows.start]:indptr[self.rows.stop]]
+            self.count = np.diff(indptr[self.rows.start:self.rows.stop + 1])
+
+        self._build(r)
+
+    def _build(self, r):
+
+        self.indptr = np.concatenate(([0], np.cumsum(self.count)))
+        self._row = np.repeat(np.arange(self.n), self.count)
+        self.i = self._row + self.rows.start
+
+        # every robot has the same number of neighbors, so the pair
+        # sums are reshapes instead of scatters
+        self._uniform = self.n > 0 and (self.count == self.count[0]).all()
+
+        self.r_ij, self.norm_r_ij = self.difference(r)
+
+        self._unit = None
+        self._inv_power = {}
+
+    def difference(self, x):
+        """
+        Returns x_j - x_i for every pair and its norm, e.g. the relative
+        velocities when x holds the robot velocities.
+
+        Parameters
+        ----------
+        x : numpy.array
+            array with one row per robot, shape (n, 3).
+
+        Returns
+        -------
+        x_ij : numpy.array
+            array containing x_j - x_i of each pair
+
+        norm_x_ij : numpy.array
+            array containing the norm of x_j - x_i of each pair
+        """
+
+        x = np.asarray(x, dtype=float)
+
+        x_ij = x[self.j] - x[self.i]
+
+        return x_ij, np.linalg.norm(x_ij, axis=1)
+
+    @property
+    def unit(self):
+        """
+        Unit vectors (r_j - r_i) / |r_j - r_i| of each pair, shape (P, 3).
+        """
+
+        if self._unit is None:
+            self._unit = self.r_ij / self.norm_r_ij[:, np.newaxis]
+
+        return self._unit
+
+    def inv_power(self, p):
+        """
+        Returns 1 / |r_j - r_i|^p of each pair, cached per power p.
+
+        Parameters
+        ----------
+        p : float
+            power.
+
+        Returns
+        -------
+        inv_norm : numpy.array
+            array containing the inverse powers of the distances
+        """
+
+        if p not in self._inv_power:
+            self._inv_power[p] = 1.0 / np.power(self.norm_r_ij, p)
+
+        return self._inv_power[p]
+
+    def sum(self, values):
+        """
+        Sums the values of the pairs of each robot.
+
+        Parameters
+        ----------
+        values : numpy.array
+            array with one entry per pair, shape (P,) or (P, 3).
+
+        Returns
+        -------
+        total : numpy.array
+            array with one entry per robot, shape (n,) or (n, 3)
+        """
+
+        values = np.asarray(values, dtype=float)
+
+        if self._uniform:
+            return np.sum(values.reshape((self.n, self.count[0]) + values.shape[1:]), axis=1)
+
+        if values.ndim == 1:
+            return np.bincount(self._row, weights=values, minlength=self.n)
+
+        total = np.empty((self.n,) + values.shape[1:])
+        for k in range(values.shape[1]):
+            total[:, k] = np.bincount(self._row, weights=values[:, k], minlength=self.n)
+
+        return total
+
+    def mean(self, values):
+        """
+        Averages the values of the pairs of each robot, a robot without
+        neighbors having a mean of zero.
+
+        Parameters
+        ----------
+        values : numpy.array
+            array with one entry per pair, shape (P,) or (P, 3).
+
+        Returns
+        -------
+        mean : numpy.array
+            array with one entry per robot, shape (n,) or (n, 3)
+        """
+
+        total = self.sum(values)
+        count = np.maximum(self.count, 1)
+
+        return total / count.reshape((self.n,) + (1,)*(total.ndim - 1))
+
+    def cumsum(self, values):
+        """
+        Cumulative sum of the values of the pairs of each robot, in
+        neighbor order.
+
+        Parameters
+        ----------
+        values : numpy.array
+            array with one entry per pair, shape (P,).
+
+        Returns
+        -------
+        total : numpy.array
+            array with the running sum of each pair, shape (P,)
+        """
+
+        values = np.asarray(values, dtype=float)
+
+        if self._uniform:
+            return np.cumsum(values.reshape(self.n, self.count[0]), axis=1).ravel()
+
+        total = np.cumsum(values)
+        offset = np.concatenate(([0.0], total))[self.indptr[:-1]]
+
+        return total - np.repeat(offset, self.count)
+
+    def row(self, i):
+        """
+        Returns the geometry of robot i, to be passed to the behaviors
+        of pyswarming.behaviors.
+
+        Parameters
+        ----------
+        i : int
+            index of the robot in the geometry.
+
+        Returns
+        -------
+        row : GeometryRow
+            displacements and distances of robot i to its neighbors
+        """
+
+        pairs = slice(self.indptr[i], self.indptr[i + 1])
+
+        return GeometryRow(self.r_ij[pairs], self.norm_r_ij[pairs], self.j[pairs])
@@ -0,0 +1,262 @@
+"""
+``pyswarming.graph``
+========================
+
+The PySwarming graph functions run the consensus behaviors over a sparse
+communication graph, where each robot only talks to the robots within its
+radio range. The graph is given as a sparse adjacency matrix in the CSR
+(compressed sparse row) format: the neighbors of robot i are
+``indices[indptr[i]:indptr[i+1]]``, with optional ``weights`` aligned with
+``indices``. Memory is linear in the number of edges.
+
+Functions present in pyswarming.graph are listed below.
+
+Consensus Behaviors
+-------------------
+
+    leaderless_heading_consensus
+    leader_following
+    heading_consensus
+
+Consensus Engine
+----------------
+
+   consensus = leaderless_heading_consensus, heading_consensus
+   or leader_following over the communication graph
+"""
+
+__all__ = ['leaderless_heading_consensus', 'leader_following', 'heading_consensus',
+           'consensus']
+
+import numpy as np
+
+
+def _check_csr(n, indptr, indices, weights=None):
+    """
+    Validates a CSR adjacency of n robots and returns it as arrays,
+    together with the row (robot i) of each edge.
+    """
+
+    indptr = np.asarray(indptr, dtype=np.intp)
+    indices = np.asarray(indices, dtype=np.intp)
+
+    if indptr.shape != (n + 1,):
+        raise Exception("indptr must have n + 1 entries.")
+
+    if indptr[0] != 0 or indptr[-1] != len(indices) or (np.diff(indptr) < 0).any():
+        raise Exception("indptr must be non-decreasing from 0 to len(indices).")
+
+    if len(indices) > 0 and (indices.min() < 0 or indices.max() >= n):
+        raise Exception("indices must be robot indices in [0, n).")
+
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape != indices.shape:
+            raise Exception("weights must have the same length as indices.")
+
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+
+    return rows, indices, weights
+
+
+def _neighbor_sum(theta, rows, indices, weights):
+    """
+    Returns the (weighted) sum of the neighbor orientations of every
+    robot, i.e. the sparse matrix-vector product A @ theta.
+    """
+
+    n = len(theta)
+
+    theta_j_sum = np.empty(theta.shape)
+
+    for k in range(theta.shape[1]):
+        theta_k = theta[indices, k]
+        if weights is not None:
+            theta_k = weights * theta_k
+        theta_j_sum[:, k] = np.bincount(rows, weights=theta_k, minlength=n)
+
+    return theta_j_sum
+
+
+def leaderless_heading_consensus(theta, indptr, indices, weights=None, iterations=1):
+    """
+    Calculate the new heading of every robot based on
+    the "leaderless heading consensus algorithm" over a
+    sparse communication graph.
+
+    Parameters
+    ----------
+    theta : numpy.array
+        array must have the orientations of all the robots
+        in euler angles (i.e. np.asarray([[roll1, pitch1, yaw1],
+        [roll2, pitch2, yaw2], ..., [rollN, pitchN, yawN]])).
+
+    indptr : numpy.array
+        CSR row pointers of the communication graph (length N + 1).
+
+    indices : numpy.array
+        CSR column indices, i.e. the neighbors of each robot.
+
+    weights : numpy.array
+        optional edge weights aligned with indices.
+
+    iterations : int
+        number of consensus iterations.
+
+    Returns
+    -------
+    new_theta : numpy.array
+        array containing the new heading of each robot
+    """
+
+    return consensus(theta, indptr, indices, weights, iterations=iterations)
+
+
+def leader_following(theta, theta_0, b, indptr, indices, weights=None, iterations=1):
+    """
+    Calculate the new heading of every robot based on
+    the "leader following algorithm" over a sparse
+    communication graph.
+
+    Parameters
+    ----------
+    theta : numpy.array
+        array must have the orientations of all the robots
+        in euler angles (i.e. np.asarray([[roll1, pitch1, yaw1],
+        [roll2, pitch2, yaw2], ..., [rollN, pitchN, yawN]])).
+
+    theta_0 : numpy.array
+        array must have the leader robot orientation in euler
+        angles (i.e. np.asarray([roll, pitch, yaw])).
+
+    b : integer or numpy.array
+        leader mask, one value per robot, where the value is 1 if
+        the leader robot is a neighbor of the robot, and 0 otherwise.
+
+    indptr : numpy.array
+        CSR row pointers of the communication graph (length N + 1).
+
+    indices : numpy.array
+        CSR column indices, i.e. the neighbors of each robot.
+
+    weights : numpy.array
+        optional edge weights aligned with indices.
+
+    iterations : int
+        number of consensus iterations.
+
+    Returns
+    -------
+    new_theta : numpy.array
+        array containing the new heading of each robot
+    """
+
+    return consensus(theta, indptr, indices, weights, theta_0, b, iterations)
+
+
+def heading_consensus(theta, indptr, indices, weights=None, iterations=1):
+    """
+    Calculate the new heading of every robot based on
+    the "heading consensus algorithm" over a sparse
+    communication graph.
+
+    Parameters
+    ----------
+    theta : numpy.array
+        array must have the orientations of all the robots
+        in euler angles (i.e. np.asarray([[roll1, pitch1, yaw1],
+        [roll2, pitch2, yaw2], ..., [rollN, pitchN, yawN]])).
+
+    indptr : numpy.array
+        CSR row pointers of the communication graph (length N + 1).
+
+    indices : numpy.array
+        CSR column indices, i.e. the neighbors of each robot.
+
+    weights : numpy.array
+        optional edge weights aligned with indices.
+
+    iterations : int
+        number of consensus iterations.
+
+    Returns
+    -------
+    new_theta : numpy.array
+        array containing the new heading of each robot
+    """
+
+    return consensus(theta, indptr, indices, weights, iterations=iterations)
+
+
+###################################################################
+# Consensus engine
+###################################################################
+
+def consensus(theta, indptr, indices, weights=None, theta_0=None, b=0, iterations=1):
+    """
+    Runs synchronous consensus iterations over a sparse communication
+    graph. Each iteration is one sparse matrix-vector product:
+
+        theta_i <- (theta_i + sum_j w_ij theta_j + b_i theta_0) / (1 + sum_j w_ij + b_i)
+
+    which, for unit weights, is the update of leaderless_heading_consensus,
+    heading_consensus (b = 0) and leader_following.
+
+    Parameters
+    ----------
+    theta : numpy.array
+        array must have the orientations of all the robots
+        in euler angles (i.e. np.asarray([[roll1, pitch1, yaw1],
+        [roll2, pitch2, yaw2], ..., [rollN, pitchN, yawN]])).
+
+    indptr : numpy.array
+        CSR row pointers of the communication graph (length N + 1).
+
+    indices : numpy.array
+        CSR column indices, i.e. the neighbors of each robot.
+
+    weights : numpy.array
+        optional edge weights aligned with indices.
+
+    theta_0 : numpy.array
+        array must have the leader robot orientation in euler
+        angles (i.e. np.asarray([roll, pitch, yaw])), only used
+        by the robots for which b is 1.
+
+    b : integer or numpy.array
+        leader mask, one value per robot, where the value is 1 if
+        the leader robot is a neighbor of the robot, and 0 otherwise.
+
+    iterations : int
+        number of consensus iterations.
+
+    Returns
+    -------
+    new_theta : numpy.array
+        array containing the new heading of each robot
+    """
+
+    theta = np.array(theta, dtype=float)
+
+    n = len(theta)
+
+    rows, indices, weights = _check_csr(n, indptr, indices, weights)
+
+    if weights is None:
+        N = np.diff(np.asarray(indptr)).astype(float)
+    else:
+        N = np.bincount(rows, weights=weights, minlength=n)
+
+    b = np.broadcast_to(np.asarray(b, dtype=float), (n,))
+
+    if theta_0 is None:
+        leader = np.zeros(theta.shape)
+    else:
+        leader = b[:, np.newaxis] * np.asarray(theta_0, dtype=float)
+
+    scale = (1.0/(1.0 + N + b))[:, np.newaxis]
+
+    for iteration in range(iterations):
+        theta = scale * (theta + _neighbor_sum(theta, rows, indices, weights) + leader)
+
+    return theta
@@ -0,0 +1,333 @@
+"""
+``pyswarming.jit``
+========================
+
+The PySwarming jit kernels are Numba-compiled counterparts of the branchy
+batched behaviors (body_force, lennard_jones, environment_exploration).
+Instead of building the (number of pairs, 3) displacements, distances
+and masks of a ``pyswarming.geometry.Geometry``, every kernel loops over
+the neighbors of each robot, computing the distance of the pair and
+accumulating its contribution at once, so no pair-sized temporaries are
+allocated. The compiled kernels are cached on disk and release the GIL,
+so they can be run from several threads.
+
+Numba is optional: when it is not installed, ``available`` is False and
+the batched functions keep their numpy implementation, which remains the
+default. The kernels are selected with
+``pyswarming.batched.set_backend('numba')`` or with ``backend='numba'``.
+
+Functions present in pyswarming.jit are listed below.
+
+Kernels
+-------
+
+    body_force
+    lennard_jones
+    environment_exploration
+"""
+
+__all__ = ['body_force', 'lennard_jones', 'environment_exploration']
+
+import numpy as np
+
+try:
+    import numba
+    available = True
+except ImportError:
+    numba = None
+    available = False
+
+
+def _njit(function):
+    """
+    Compiles the function with Numba (cached on disk, without the GIL),
+    leaving it unchanged when Numba is not installed.
+    """
+
+    if not available:
+        return function
+
+    return numba.njit(cache=True, nogil=True)(function)
+
+
+@_njit
+def _neighbor(i, k, first, indices, dense):
+    """
+    Returns the k-th neighbor of robot i, every other robot
+    when dense is True and the CSR neighborhood otherwise.
+    """
+
+    if dense:
+        if k < i:
+            return k
+        return k + 1
+
+    return indices[first + k]
+
+
+@_njit
+def _body_force(r, Lambda, R, start, n_rows, indptr, indices, dense):
+
+    n = r.shape[0]
+    f = np.zeros((n_rows, 3))
+
+    for row in range(n_rows):
+        i = start + row
+        if dense:
+            first, count = 0, n - 1
+        else:
+            first, count = indptr[row], indptr[row+1] - indptr[row]
+
+        for k in range(count):
+            j = _neighbor(i, k, first, indices, dense)
+
+            x = r[j, 0] - r[i, 0]
+            y = r[j, 1] - r[i, 1]
+            z = r[j, 2] - r[i, 2]
+            norm = np.sqrt(x*x + y*y + z*z)
+
+            R_ij = R[i] + R[j]
+
+            if norm > R_ij:
+                continue
+
+            magnitude = Lambda[i] * (R_ij + norm) / norm
+
+            f[row, 0] += magnitude * x
+            f[row, 1] += magnitude * y
+            f[row, 2] += magnitude * z
+
+    return f
+
+
+@_njit
+def _lennard_jones(r, epsilon, sigma, normalized, start, n_rows, indptr, indices, dense):
+
+    n = r.shape[0]
+    f = np.zeros((n_rows, 3))
+    r_ij = np.empty(3)
+
+    for row in range(n_rows):
+        i = start + row
+        if dense:
+            first, count = 0, n - 1
+        else:
+            first, count = indptr[row], indptr[row+1] - indptr[row]
+
+        for k in range(count):
+            j = _neighbor(i, k, first, indices, dense)
+
+            for c in range(3):
+                r_ij[c] = r[j, c] - r[i, c]
+
+            norm = np.sqrt(r_ij[0]*r_ij[0] + r_ij[1]*r_ij[1] + r_ij[2]*r_ij[2])
+
+            # as in the reference implementation, the law is applied to each component
+            for c in range(3):
+                s = sigma[i] / r_ij[c]
+                s6 = s**6
+                law = ((12.0*epsilon[i]) / r_ij[c]) * (s6*s6 - s6)
+                if normalized:
+                    law = law * (r_ij[c] / norm)
+                f[row, c] += law
+
+        if count > 0:
+            for c in range(3):
+                f[row, c] /= count
+
+    return f
+
+
+@_njit
+def _environment_exploration(r, yaw, beta, H, r_0, start, n_rows, indptr, indices, dense):
+
+    n = r.shape[0]
+    v = np.zeros((n_rows, 3))
+
+    for row in range(n_rows):
+        i = start + row
+        if dense:
+            first, count = 0, n - 1
+        else:
+            first, count = indptr[row], indptr[row+1] - indptr[row]
+
+        term_2 = np.zeros(3)
+        term_3 = np.zeros(3)
+
+        for k in range(count):
+            j = _neighbor(i, k, first, indices, dense)
+
+            x = r[j, 0] - r[i, 0]
+            y = r[j, 1] - r[i, 1]
+            z = r[j, 2] - r[i, 2]
+            norm = np.sqrt(x*x + y*y + z*z)
+
+            magnitude = ((1.0 - H[i]) - r_0[i]*r_0[i] / (norm*norm)) / norm
+
+            term_2[0] += magnitude * x
+            term_2[1] += magnitude * y
+            term_2[2] += magnitude * z
+
+            # heading of the neighbors within the radius r_0
+            if norm <= r_0[i]:
+                term_3[0] += np.cos(yaw[j])
+                term_3[1] += np.sin(yaw[j])
+
+        N = max(count, 1)
+
+        for c in range(3):
+            v[row, c] = H[i]*beta[row, c] + term_2[c]/N + H[i]*term_3[c]/N
+
+    return v
+
+
+def _neighborhoods(n, geometry):
+    """
+    Returns the block of robots and the CSR neighborhoods (start,
+    n_rows, indptr, indices, dense) of the kernels, every robot having
+    every other robot as neighbor when geometry is None.
+    """
+
+    if not available:
+        raise Exception("The numba backend requires numba (pip install numba).")
+
+    if geometry is None:
+        return 0, n, np.zeros(1, dtype=np.intp), np.zeros(0, dtype=np.intp), True
+
+    return (geometry.rows.start, geometry.n, np.ascontiguousarray(geometry.indptr, dtype=np.intp),
+            np.ascontiguousarray(geometry.j, dtype=np.intp), False)
+
+
+def _per_robot(value, n):
+    """
+    Returns a scalar or a per-robot coefficient as a contiguous array of
+    shape (n,).
+    """
+
+    return np.ascontiguousarray(np.broadcast_to(np.asarray(value, dtype=float), (n,)))
+
+
+def body_force(r, Lambda, R, geometry=None):
+    """
+    Calculates the output force of every robot based on
+    the "body force algorithm", with a compiled loop.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    Lambda : float or numpy.array
+        user-defined coefficient, a scalar or one per robot.
+
+    R : float or numpy.array
+        radii of the robots, a scalar or one per robot.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry whose robots (rows) and neighborhoods are used (its
+        distances are not), every robot having every other robot as
+        neighbor when it is not given.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the force of each robot
+    """
+
+    r = np.ascontiguousarray(r, dtype=float)
+    n = len(r)
+
+    return _body_force(r, _per_robot(Lambda, n), _per_robot(R, n), *_neighborhoods(n, geometry))
+
+
+def lennard_jones(r, epsilon, sigma, normalized=False, geometry=None):
+    """
+    Calculates the output force of every robot based on the
+    "Lennard-Jones potential algorithm", with a compiled loop.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    epsilon : float or numpy.array
+        depth of the potential well, a scalar or one per robot.
+
+    sigma : float or numpy.array
+        desired distance between the robots, a scalar or
+        one per robot.
+
+    normalized : boolean
+        boolean parameter to normalize each
+        term in the sum when normalized = True.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry whose robots (rows) and neighborhoods are used (its
+        distances are not), every robot having every other robot as
+        neighbor when it is not given.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the force of each robot
+    """
+
+    r = np.ascontiguousarray(r, dtype=float)
+    n = len(r)
+
+    return _lennard_jones(r, _per_robot(epsilon, n), _per_robot(sigma, n), bool(normalized),
+                          *_neighborhoods(n, geometry))
+
+
+def environment_exploration(r, theta, H, beta, r_0, geometry=None):
+    """
+    Calculates the new velocity of every robot based on the
+    "environment exploration algorithm", with a compiled loop.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    theta : numpy.array
+        array must have the orientations of all the robots
+        in euler angles (i.e. np.asarray([[roll1, pitch1, yaw1],
+        [roll2, pitch2, yaw2], ..., [rollN, pitchN, yawN]])).
+
+    H : float or numpy.array
+        user-defined coefficient, a scalar or one per robot.
+
+    beta : numpy.array
+        target contribution of each robot of the geometry (i.e.
+        target(r[geometry.rows], T)).
+
+    r_0 : float or numpy.array
+        user-defined radius, a scalar or one per robot.
+
+    geometry : pyswarming.geometry.Geometry
+        geometry whose robots (rows) and neighborhoods are used (its
+        distances are not), every robot having every other robot as
+        neighbor when it is not given.
+
+    Returns
+    -------
+    v : numpy.array
+        array containing the new velocity of each robot
+    """
+
+    r = np.ascontiguousarray(r, dtype=float)
+    n = len(r)
+
+    neighborhoods = _neighborhoods(n, geometry)
+
+    yaw = np.ascontiguousarray(np.asarray(theta, dtype=float)[:, 2])
+    beta = np.ascontiguousarray(np.broadcast_to(np.asarray(beta, dtype=float), (neighborhoods[1], 3)))
+
+    return _environment_exploration(r, yaw, beta, _per_robot(H, n), _per_robot(r_0, n),
+                                    *neighborhoods)
@@ -0,0 +1,499 @@
+"""
+``pyswarming.neighbors``
+========================
+
+The PySwarming neighbor functions find, for every robot, the robots it
+interacts with, so the behaviors do not need to visit every pair of the
+swarm. The robots are binned into a uniform grid of cells and only the
+robots of nearby cells are compared.
+
+The metric neighborhoods (all the robots within a radius) are returned in
+the CSR (compressed sparse row) layout: the neighbors of robot i are
+``indices[indptr[i]:indptr[i+1]]``, sorted by index. A Verlet list keeps
+the neighborhoods within a slightly larger radius across steps, so the
+cells are only rebuilt when the robots have moved enough. The topological
+neighborhoods (the k nearest robots) are returned as an (N, k) array. Both
+can be passed to ``pyswarming.geometry.Geometry`` and the CSR neighborhoods
+to the consensus functions of ``pyswarming.graph``. The robots can be split
+into groups (e.g. the replicas of ``pyswarming.swarm.Ensemble``), each robot
+only having neighbors in its own group, so the neighborhoods of every group
+are found at once.
+
+Functions present in pyswarming.neighbors are listed below.
+
+Neighbors
+---------
+
+    cell_list
+    nearest
+
+Neighbor Lists
+--------------
+
+    VerletList
+"""
+
+__all__ = ['cell_list', 'nearest', 'VerletList']
+
+import numpy as np
+
+# rings of cells searched by nearest before comparing the remaining
+# robots with every robot
+_RINGS = 2
+
+# most candidate pairs held at once by nearest
+_PAIRS = 2**20
+
+# most grids tried by nearest to size its cells
+_ATTEMPTS = 16
+
+
+def _csr(i, j, n):
+    """
+    Returns the CSR neighborhoods (indptr, indices) of the pairs (i, j),
+    the neighbors of each robot being sorted by index.
+    """
+
+    order = np.argsort(i.astype(np.int64) * n + j)
+
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(i, minlength=n))))
+
+    return indptr, j[order]
+
+
+def _groups(n, group=None):
+    """
+    Returns the group of each robot numbered from 0, every robot being
+    in group 0 when group is None.
+    """
+
+    if group is None:
+        return np.zeros(n, dtype=np.int64)
+
+    group = np.asarray(group)
+
+    if group.shape != (n,):
+        raise Exception("The group must have one value per robot.")
+
+    return np.unique(group, return_inverse=True)[1].ravel().astype(np.int64)
+
+
+def _grid(r, size, group):
+    """
+    Bins the robots into cubic cells of the given size and returns a
+    dict with the occupied cells, each one holding a run of the robots
+    sorted by cell. The cells are numbered by the rank of their
+    coordinates among the occupied ones along each axis, so the keys
+    stay small however far apart the robots are, and the cells of each
+    group are numbered after those of the previous groups.
+    """
+
+    cell = np.floor((r - np.min(r, axis=0)) / size).astype(np.int64)
+
+    axes = [np.unique(cell[:, axis]) for axis in range(3)]
+    dims = np.asarray([len(coordinates) for coordinates in axes], dtype=np.int64)
+    strides = np.asarray([dims[1]*dims[2], dims[2], 1])
+
+    grid = {'axes': axes, 'dims': dims, 'strides': strides}
+
+    base = group * np.prod(dims)
+    key = _key(grid, cell)[0] + base
+
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+
+    first = np.flatnonzero(np.concatenate(([True], sorted_key[1:] != sorted_key[:-1])))
+
+    robot_cell = np.empty(len(r), dtype=np.intp)
+    robot_cell[order] = np.repeat(np.arange(len(first)), np.diff(np.concatenate((first, [len(r)]))))
+
+    grid.update({'order': order,
+                 'cell': cell[order[first]],
+                 'base': base[order[first]],
+                 'key': sorted_key[first],
+                 'first': first,
+                 'count': np.diff(np.concatenate((first, [len(r)]))),
+                 'robot_cell': robot_cell})
+
+    return grid
+
+
+def _key(grid, cell):
+    """
+    Returns the key of each cell and whether its coordinates are
+    occupied along every axis (a cell that is not cannot hold robots).
+    """
+
+    key = np.zeros(len(cell), dtype=np.int64)
+    valid = np.ones(len(cell), dtype=bool)
+
+    for axis, coordinates in enumerate(grid['axes']):
+        rank = np.minimum(np.searchsorted(coordinates, cell[:, axis]), len(coordinates) - 1)
+        valid &= coordinates[rank] == cell[:, axis]
+        key += rank * grid['strides'][axis]
+
+    return key, valid
+
+
+def _offsets(grid, s):
+    """
+    Returns the offsets of the cells at most s cells away along each
+    axis, the axes with a single cell being skipped.
+    """
+
+    steps = [np.arange(-s, s + 1) if d > 1 else np.zeros(1, dtype=np.int64) for d in grid['dims']]
+
+    return np.stack(np.meshgrid(*steps, indexing='ij'), axis=-1).reshape(-1, 3)
+
+
+def _candidates(grid, q, offsets):
+    """
+    Returns the pairs (i, j) of the query robots q and every robot in
+    the cells at the given offsets of their cell (in their group), i
+    included.
+    """
+
+    n_cells = len(grid['key'])
+
+    # only the cells of the query robots are looked up
+    cells, q_cell = np.unique(grid['robot_cell'][q], return_inverse=True)
+    q_cell = q_cell.ravel()
+
+    i_all = []
+    j_all = []
+
+    for offset in offsets:
+        neighbor_key, valid = _key(grid, grid['cell'][cells] + offset)
+        neighbor_key += grid['base'][cells]
+
+        neighbor = np.minimum(np.searchsorted(grid['key'], neighbor_key), n_cells - 1)
+        found = valid & (grid['key'][neighbor] == neighbor_key)
+
+        start = np.where(found, grid['first'][neighbor], 0)[q_cell]
+        count = np.where(found, grid['count'][neighbor], 0)[q_cell]
+        total = np.sum(count)
+
+        if total == 0:
+            continue
+
+        # expand the ranges [start, start + count) of every query robot
+        i_all.append(np.repeat(q, count))
+        j_all.append(grid['order'][np.repeat(start - np.cumsum(count) + count, count) + np.arange(total)])
+
+    if len(i_all) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+    return np.concatenate(i_all), np.concatenate(j_all)
+
+
+def cell_list(r, cutoff, group=None):
+    """
+    Finds the neighbors of every robot within a cutoff radius. The
+    robots are binned into cells of side cutoff, so only the robots in
+    the same or adjacent cells are compared, and the cost grows with
+    the number of robots instead of the number of pairs.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    cutoff : float
+        interaction radius (cutoff > 0), the robots at a distance
+        smaller or equal to cutoff being neighbors.
+
+    group : numpy.array
+        optional group of each robot, shape (N,), the robots only
+        being neighbors of the robots of their own group.
+
+    Returns
+    -------
+    indptr : numpy.array
+        CSR row pointers, shape (N + 1,).
+
+    indices : numpy.array
+        neighbors of each robot, shape (number of pairs,).
+    """
+
+    if cutoff <= 0:
+        raise Exception("The cutoff radius must be greater than 0 (cutoff > 0).")
+
+    r = np.asarray(r, dtype=float)
+
+    n = len(r)
+
+    grid = _grid(r, cutoff, _groups(n, group))
+
+    # the robots are queried in cell order, so the lookups stay local
+    i, j = _candidates(grid, grid['order'], _offsets(grid, 1))
+
+    d2 = np.sum(np.power(r[j] - r[i], 2), axis=1)
+    keep = (i != j) & (d2 <= cutoff**2)
+
+    return _csr(i[keep], j[keep], n)
+
+
+def _occupied_grid(r, k, group):
+    """
+    Returns the grid of the k nearest neighbor search, its cells holding
+    about k robots. The size is first taken from the bounding box, then
+    reduced until the cell of a robot holds about k robots on average,
+    so clusters and outliers do not leave most robots in a few cells.
+    """
+
+    n = len(r)
+
+    span = np.ptp(r, axis=0)
+    extent = span[span > 0]
+
+    if len(extent) == 0:
+        return _grid(r, 1.0, group), 1.0
+
+    # the groups overlap, so each one fills the bounding box
+    size = np.power(np.prod(extent) * k * (np.max(group) + 1) / n, 1.0 / len(extent))
+
+    for attempt in range(_ATTEMPTS):
+        grid = _grid(r, size, group)
+
+        # number of robots in the cell of a robot, averaged over the
+        # robots instead of the cells (about k + 1 for a uniform swarm)
+        occupancy = np.sum(np.power(grid['count'], 2.0)) / n
+        if occupancy <= 2 * k or attempt == _ATTEMPTS - 1:
+            break
+
+        size = size * np.power(k / occupancy, 1.0 / len(extent))
+
+    return grid, size
+
+
+def _nearest_rings(r, k, grid, size, query, s, indices):
+    """
+    Searches the k nearest neighbors of the query robots in the cells
+    at most s cells away, writing them into indices, and returns the
+    query robots whose k-th neighbor may lie farther.
+    """
+
+    n = len(r)
+
+    offsets = _offsets(grid, s)
+
+    # blocks of query robots with a bounded number of candidate pairs
+    block = max(1, _PAIRS // (len(offsets) * int(np.max(grid['count']))))
+
+    missing = []
+
+    for first in range(0, len(query), block):
+        q = query[first:first + block]
+
+        i, j = _candidates(grid, q, offsets)
+
+        keep = i != j
+        i, j = i[keep], j[keep]
+        d2 = np.sum(np.power(r[j] - r[i], 2), axis=1)
+
+        # candidates of each robot by increasing distance, the robots
+        # being kept in query order
+        position = np.empty(n, dtype=np.intp)
+        position[q] = np.arange(len(q))
+
+        order = np.lexsort((d2, position[i]))
+        i, j, d2 = i[order], j[order], d2[order]
+
+        count = np.bincount(position[i], minlength=len(q))
+        start = np.concatenate(([0], np.cumsum(count)[:-1]))
+
+        # the robots outside the searched cells are farther than s cells
+        found = count >= k
+        found[found] = d2[start[found] + k - 1] <= (s * size)**2
+
+        rows = start[found][:, np.newaxis] + np.arange(k)
+        indices[q[found]] = j[rows]
+
+        missing.append(q[~found])
+
+    return np.concatenate(missing) if len(missing) > 0 else query
+
+
+def _nearest_all(r, k, group, query, indices):
+    """
+    Finds the k nearest neighbors of the query robots by comparing them
+    with every robot of their group, a block of query robots at a time.
+    """
+
+    members = np.argsort(group, kind='stable')
+    bounds = np.searchsorted(group[members], np.arange(np.max(group) + 2))
+
+    query = query[np.argsort(group[query], kind='stable')]
+    first_query = np.searchsorted(group[query], np.arange(np.max(group) + 2))
+
+    for g in np.flatnonzero(np.diff(first_query)):
+        robots = members[bounds[g]:bounds[g + 1]]
+        q_g = query[first_query[g]:first_query[g + 1]]
+
+        block = max(1, _PAIRS // len(robots))
+
+        for first in range(0, len(q_g), block):
+            q = q_g[first:first + block]
+
+            d2 = np.sum(np.power(r[robots][np.newaxis] - r[q][:, np.newaxis], 2), axis=2)
+            d2[q[:, np.newaxis] == robots[np.newaxis]] = np.inf
+
+            indices[q] = robots[np.argpartition(d2, k - 1, axis=1)[:, :k]]
+
+
+def nearest(r, k, group=None):
+    """
+    Finds the k nearest neighbors of every robot (topological
+    neighborhood). The cells are sized to hold about k robots and the
+    search grows ring by ring around the cell of each robot until the
+    k-th neighbor is closer than every robot outside the searched cells,
+    so the result is exact. The few robots still missing neighbors after
+    the first rings (e.g. isolated robots) are compared with every robot.
+    The candidate pairs are processed in blocks, so the memory stays
+    bounded whatever the distribution of the robots.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    k : int
+        number of neighbors of each robot (0 < k < N).
+
+    group : numpy.array
+        optional group of each robot, shape (N,), the neighbors of a
+        robot being taken from its own group (then k must be smaller
+        than the number of robots of every group).
+
+    Returns
+    -------
+    indices : numpy.array
+        neighbors of each robot, shape (N, k), each row being
+        sorted by index.
+    """
+
+    r = np.asarray(r, dtype=float)
+
+    n = len(r)
+
+    group = _groups(n, group)
+
+    if k < 1 or k >= np.min(np.bincount(group)):
+        raise Exception("The number of neighbors must be in [1, N) (0 < k < N).")
+
+    grid, size = _occupied_grid(r, k, group)
+
+    indices = np.empty((n, k), dtype=np.intp)
+
+    query = grid['order']
+
+    for s in range(1, _RINGS + 1):
+        if len(query) == 0:
+            break
+        query = _nearest_rings(r, k, grid, size, query, s, indices)
+
+    _nearest_all(r, k, group, query, indices)
+
+    return np.sort(indices, axis=1)
+
+
+class VerletList:
+    """
+    Creates a Verlet neighbor list, reused across steps. The pairs within
+    cutoff + skin are found with a cell list and kept until a robot has
+    moved more than skin / 2 since the last build; until then, every pair
+    within cutoff is guaranteed to be in the list, and each update only
+    filters the listed pairs by distance.
+
+    Parameters
+    ----------
+    cutoff : float
+        interaction radius (cutoff > 0), the robots at a distance
+        smaller or equal to cutoff being neighbors.
+
+    skin : float
+        extra distance (skin >= 0) of the list. A larger skin gives
+        fewer rebuilds but more pairs to filter at each update.
+
+    group : numpy.array
+        optional group of each robot, the robots only being neighbors
+        of the robots of their own group.
+
+    Attributes
+    ----------
+    rebuilds : int
+        number of times the list was built.
+
+    updates : int
+        number of calls to update.
+    """
+
+    def __init__(self, cutoff, skin, group=None):
+
+        if cutoff <= 0:
+            raise Exception("The cutoff radius must be greater than 0 (cutoff > 0).")
+
+        if skin < 0:
+            raise Exception("The skin must be nonnegative (skin >= 0).")
+
+        self.cutoff = cutoff
+        self.skin = skin
+        self.group = group
+        self.rebuilds = 0
+        self.updates = 0
+
+        self._r = None
+
+    def _rebuild(self, r):
+
+        indptr, indices = cell_list(r, self.cutoff + self.skin, self.group)
+
+        self._r = r.copy()
+        self._i = np.repeat(np.arange(len(r)), np.diff(indptr))
+        self._j = indices
+
+        self.rebuilds += 1
+
+    def update(self, r):
+        """
+        Returns the neighbors of every robot within the cutoff radius,
+        rebuilding the list first if a robot has moved more than half
+        the skin since the last build.
+
+        Parameters
+        ----------
+        r : numpy.array
+            array must have the positions of all the robots in
+            cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+            [x2, y2, z2], ..., [xN, yN, zN]])).
+
+        Returns
+        -------
+        indptr : numpy.array
+            CSR row pointers, shape (N + 1,).
+
+        indices : numpy.array
+            neighbors of each robot, shape (number of pairs,).
+        """
+
+        r = np.asarray(r, dtype=float)
+
+        if self._r is None or self._r.shape != r.shape:
+            self._rebuild(r)
+        else:
+            displacement = np.max(np.sum(np.power(r - self._r, 2), axis=1))
+            if displacement > (0.5 * self.skin)**2:
+                self._rebuild(r)
+
+        self.updates += 1
+
+        d2 = np.sum(np.power(r[self._j] - r[self._i], 2), axis=1)
+        keep = d2 <= self.cutoff**2
+
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(self._i[keep], minlength=len(r)))))
+
+        return indptr, self._j[keep]
@@ -0,0 +1,609 @@
+"""
+``pyswarming.regions``
+========================
+
+The PySwarming regions are the areas "A" used by the geofencing and area
+coverage behaviors. A region is a function that is negative inside the
+area and positive outside of it, together with its gradient. The built-in
+regions have closed-form gradients and are evaluated for all the robots at
+once; a plain function can also be registered, with or without its gradient.
+
+Every region can be passed as ``A`` to ``pyswarming.behaviors.geofencing``,
+``pyswarming.behaviors.area_coverage`` and their batched counterparts.
+
+For a region with no analytic gradient, ``rasterize`` samples it once over
+the deployment bounds and answers every evaluation by interpolation on the
+grid, instead of differentiating the function numerically on every step.
+
+Functions present in pyswarming.regions are listed below.
+
+Regions
+-------
+
+    Region
+    FunctionRegion
+    Sphere
+    Ellipsoid
+    Box
+    HalfSpace
+    Polygon
+    GridRegion
+    as_region
+    rasterize
+"""
+
+__all__ = ['Region', 'FunctionRegion', 'Sphere', 'Ellipsoid', 'Box', 'HalfSpace',
+           'Polygon', 'GridRegion', 'as_region', 'rasterize']
+
+import numpy as np
+
+from numdifftools import Gradient
+
+# most (robot, bounding box) pairs tested at once by Polygon
+_BOX_PAIRS = 2**18
+
+
+class Region:
+    """
+    Base class of the regions. Subclasses implement ``_evaluate`` and
+    ``_gradient`` for positions of shape (N, 3); calling the region or
+    its ``gradient`` also accepts a single position of shape (3,).
+    """
+
+    def __call__(self, x):
+        """
+        Evaluates the region function A at x, shape (3,) or (N, 3).
+        """
+
+        x = np.asarray(x, dtype=float)
+
+        if x.ndim == 1:
+            return self._evaluate(x[np.newaxis, :])[0]
+
+        return self._evaluate(x)
+
+    def gradient(self, x):
+        """
+        Evaluates the gradient of A at x, shape (3,) or (N, 3).
+        """
+
+        x = np.asarray(x, dtype=float)
+
+        if x.ndim == 1:
+            return self._gradient(x[np.newaxis, :])[0]
+
+        return self._gradient(x)
+
+    def _evaluate(self, x):
+        raise NotImplementedError
+
+    def _gradient(self, x):
+        raise NotImplementedError
+
+
+class FunctionRegion(Region):
+    """
+    Region defined by a user function A and, optionally, its gradient.
+    When grad_A is not given, the numdifftools Gradient of A is built
+    once and reused in every evaluation.
+
+    Parameters
+    ----------
+    A : function
+        function of the interested region, negative inside it.
+        e.g. A = lambda x: x[0]**2 + x[1]**2 + x[2]**2 - 4.0
+
+    grad_A : function
+        gradient of A, returning an array with the three partial
+        derivatives. e.g. grad_A = lambda x: np.asarray([2*x[0], 2*x[1], 2*x[2]])
+
+    vectorized : boolean
+        when True, A and grad_A are written with numpy operations and
+        are called once with x[0], x[1] and x[2] being the coordinates of
+        all the robots (i.e. x has shape (3, N)); otherwise they are
+        called once per robot.
+    """
+
+    def __init__(self, A, grad_A=None, vectorized=False):
+
+        self.A = A
+        self.vectorized = vectorized
+
+        if grad_A is None:
+            self.grad_A = Gradient(A)
+        else:
+            self.grad_A = grad_A
+
+        # the numdifftools gradient is always evaluated robot by robot
+        self._vectorized_gradient = vectorized and grad_A is not None
+
+    def _evaluate(self, x):
+
+        if self.vectorized:
+            return np.broadcast_to(np.asarray(self.A(x.T), dtype=float), (len(x),))
+
+        return np.asarray([self.A(x_i) for x_i in x], dtype=float)
+
+    def _gradient(self, x):
+
+        if self._vectorized_gradient:
+            return np.asarray(self.grad_A(x.T), dtype=float).T
+
+        return np.asarray([self.grad_A(x_i) for x_i in x], dtype=float)
+
+
+class Sphere(Region):
+    """
+    Spherical region, A(x) = |x - center|^2 - radius^2.
+
+    Parameters
+    ----------
+    center : numpy.array
+        center of the sphere in cartesian coordinates.
+
+    radius : float
+        radius of the sphere.
+    """
+
+    def __init__(self, center, radius):
+
+        self.center = np.asarray(center, dtype=float)
+        self.radius = float(radius)
+
+    def _evaluate(self, x):
+
+        return np.sum(np.power(x - self.center, 2), axis=1) - self.radius**2
+
+    def _gradient(self, x):
+
+        return 2.0 * (x - self.center)
+
+
+class Ellipsoid(Region):
+    """
+    Ellipsoidal region, A(x) = sum(((x - center) / semi_axes)^2) - 1.
+
+    Parameters
+    ----------
+    center : numpy.array
+        center of the ellipsoid in cartesian coordinates.
+
+    semi_axes : numpy.array
+        semi-axes of the ellipsoid along x, y and z.
+    """
+
+    def __init__(self, center, semi_axes):
+
+        self.center = np.asarray(center, dtype=float)
+        self.semi_axes = np.asarray(semi_axes, dtype=float)
+
+    def _evaluate(self, x):
+
+        return np.sum(np.power((x - self.center) / self.semi_axes, 2), axis=1) - 1.0
+
+    def _gradient(self, x):
+
+        return 2.0 * (x - self.center) / np.power(self.semi_axes, 2)
+
+
+class Box(Region):
+    """
+    Axis-aligned box region, A(x) being the signed distance to the
+    box surface.
+
+    Parameters
+    ----------
+    lower : numpy.array
+        lower corner of the box [x_min, y_min, z_min].
+
+    upper : numpy.array
+        upper corner of the box [x_max, y_max, z_max].
+    """
+
+    def __init__(self, lower, upper):
+
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.center = (self.lower + self.upper) / 2.0
+        self.half_size = (self.upper - self.lower) / 2.0
+
+    def _evaluate(self, x):
+
+        q = np.abs(x - self.center) - self.half_size
+
+        outside = np.linalg.norm(np.maximum(q, 0.0), axis=1)
+        inside = np.minimum(np.max(q, axis=1), 0.0)
+
+        return outside + inside
+
+    def _gradient(self, x):
+
+        x_c = x - self.center
+        q = np.abs(x_c) - self.half_size
+
+        # outside: direction to the closest point of the box
+        q_out = np.maximum(q, 0.0)
+        norm_q_out = np.linalg.norm(q_out, axis=1)
+
+        # inside: normal of the closest face
+        q_in = np.zeros(q.shape)
+        q_in[np.arange(len(q)), np.argmax(q, axis=1)] = 1.0
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            direction = np.where((norm_q_out > 0.0)[:, np.newaxis],
+                                 q_out / norm_q_out[:, np.newaxis], q_in)
+
+        return np.where(x_c < 0.0, -1.0, 1.0) * direction
+
+
+class HalfSpace(Region):
+    """
+    Half-space region, A(x) = normal . (x - point), i.e. the region is
+    the side opposite to the normal.
+
+    Parameters
+    ----------
+    point : numpy.array
+        a point of the boundary plane.
+
+    normal : numpy.array
+        outward normal of the boundary plane.
+    """
+
+    def __init__(self, point, normal):
+
+        self.point = np.asarray(point, dtype=float)
+        self.normal = np.asarray(normal, dtype=float) / np.linalg.norm(normal)
+
+    def _evaluate(self, x):
+
+        return (x - self.point) @ self.normal
+
+    def _gradient(self, x):
+
+        return np.broadcast_to(self.normal, x.shape).copy()
+
+
+class Polygon(Region):
+    """
+    Polygonal region in the xy plane (extruded along z), A(x) being the
+    signed distance to the polygon boundary. The edges are precomputed
+    and grouped in blocks of consecutive edges with a bounding box, so
+    only the blocks that may hold the closest edge of a robot are
+    evaluated.
+
+    Parameters
+    ----------
+    vertices : numpy.array
+        array with the polygon vertices in order (i.e.
+        np.asarray([[x1, y1], [x2, y2], ..., [xM, yM]])). The polygon
+        is closed automatically and must not self-intersect.
+
+    edges_per_box : int
+        number of consecutive edges grouped in each bounding box.
+    """
+
+    def __init__(self, vertices, edges_per_box=16):
+
+        vertices = np.asarray(vertices, dtype=float)[:, :2]
+
+        if len(vertices) < 3:
+            raise Exception("A polygon must have at least 3 vertices.")
+
+        # counter-clockwise order, so the edge normals point outward
+        x, y = vertices[:, 0], vertices[:, 1]
+        if np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y) < 0.0:
+            vertices = vertices[::-1]
+
+        self.vertices = vertices
+
+        a = vertices
+        b = np.roll(vertices, -1, axis=0)
+        ab = b - a
+        ab_len = np.linalg.norm(ab, axis=1)
+
+        if (ab_len == 0.0).any():
+            raise Exception("The polygon has repeated consecutive vertices.")
+
+        edge_normal = np.stack((ab[:, 1], -ab[:, 0]), axis=1) / ab_len[:, np.newaxis]
+
+        # pseudo-normal of each vertex, used when the closest point is a vertex
+        vertex_normal = edge_normal + np.roll(edge_normal, 1, axis=0)
+        vertex_normal /= np.linalg.norm(vertex_normal, axis=1)[:, np.newaxis]
+
+        # pad the edges to whole boxes by repeating the last edge
+        M = len(a)
+        n_boxes = -(-M // edges_per_box)
+        index = np.minimum(np.arange(n_boxes * edges_per_box), M - 1).reshape(n_boxes, edges_per_box)
+
+        self._a = a[index]
+        self._ab = ab[index]
+        self._ab_len2 = np.power(ab_len, 2)[index]
+        self._edge_normal = edge_normal[index]
+        self._vertex_normal_a = vertex_normal[index]
+        self._vertex_normal_b = np.roll(vertex_normal, -1, axis=0)[index]
+
+        ends = np.concatenate((self._a, self._a + self._ab), axis=1)
+        self._box_lower = np.min(ends, axis=1)
+        self._box_upper = np.max(ends, axis=1)
+
+    def _segments(self, p, box):
+        """
+        Returns the vectors from the closest points of the edges of the
+        given boxes to the positions p, their squared lengths and the
+        position t along each edge.
+        """
+
+        p_a = p[:, np.newaxis, :] - self._a[box]
+        t = np.clip(np.sum(p_a * self._ab[box], axis=2) / self._ab_len2[box], 0.0, 1.0)
+        d = p_a - t[:, :, np.newaxis] * self._ab[box]
+
+        return d, np.sum(np.power(d, 2), axis=2), t
+
+    def _closest(self, x):
+        """
+        Returns the vector from the closest boundary point to each position,
+        its length and the outward normal at the closest point.
+        """
+
+        p = x[:, :2]
+
+        # blocks of robots with a bounded number of (robot, box) pairs
+        block = max(1, _BOX_PAIRS // len(self._a))
+
+        if len(p) <= block:
+            return self._closest_block(p)
+
+        closest = [self._closest_block(p[first:first + block]) for first in range(0, len(p), block)]
+
+        return tuple(np.concatenate(values) for values in zip(*closest))
+
+    def _closest_block(self, p):
+
+        # the distance to a bounding box is a lower bound of the distance
+        # to its edges, and the distance to the edges of the nearest box
+        # an upper bound of the distance to the boundary
+        outside_box = np.maximum(np.maximum(self._box_lower - p[:, np.newaxis, :],
+                                            p[:, np.newaxis, :] - self._box_upper), 0.0)
+        lower_bound = np.linalg.norm(outside_box, axis=2)
+
+        nearest_box = np.argmin(lower_bound, axis=1)
+        upper_bound = np.sqrt(np.min(self._segments(p, nearest_box)[1], axis=1))
+
+        robot, box = np.nonzero(lower_bound <= upper_bound[:, np.newaxis])
+
+        d, d2, t = self._segments(p[robot], box)
+
+        # closest edge within each candidate box, then closest box per robot
+        edge = np.argmin(d2, axis=1)
+        candidate = np.arange(len(robot))
+        d2 = d2[candidate, edge]
+
+        order = np.lexsort((d2, robot))
+        best = order[np.unique(robot[order], return_index=True)[1]]
+
+        box, edge, t_best = box[best], edge[best], t[best, edge[best]]
+
+        normal = np.where((t_best <= 0.0)[:, np.newaxis], self._vertex_normal_a[box, edge],
+                          np.where((t_best >= 1.0)[:, np.newaxis], self._vertex_normal_b[box, edge],
+                                   self._edge_normal[box, edge]))
+
+        return d[best, edge], np.sqrt(d2[best]), normal
+
+    def _evaluate(self, x):
+
+        d, norm_d, normal = self._closest(x)
+
+        inside = np.sum(d * normal, axis=1) < 0.0
+
+        return np.where(inside, -norm_d, norm_d)
+
+    def _gradient(self, x):
+
+        d, norm_d, normal = self._closest(x)
+
+        inside = np.sum(d * normal, axis=1) < 0.0
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            grad = np.where((norm_d > 0.0)[:, np.newaxis], d / norm_d[:, np.newaxis], normal)
+
+        grad = np.where(inside[:, np.newaxis], -grad, grad)
+
+        return np.concatenate((grad, np.zeros((len(x), 1))), axis=1)
+
+
+class GridRegion(Region):
+    """
+    Region sampled on a regular grid. A is evaluated once at the grid
+    nodes, its gradient is taken by finite differences of the samples,
+    and both are answered by bilinear/trilinear interpolation. Positions
+    outside the bounds are clamped to the bounds.
+
+    Parameters
+    ----------
+    A : function or Region
+        function of the interested region or a region object.
+
+    bounds : list
+        list containing two lists with the grid limits, where the first
+        list is the lower limit [x_min, y_min, z_min] and the second is
+        the upper limit [x_max, y_max, z_max]. An axis whose limits are
+        equal (e.g. z in a 2D swarm) has a single node and a null
+        gradient component.
+
+    resolution : float or list
+        grid spacing, a scalar or one per axis.
+    """
+
+    def __init__(self, A, bounds, resolution):
+
+        self.source = as_region(A)
+        self.lower = np.asarray(bounds[0], dtype=float)
+        self.upper = np.asarray(bounds[1], dtype=float)
+
+        resolution = np.broadcast_to(np.asarray(resolution, dtype=float), (3,))
+
+        if (self.upper < self.lower).any() or (resolution <= 0.0).any():
+            raise Exception("Invalid grid bounds or resolution.")
+
+        self.shape = tuple(int(np.ceil((hi - lo) / res)) + 1 if hi > lo else 1
+                           for lo, hi, res in zip(self.lower, self.upper, resolution))
+        self.nodes = [np.linspace(lo, hi, m) for lo, hi, m in zip(self.lower, self.upper, self.shape)]
+        self.spacing = np.asarray([ax[1] - ax[0] if len(ax) > 1 else 1.0 for ax in self.nodes])
+
+        x = np.stack(np.meshgrid(*self.nodes, indexing='ij'), axis=-1).reshape(-1, 3)
+
+        values = self.source(x).reshape(self.shape)
+
+        # value and the three gradient components of each node
+        self.samples = np.zeros(self.shape + (4,))
+        self.samples[..., 0] = values
+        for k in range(3):
+            if self.shape[k] > 1:
+                self.samples[..., k + 1] = np.gradient(values, self.nodes[k], axis=k,
+                                                       edge_order=2 if self.shape[k] > 2 else 1)
+
+    def _interpolate(self, x):
+
+        t = np.clip((x - self.lower) / self.spacing, 0.0, np.asarray(self.shape) - 1.0)
+
+        i0 = np.minimum(np.floor(t).astype(np.intp), np.maximum(np.asarray(self.shape) - 2, 0))
+        frac = t - i0
+        i1 = np.minimum(i0 + 1, np.asarray(self.shape) - 1)
+
+        out = np.zeros((len(x), 4))
+
+        for corner in range(8):
+            bits = [(corner >> k) & 1 for k in range(3)]
+            index = tuple(np.where(bit, i1[:, k], i0[:, k]) for k, bit in enumerate(bits))
+            weight = np.prod([frac[:, k] if bit else 1.0 - frac[:, k] for k, bit in enumerate(bits)], axis=0)
+            out += weight[:, np.newaxis] * self.samples[index]
+
+        return out
+
+    def _evaluate(self, x):
+
+        return self._interpolate(x)[:, 0]
+
+    def _gradient(self, x):
+
+        return self._interpolate(x)[:, 1:]
+
+    def error_estimate(self, samples=100, seed=0):
+        """
+        Estimates the interpolation error by comparing the grid with
+        the source region at random positions within the bounds.
+
+        Parameters
+        ----------
+        samples : int
+            number of random positions.
+
+        seed : int
+            seed of the random positions.
+
+        Returns
+        -------
+        error : dict
+            maximum absolute error of the region value ('value') and
+            of the unit gradient used by geofencing ('gradient').
+        """
+
+        x = np.random.default_rng(seed).uniform(self.lower, self.upper, size=(samples, 3))
+
+        grad_grid = self._gradient(x)
+        grad_source = np.asarray(self.source.gradient(x), dtype=float)
+        for k in range(3):
+            if self.shape[k] == 1:
+                grad_source[:, k] = 0.0
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            unit_grid = grad_grid / np.linalg.norm(grad_grid, axis=1)[:, np.newaxis]
+            unit_source = grad_source / np.linalg.norm(grad_source, axis=1)[:, np.newaxis]
+
+        error = {'value': np.max(np.abs(self._evaluate(x) - self.source(x))),
+                 'gradient': np.nanmax(np.abs(unit_grid - unit_source))}
+
+        return error
+
+
+def as_region(A):
+    """
+    Returns A as a region. A plain function is wrapped in a
+    FunctionRegion which is kept on the function itself, so the
+    numdifftools Gradient is not rebuilt on every call and is released
+    with the function.
+
+    Parameters
+    ----------
+    A : function or Region
+        function of the interested region or a region object.
+
+    Returns
+    -------
+    region : Region
+        object with the region function and its gradient.
+    """
+
+    # duck typing, pyswarming modules can be imported twice (see __init__)
+    if hasattr(A, 'gradient'):
+        return A
+
+    region = getattr(A, '_pyswarming_region', None)
+
+    # a bound method sees the attributes of its function, whose region
+    # belongs to the function and not to the method
+    if region is None or region.A is not A:
+        region = FunctionRegion(A)
+        try:
+            A._pyswarming_region = region
+        except AttributeError: # e.g. builtin functions and bound methods
+            pass
+
+    return region
+
+
+def rasterize(A, bounds, resolution):
+    """
+    Returns a GridRegion of A. The last grid of a region is kept on
+    the region itself with its bounds and resolution, so calling
+    rasterize on every step only samples A once and the grid is
+    released with the region; a different region or bounds builds a
+    new grid.
+
+    Parameters
+    ----------
+    A : function or Region
+        function of the interested region or a region object.
+
+    bounds : list
+        list containing two lists with the grid limits, where the first
+        list is the lower limit [x_min, y_min, z_min] and the second is
+        the upper limit [x_max, y_max, z_max].
+
+    resolution : float or list
+        grid spacing, a scalar or one per axis.
+
+    Returns
+    -------
+    region : GridRegion
+        region interpolated on the grid.
+    """
+
+    lower = tuple(float(b) for b in bounds[0])
+    upper = tuple(float(b) for b in bounds[1])
+    resolution = tuple(np.broadcast_to(np.asarray(resolution, dtype=float), (3,)).tolist())
+
+    key, region = getattr(A, '_pyswarming_grid', (None, None))
+
+    # the grid samples as_region(A), which is A itself for a region and
+    # the FunctionRegion kept on a function; a bound method sees the
+    # attributes of its function, whose grid does not belong to the method
+    if key != (lower, upper, resolution) or region.source is not as_region(A):
+        region = GridRegion(A, [lower, upper], resolution)
+        try:
+            A._pyswarming_grid = ((lower, upper, resolution), region)
+        except AttributeError: # e.g. builtin functions and bound methods
+            pass
+
+    return region
@@ -0,0 +1,136 @@
+"""
+``pyswarming.state``
+========================
+
+The PySwarming swarm state holds the robots of a swarm as a structure of
+arrays: the positions, headings and velocities are separate contiguous
+(N, 3) arrays, updated in place at every step, together with a scratch
+workspace of preallocated arrays reused across steps. The (N, 6) pose
+[x, y, z, roll, pitch, yaw] used by pyswarming.swarm is assembled from
+the positions and headings when it is requested.
+
+Functions present in pyswarming.state are listed below.
+
+State
+-----
+
+    SwarmState
+"""
+
+__all__ = ['SwarmState']
+
+import numpy as np
+
+
+class SwarmState:
+    """
+    Creates the state of a swarm of n robots.
+
+    Parameters
+    ----------
+    n : int
+        number of robots.
+
+    dtype : {numpy.float64, numpy.float32}
+        floating point type of the arrays.
+
+    Attributes
+    ----------
+    position : numpy.array
+        positions of the robots in cartesian coordinates, shape (n, 3).
+
+    heading : numpy.array
+        orientations of the robots in euler angles (roll, pitch, yaw),
+        shape (n, 3).
+
+    velocity : numpy.array
+        velocities of the robots over the last step, shape (n, 3).
+    """
+
+    def __init__(self, n, dtype=np.float64):
+
+        dtype = np.dtype(dtype)
+
+        if dtype not in (np.dtype(np.float64), np.dtype(np.float32)):
+            raise Exception("The dtype must be float64 or float32.")
+
+        self.n = n
+        self.dtype = dtype
+
+        self.position = np.zeros((n, 3), dtype=dtype)
+        self.heading = np.zeros((n, 3), dtype=dtype)
+        self.velocity = np.zeros((n, 3), dtype=dtype)
+
+        self._workspace = {}
+
+    def workspace(self, name, shape=None):
+        """
+        Returns the preallocated scratch array of the given name, created
+        on the first request and reused afterwards.
+
+        Parameters
+        ----------
+        name : str
+            name of the array.
+
+        shape : tuple
+            shape of the array, (n, 3) by default.
+
+        Returns
+        -------
+        array : numpy.array
+            scratch array, whose content is left from its last use
+        """
+
+        if shape is None:
+            shape = (self.n, 3)
+
+        array = self._workspace.get(name)
+
+        if array is None or array.shape != tuple(shape):
+            array = np.empty(shape, dtype=self.dtype)
+            self._workspace[name] = array
+
+        return array
+
+    def get_pose(self, out=None):
+        """
+        Returns the pose of the robots, i.e. the positions and headings
+        as one array.
+
+        Parameters
+        ----------
+        out : numpy.array
+            optional (n, 6) array where the pose is written.
+
+        Returns
+        -------
+        pose : numpy.array
+            array containing the pose of each robot, shape (n, 6)
+        """
+
+        if out is None:
+            out = np.empty((self.n, 6), dtype=self.dtype)
+
+        out[:, :3] = self.position
+        out[:, 3:] = self.heading
+
+        return out
+
+    def set_pose(self, pose):
+        """
+        Writes the positions and headings from a pose.
+
+        Parameters
+        ----------
+        pose : numpy.array
+            array containing the pose of each robot, shape (n, 6).
+        """
+
+        pose = np.asarray(pose)
+
+        if pose.shape != (self.n, 6):
+            raise Exception("The pose must have shape (n, 6).")
+
+        self.position[...] = pose[:, :3]
+        self.heading[...] = pose[:, 3:]
@@ -12,17 +12,239 @@ Functions present in pyswarming.swarm are listed below.
 Swarm
 ---------
 
+   step
+   iter_steps
    simulate
+   attach
+   detach
+   record
+   save_checkpoint
+   load_checkpoint
+   close
+
+Ensemble
+---------
+
+   run
 
 """
 
-__all__ = ['Swarm']
+__all__ = ['Swarm', 'Ensemble']
+
+import concurrent.futures
+import json
 
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 
-import behaviors as bh
+import batched as bt
+import geometry as gm
+import neighbors as nb
+import state as st
+import trajectory as tj
+
+
+# Builders of the execution plan. Each one binds the parameters of a
+# behavior and returns a function (r, theta, geometry, rows) -> (n, 3)
+# evaluating the behavior for the block of robots rows (a slice start:stop),
+# where geometry returns the geometry of the block when it is called.
+
+def _plan_aggregation(parameters, sparse):
+    return lambda r, theta, geometry, rows: bt.aggregation(r, geometry())
+
+
+def _plan_repulsion(parameters, sparse):
+    alpha, d = float(parameters['alpha']), parameters['d']
+    return lambda r, theta, geometry, rows: bt.repulsion(r, alpha, d, geometry())
+
+
+def _plan_target(parameters, sparse):
+    T = np.asarray(parameters['T'], dtype=float)
+    return lambda r, theta, geometry, rows: bt.target(r[rows], T)
+
+
+def _plan_collective_navigation(parameters, sparse):
+    T = np.asarray(parameters['T'], dtype=float)
+    alpha, d = float(parameters['alpha']), parameters['d']
+    return lambda r, theta, geometry, rows: bt.collective_navigation(r, T, alpha, d, geometry())
+
+
+def _plan_consensus(parameters, sparse):
+    # both consensus behaviors share the same update, i.e. the mean
+    # heading of the robot and its neighbors
+    if sparse:
+        def consensus(r, theta, geometry, rows):
+            geometry = geometry()
+            return (theta[rows] + geometry.sum(theta[geometry.j])) / (1.0 + geometry.count)[:, np.newaxis]
+        return consensus
+
+    # every robot is a neighbor, so the update is the mean heading of the swarm
+    def consensus(r, theta, geometry, rows):
+        return np.broadcast_to(np.mean(theta, axis=0), (rows.stop - rows.start, 3))
+    return consensus
+
+
+# behaviors using the neighborhoods (besides the consensus behaviors
+# when the neighborhoods are restricted)
+_PAIRWISE = ('aggregation', 'repulsion', 'collective_navigation')
+
+_PLAN = {'aggregation': _plan_aggregation,
+         'repulsion': _plan_repulsion,
+         'target': _plan_target,
+         'collective_navigation': _plan_collective_navigation,
+         'leaderless_heading_consensus': _plan_consensus,
+         'heading_consensus': _plan_consensus}
+
+_CHECKPOINT_VERSION = 1
+
+# replicas of at most this many robots find their nearest neighbors
+# from all their distances instead of pyswarming.neighbors.nearest
+_SMALL_REPLICA = 256
+
+
+class _Parameters(dict):
+    """
+    Dict of behavior parameters calling invalidate() whenever it, or a
+    dict nested in it, is modified, so the plan is only recompiled
+    after a change. The values modified in place (e.g. an element of
+    a numpy array) are not seen by the dict, see _snapshot.
+    """
+
+    def __init__(self, values, invalidate):
+
+        dict.__init__(self)
+        self._invalidate = invalidate
+
+        for name, value in dict(values).items():
+            dict.__setitem__(self, name, self._wrap(value))
+
+    def _wrap(self, value):
+
+        if isinstance(value, dict):
+            return _Parameters(value, self._invalidate)
+
+        return value
+
+    def __setitem__(self, name, value):
+
+        dict.__setitem__(self, name, self._wrap(value))
+        self._invalidate()
+
+    def __delitem__(self, name):
+
+        dict.__delitem__(self, name)
+        self._invalidate()
+
+    def setdefault(self, name, value = None):
+
+        if name not in self:
+            self[name] = value
+
+        return self[name]
+
+    def update(self, *args, **kwargs):
+
+        for name, value in dict(*args, **kwargs).items():
+            dict.__setitem__(self, name, self._wrap(value))
+        self._invalidate()
+
+    def __ior__(self, other):
+
+        self.update(other)
+
+        return self
+
+    def pop(self, *args):
+
+        value = dict.pop(self, *args)
+        self._invalidate()
+
+        return value
+
+    def popitem(self):
+
+        item = dict.popitem(self)
+        self._invalidate()
+
+        return item
+
+    def clear(self):
+
+        dict.clear(self)
+        self._invalidate()
+
+
+def _snapshot(value):
+    """
+    Returns a comparable copy of the mutable values (numpy arrays and
+    lists) of behavior parameters, so the values modified in place are
+    seen when the plan is reused. The other values are only replaced
+    through the dict, which bumps the version of the parameters.
+    """
+
+    if isinstance(value, dict):
+        return tuple((name, _snapshot(item)) for name, item in value.items())
+
+    if isinstance(value, np.ndarray):
+        return (value.dtype.str, value.shape, value.tobytes())
+
+    if isinstance(value, (list, tuple)):
+        return tuple(_snapshot(item) if isinstance(item, (dict, list, tuple, np.ndarray)) else item
+                     for item in value)
+
+    return None
+
+
+def _to_json(value):
+    """
+    Returns a JSON-serializable copy of value (e.g. the behavior
+    parameters), the numpy arrays and scalars keeping their dtype.
+    """
+
+    if isinstance(value, dict):
+        return {name: _to_json(item) for name, item in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+
+    if isinstance(value, (np.ndarray, np.generic)):
+        return {'__ndarray__': np.asarray(value).tolist(),
+                'dtype': np.asarray(value).dtype.str,
+                'scalar': isinstance(value, np.generic)}
+
+    return value
+
+
+def _from_json(value):
+    """
+    Returns the value encoded by _to_json.
+    """
+
+    if isinstance(value, dict):
+        if '__ndarray__' in value:
+            array = np.asarray(value['__ndarray__'], dtype=value['dtype'])
+            return array[()] if value['scalar'] else array
+        return {name: _from_json(item) for name, item in value.items()}
+
+    if isinstance(value, list):
+        return [_from_json(item) for item in value]
+
+    return value
+
+
+def _generator(state):
+    """
+    Returns a numpy.random.Generator restored from the state of its
+    bit generator, or None.
+    """
+
+    if state is None:
+        return None
+
+    generator = np.random.Generator(getattr(np.random, state['bit_generator'])())
+    generator.bit_generator.state = state
+
+    return generator
+
 
 class Swarm:
     """
@@ -72,7 +294,60 @@ class Swarm:
         list containing the plot limits (matplotlib).
 
     behaviors : list
-        list containing the behaviors to be simulated.
+        list containing the behaviors to be simulated. Their parameters
+        are read from behaviors_dict, where an optional 'weight' entry
+        scales the contribution of a behavior (1 by default). The
+        behaviors are compiled into an execution plan, validated when the
+        swarm is created and recompiled only when the behaviors, their
+        parameters or the neighborhoods change. A parameter is changed
+        by assigning it (e.g. behaviors_dict['r_out']['target']['T'] =
+        [0, 0, 0]); an array modified in place is not detected.
+
+    interaction_radius : float
+        optional interaction radius, the behaviors of each robot only
+        taking into account the robots within this distance (cell list
+        neighborhoods, see pyswarming.neighbors). When it is None every
+        other robot is a neighbor.
+
+    n_neighbors : int
+        optional number of neighbors k, the behaviors of each robot only
+        taking into account its k nearest robots (topological neighborhoods,
+        see pyswarming.neighbors). It cannot be combined with
+        interaction_radius.
+
+    skin : float
+        optional skin distance of a Verlet neighbor list, only used with
+        interaction_radius. The neighborhoods within interaction_radius +
+        skin are kept across steps and only rebuilt when a robot has moved
+        more than skin / 2 (see pyswarming.neighbors.VerletList, whose
+        counters are available as neighbor_list.rebuilds and
+        neighbor_list.updates).
+
+    dtype : {numpy.float64, numpy.float32}
+        floating point type of the swarm state (see pyswarming.state),
+        whose positions, headings and velocities are updated in place.
+        The pose is available as a read-only (n, 6) array assembled from
+        the state; a pose assigned to swarm.pose, or values written into
+        swarm.state, are taken into account at the next step.
+
+    seed : int
+        optional seed of the swarm, whose robots are then deployed from
+        its own numpy.random.Generator (self.rng) instead of numpy.random.
+
+    n_threads : int
+        number of threads of the step engine. With more than one thread,
+        the robots are split into blocks with about the same number of
+        neighbor pairs, whose behaviors are evaluated on a thread pool
+        into disjoint slices of the output. The pool is shut down by
+        close(), or when the swarm is used as a context manager.
+
+    Attributes
+    ----------
+    step_count : int
+        number of steps taken since the robots were deployed.
+
+    sinks : list
+        sinks receiving the pose after every step (see attach).
     """
 
     def __init__(self, n,
@@ -82,12 +357,30 @@ class Swarm:
                  deployment_orientation_limits = [[0.0, 0.0, 0.0], [0.0, 0.0, 2*np.pi]],
                  distribution_type =  'uniform',
                  plot_limits = [[-50.0, 50.0], [-50.0, 50.0]],
-                 behaviors = ['target']):
+                 behaviors = ['target'],
+                 interaction_radius = None,
+                 n_neighbors = None,
+                 skin = None,
+                 dtype = np.float64,
+                 seed = None,
+                 n_threads = 1):
 
         if n <= 1:
             raise Exception("The number of robots must be greater than 1 (n > 1).")
 
+        if interaction_radius is not None and n_neighbors is not None:
+            raise Exception("Either interaction_radius or n_neighbors can be given, not both.")
+
+        if skin is not None and interaction_radius is None:
+            raise Exception("The skin can only be given with an interaction_radius.")
+
         self.n = n
+        self.n_threads = n_threads
+        self._executor = None
+        self.step_count = 0
+        self.sinks = []
+        self.seed = seed
+        self.rng = None if seed is None else np.random.default_rng(seed)
         self.dimensions = 2 # this version allows the creation of 2D swarms
         self.linear_speed = linear_speed
         self.dT = dT
@@ -96,7 +389,13 @@ class Swarm:
         self.deployment_orientation_limits = deployment_orientation_limits
         self.distribution_type = distribution_type
         self.behaviors = behaviors
-        self.pose = self._create_robots()
+        self.interaction_radius = interaction_radius
+        self.skin = skin
+        self.n_neighbors = n_neighbors
+        self.neighbor_list = None
+        if interaction_radius is not None and skin is not None:
+            self.neighbor_list = nb.VerletList(interaction_radius, skin)
+        self._deploy(dtype)
         self.behaviors_dict = {'r_out':{'aggregation': {'function':None},
                                           'repulsion': {'function':None,
                                                         'alpha': 10.0,
@@ -109,11 +408,45 @@ class Swarm:
                                                                     'd': 2}},
                                  'theta_out':{'leaderless_heading_consensus': {'function':None},
                                               'heading_consensus': {'function':None}}}
+        self.plan = None
+        self._plan_key = None
+        self._compile()
+
+    @property
+    def behaviors_dict(self):
+        """
+        Parameters of every behavior, by output kind ('r_out' or
+        'theta_out') and behavior name.
+        """
+
+        return self._behaviors_dict
+
+    @behaviors_dict.setter
+    def behaviors_dict(self, behaviors_dict):
+
+        self._behaviors_dict = _Parameters(behaviors_dict, self._invalidate)
+        self._invalidate()
 
-    def _create_robots(self):
+    def _invalidate(self):
+        """
+        Marks the behavior parameters as changed since the plan was compiled.
+        """
+
+        self._version = getattr(self, '_version', 0) + 1
+
+    def _deploy(self, dtype):
+        """
+        Creates the state of the swarm and deploys the robots.
+        """
+
+        self.state = st.SwarmState(self.n, dtype)
+        self.pose = self._create_robots(np.random if self.rng is None else self.rng)
+
+    def _create_robots(self, random = np.random):
         """
         Creates an array of n robots with
-        user-specified parameters.
+        user-specified parameters, drawn from random
+        (the numpy.random module or a numpy.random.Generator).
         """
 
         if self.distribution_type=='none':
@@ -121,20 +454,20 @@ class Swarm:
             orientation = np.asarray([self.deployment_orientation_limits[0] for i in range(self.n)])
 
         elif self.distribution_type=='uniform':
-            position = np.random.uniform(low=self.deployment_point_limits[0],
-                                         high=self.deployment_point_limits[1],
+            position = random.uniform(low=self.deployment_point_limits[0],
+                                      high=self.deployment_point_limits[1],
+                                      size=(self.n, 3, ))
+            orientation = random.uniform(low=self.deployment_orientation_limits[0],
+                                         high=self.deployment_orientation_limits[1],
                                          size=(self.n, 3, ))
-            orientation = np.random.uniform(low=self.deployment_orientation_limits[0],
-                                            high=self.deployment_orientation_limits[1],
-                                            size=(self.n, 3, ))
             
         elif self.distribution_type=='gaussian':
-            position = np.random.normal(loc=self.deployment_point_limits[0],
-                                         scale=self.deployment_point_limits[1],
+            position = random.normal(loc=self.deployment_point_limits[0],
+                                      scale=self.deployment_point_limits[1],
+                                      size=(self.n, 3, ))
+            orientation = random.normal(loc=self.deployment_orientation_limits[0],
+                                         scale=self.deployment_orientation_limits[1],
                                          size=(self.n, 3, ))
-            orientation = np.random.normal(loc=self.deployment_orientation_limits[0],
-                                            scale=self.deployment_orientation_limits[1],
-                                            size=(self.n, 3, ))
 
         pose = np.concatenate((position, orientation), axis=1)
 
@@ -145,71 +478,520 @@ class Swarm:
 
         return pose
 
-    # animation function. This is called sequentially
-    def _animate(self, i):
+    def _shape_pose(self, pose):
+        """
+        Returns the (n, 6) pose assembled from the state in the shape
+        of self.pose.
+        """
+
+        return pose
+
+    @property
+    def pose(self):
+        """
+        Pose of the robots (i.e. np.asarray([[x1, y1, z1, roll1, pitch1, yaw1],
+        ..., [xN, yN, zN, rollN, pitchN, yawN]])), assembled from the state
+        into a new read-only array at every request, so writing into it
+        raises instead of being lost. Assign a pose (swarm.pose = pose) or
+        write into swarm.state to move the robots.
+        """
+
+        pose = self._shape_pose(self.state.get_pose())
+        pose.flags.writeable = False
+
+        return pose
+
+    @pose.setter
+    def pose(self, pose):
+
+        self.state.set_pose(np.reshape(pose, (self.state.n, 6)))
+
+    def _neighborhoods(self, r):
+        """
+        Returns the neighborhoods (indptr, indices) of the step, i.e. the
+        CSR neighborhoods within the interaction radius, (None, (N, k)
+        array) for the nearest neighbors, or (None, None) when every other
+        robot is a neighbor.
+        """
+
+        if self.neighbor_list is not None:
+            return self.neighbor_list.update(r)
+
+        if self.interaction_radius is not None:
+            return nb.cell_list(r, self.interaction_radius)
+
+        if self.n_neighbors is not None:
+            return None, nb.nearest(r, self.n_neighbors)
+
+        return None, None
+
+    def _geometry(self, r):
+        """
+        Creates the geometry cache of the step, restricted to the
+        neighbors within the interaction radius or to the nearest
+        neighbors when they are given.
+        """
+
+        return gm.Geometry(r, *self._neighborhoods(r))
+
+    def _evaluate(self, r, theta, geometry, out, rows = None):
+        """
+        Writes into out the weighted sum of the outputs of the plan for
+        the block of robots rows (every robot by default), geometry being
+        a function that returns the geometry of the block.
+        """
+
+        rows = gm._rows(len(r), rows)
+
+        np.multiply(self.plan[0]['weight'], self.plan[0]['function'](r, theta, geometry, rows), out=out)
+
+        for entry in self.plan[1:]:
+            out += entry['weight'] * entry['function'](r, theta, geometry, rows)
+
+    def _evaluate_blocks(self, r, theta, out):
+        """
+        Writes into out the weighted sum of the outputs of the plan,
+        evaluated block of robots by block of robots on the thread pool.
+        Every block only evaluates its own robots, from a geometry
+        restricted to them.
+        """
+
+        n = len(r)
+
+        if any(entry['pairs'] for entry in self.plan):
+            indptr, indices = self._neighborhoods(r)
+        else:
+            indptr, indices = None, None
+
+        # blocks with about the same number of pairs
+        if indptr is None:
+            bounds = np.linspace(0, n, self.n_threads + 1).astype(int)
+        else:
+            bounds = np.searchsorted(indptr, np.linspace(0, indptr[-1], self.n_threads + 1))
+            bounds[0], bounds[-1] = 0, n
+
+        def block(start, stop):
+            cache = []
+
+            def geometry():
+                if len(cache) == 0:
+                    cache.append(gm.Geometry(r, indptr, indices, rows=slice(start, stop)))
+                return cache[0]
+
+            self._evaluate(r, theta, geometry, out[start:stop], slice(start, stop))
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self.n_threads)
+
+        futures = [self._executor.submit(block, start, stop)
+                   for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+        for future in futures:
+            future.result()
+
+    def _sparse(self):
+        """
+        Whether the neighborhoods are restricted (interaction radius or
+        nearest neighbors) instead of the whole swarm.
+        """
+
+        return self.interaction_radius is not None or self.n_neighbors is not None
+
+    def _configuration(self):
+        """
+        Returns a key of the configuration the plan depends on, i.e. the
+        behaviors, the version of their parameters, a snapshot of their
+        arrays and lists (modified in place without the version being
+        bumped) and the neighborhoods.
+        """
+
+        arrays = tuple(_snapshot(self.behaviors_dict.get(kind, {}).get(behavior))
+                       for behavior in self.behaviors for kind in ('r_out', 'theta_out'))
+
+        return (tuple(self.behaviors), self._sparse(), self._version, arrays)
+
+    def _compile(self):
+        """
+        Compiles self.behaviors into the execution plan, a list with the
+        bound batched function, weight, output kind ('r_out' for
+        positions, 'theta_out' for headings) and whether it uses the
+        neighborhoods ('pairs') of each behavior.
+        """
+
+        plan = []
+
+        for behavior in self.behaviors:
+            if behavior in self.behaviors_dict['r_out']:
+                kind = 'r_out'
+            elif behavior in self.behaviors_dict['theta_out']:
+                kind = 'theta_out'
+            else:
+                raise Exception("behavior not found: "+behavior)
+
+            if behavior not in _PLAN:
+                raise Exception("behavior without a batched implementation: "+behavior)
+
+            parameters = self.behaviors_dict[kind][behavior]
+
+            plan.append({'behavior': behavior,
+                         'function': _PLAN[behavior](parameters, self._sparse()),
+                         'weight': float(parameters.get('weight', 1.0)),
+                         'kind': kind,
+                         'pairs': behavior in _PAIRWISE or (kind == 'theta_out' and self._sparse())})
+
+        self.plan = plan
+        self._plan_key = self._configuration()
+
+    def step(self, n_steps = 1):
+        """
+        Advances the swarm n_steps sampling times, without plotting. Only
+        the behaviors of the execution plan (self.behaviors) are evaluated,
+        for all the robots at once (pyswarming.batched), from the positions
+        and orientations at the beginning of each step. The state is
+        updated in place.
+
+        Parameters
+        ----------
+        n_steps : int
+            number of steps.
+
+        Returns
+        -------
+        pose : numpy.array
+            array containing the pose of each robot
+        """
+
+        self._advance(n_steps)
+
+        return self.pose
 
-        self.ax.cla()
+    def _advance(self, n_steps):
+        """
+        Advances the swarm n_steps sampling times, updating the state in
+        place.
+        """
+
+        if self._configuration() != self._plan_key:
+            self._compile()
+
+        r = self.state.position
+        theta = self.state.heading
+        velocity = self.state.velocity
+
+        r_sum = self.state.workspace('r_sum')
+        norm_r_sum = self.state.workspace('norm_r_sum', (self.state.n,))
+
+        for step_i in range(n_steps):
+            # displacements and distances shared by all the behaviors
+            # of the step, computed when a behavior needs them
+            cache = []
+
+            def geometry():
+                if len(cache) == 0:
+                    cache.append(self._geometry(r))
+                return cache[0]
+
+            if len(self.plan) > 0:
+                # in this code all the behaviors are transformed into a normalized orientation
+                if self.n_threads > 1:
+                    self._evaluate_blocks(r, theta, r_sum)
+                else:
+                    self._evaluate(r, theta, geometry, r_sum)
+
+                np.sqrt(np.einsum('ij,ij->i', r_sum, r_sum), out=norm_r_sum)
+
+                # a robot without neighbors may get no contribution, and stays still
+                moving = norm_r_sum > 0
+                r_sum[~moving] = 0.0
+                np.divide(r_sum, norm_r_sum[:, np.newaxis], out=r_sum, where=moving[:, np.newaxis])
+
+                r_sum *= self.linear_speed * self.dT
+                r += r_sum
+                np.divide(r_sum, self.dT, out=velocity)
+                theta[:, 2] = np.arctan2(r[:, 1], r[:, 0])
+
+            self.step_count += 1
+
+            if len(self.sinks) > 0:
+                pose = self._shape_pose(self.state.get_pose(self.state.workspace('pose', (self.state.n, 6))))
+                for sink in self.sinks:
+                    sink.write(self.step_count, pose)
+
+    def iter_steps(self, n_steps, every = 1, reuse = True):
+        """
+        Advances the swarm n_steps sampling times as step does, yielding
+        a read-only view of the pose every k-th step, e.g. to feed online
+        metrics or loggers without storing the trajectory. A controller
+        can change the robots between yields by writing into self.state
+        (or assigning self.pose), the next steps starting from it.
+
+        Parameters
+        ----------
+        n_steps : int
+            number of steps.
+
+        every : int
+            a pose is yielded every k-th step (every > 0).
+
+        reuse : bool
+            when True, the same read-only view of the pose array is
+            yielded every time and updated in place at every yield, so
+            nothing is allocated per yield; copy it to keep it. When
+            False, a new read-only copy is yielded every time.
+
+        Returns
+        -------
+        poses : generator
+            generator of arrays containing the pose of each robot, the
+            step counter being available as self.step_count
+        """
+
+        if every < 1:
+            raise Exception("The yield interval must be greater than 0 (every > 0).")
+
+        buffer = None
+        view = None
+
+        for step_i in range(n_steps // every):
+            self._advance(every)
+
+            if reuse:
+                # the pose is assembled into a buffer of the generator
+                buffer = self.state.get_pose(buffer)
+                if view is None:
+                    view = self._shape_pose(buffer).view()
+                    view.flags.writeable = False
+                yield view
+            else:
+                yield self.pose
+
+        if n_steps % every > 0:
+            self._advance(n_steps % every)
+
+    def attach(self, sink):
+        """
+        Attaches a sink (e.g. pyswarming.trajectory.Recorder or Archive), whose
+        write(step, pose) method receives the current pose and then the
+        pose after every step.
+
+        Parameters
+        ----------
+        sink : object
+            object with a write(step, pose) method.
+
+        Returns
+        -------
+        sink : object
+            the attached sink
+        """
+
+        self.sinks.append(sink)
+        sink.write(self.step_count, self.pose)
+
+        return sink
+
+    def detach(self, sink):
+        """
+        Detaches a sink, closing it if it has a close() method.
+
+        Parameters
+        ----------
+        sink : object
+            an attached sink.
+        """
+
+        self.sinks.remove(sink)
+
+        if hasattr(sink, 'close'):
+            sink.close()
+
+    def close(self):
+        """
+        Shuts down the thread pool of the step engine (n_threads > 1).
+        The swarm can still be stepped afterwards, with a new pool.
+        """
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def record(self, path, n_steps, every = 1):
+        """
+        Attaches a recorder writing the current pose and the pose of
+        every k-th of the next n_steps steps into a memory-mapped .npy
+        file of shape (n_steps // every + 1, n, 6) (see
+        pyswarming.trajectory).
+
+        Parameters
+        ----------
+        path : str
+            path of the .npy file, overwritten if it exists.
+
+        n_steps : int
+            number of steps to be recorded.
+
+        every : int
+            a pose is recorded every k-th step (every > 0).
+
+        Returns
+        -------
+        recorder : pyswarming.trajectory.Recorder
+            the attached recorder, to be detached at the end of the run
+        """
+
+        recorder = tj.Recorder(path, n_steps // every + 1, self.pose.shape, every, self.state.dtype)
+
+        return self.attach(recorder)
+
+    def _random_state(self):
+        """
+        Returns the state of the random generators of the swarm.
+        """
+
+        return {'rng': None if self.rng is None else self.rng.bit_generator.state}
+
+    def _set_random_state(self, state):
+        """
+        Restores the random generators of the swarm from their state.
+        """
+
+        self.rng = _generator(state['rng'])
+
+    def save_checkpoint(self, path):
+        """
+        Saves the state of the run into a compressed .npz file: the
+        positions, headings and velocities, the step counter, the
+        behaviors and their parameters, and the state of the random
+        generator of the swarm (self.rng, only when a seed was given).
+
+        Parameters
+        ----------
+        path : str
+            path of the checkpoint file, overwritten if it exists.
+        """
+
+        meta = {'version': _CHECKPOINT_VERSION,
+                'n': self.state.n,
+                'dtype': self.state.dtype.str,
+                'step_count': self.step_count,
+                'linear_speed': self.linear_speed,
+                'dT': self.dT,
+                'behaviors': list(self.behaviors),
+                'behaviors_dict': _to_json(self.behaviors_dict),
+                'random': self._random_state()}
+
+        with open(path, 'wb') as f:
+            np.savez_compressed(f,
+                                position = self.state.position,
+                                heading = self.state.heading,
+                                velocity = self.state.velocity,
+                                meta = np.asarray(json.dumps(meta)))
+
+    def load_checkpoint(self, path):
+        """
+        Restores a run saved with save_checkpoint into this swarm, which
+        must have the same number of robots and dtype. Stepping the
+        restored swarm gives the same poses, bit for bit, as the run
+        that was saved.
+
+        Parameters
+        ----------
+        path : str
+            path of the checkpoint file.
+        """
+
+        with np.load(path, allow_pickle = False) as data:
+            meta = json.loads(str(data['meta']))
+
+            if meta['version'] != _CHECKPOINT_VERSION:
+                raise Exception("Unsupported checkpoint version: "+str(meta['version']))
+
+            if meta['n'] != self.state.n or np.dtype(meta['dtype']) != self.state.dtype:
+                raise Exception("The checkpoint has "+str(meta['n'])+" robots of dtype "+
+                                str(np.dtype(meta['dtype']))+", the swarm "+str(self.state.n)+
+                                " robots of dtype "+str(self.state.dtype)+".")
+
+            self.state.position[...] = data['position']
+            self.state.heading[...] = data['heading']
+            self.state.velocity[...] = data['velocity']
+
+        self.step_count = meta['step_count']
+        self.linear_speed = meta['linear_speed']
+        self.dT = meta['dT']
+        self.behaviors = meta['behaviors']
+        self.behaviors_dict = _from_json(meta['behaviors_dict'])
+        self._set_random_state(meta['random'])
+
+        self._compile()
+
+    def _setup_plot(self):
+        """
+        Draws the axes and creates the artists of the robots once: a
+        scatter collection of the positions and a LineCollection of the
+        headings, whose offsets and segments are updated at every frame.
+        """
+
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import LineCollection
 
         self.ax.set_xlim(self.plot_limits[0])
         self.ax.set_ylim(self.plot_limits[1])
         self.ax.set_xlabel('X(m)')
         self.ax.set_ylabel('Y(m)')
         self.ax.grid()
-        
-        pose = self.pose.copy()
-        r = pose[:,:3]
-        theta = pose[:,3:]
-
-        arrow_len = 4.0
 
         if self.dimensions == 2:
             self.ax.set_aspect('equal')
-            for r_ind in range(len(r)):
-                self.ax.plot(r[r_ind][0], r[r_ind][1], marker='o', lw=0)
-                self.ax.plot([r[r_ind][0], r[r_ind][0]+arrow_len*np.cos(theta[r_ind][2])],
-                             [r[r_ind][1], r[r_ind][1]+arrow_len*np.sin(theta[r_ind][2])], color='k')
-                
-        for r_ind in range(len(r)):
-            r_i = r[r_ind]
-            r_j = np.delete(r, np.array([r_ind]), axis=0)
-
-            theta_i = theta[r_ind]
-            theta_j = np.delete(theta, np.array([r_ind]), axis=0)
-
-            self.behaviors_dict['r_out']['aggregation']['function'] = bh.aggregation(r_i, r_j)
-            self.behaviors_dict['r_out']['repulsion']['function'] = bh.repulsion(r_i,
-                                                                                 r_j,
-                                                                                 self.behaviors_dict['r_out']['repulsion']['alpha'],
-                                                                                 self.behaviors_dict['r_out']['repulsion']['d'])
-            self.behaviors_dict['r_out']['target']['function'] = bh.target(r_i,
-                                                                           np.asarray(self.behaviors_dict['r_out']['target']['T']))
-            self.behaviors_dict['r_out']['collective_navigation']['function'] = bh.collective_navigation(r_i,
-                                                                                                           r_j,
-                                                                                                           np.asarray(self.behaviors_dict['r_out']['collective_navigation']['T']),
-                                                                                                           self.behaviors_dict['r_out']['collective_navigation']['alpha'],
-                                                                                                           self.behaviors_dict['r_out']['collective_navigation']['d'])
-
-            self.behaviors_dict['theta_out']['leaderless_heading_consensus']['function'] = bh.leaderless_heading_consensus(theta_i, theta_j)
-            self.behaviors_dict['theta_out']['heading_consensus']['function'] = bh.heading_consensus(theta_i, theta_j)
-
-            behaviors_output = []
-            for behavior_i in self.behaviors:
-                try:
-                    behaviors_output.append([self.behaviors_dict['r_out'][behavior_i]['function']])
-                except:
-                    try:
-                        behaviors_output.append([self.behaviors_dict['theta_out'][behavior_i]['function']])
-                    except:
-                        print('behavior not found: '+behavior_i)
-            
-            if len(behaviors_output)>0:
-                # in this code all the behaviors are transformed into a normalized orientation
-                r_sum = (np.sum(np.asarray([r_out[0] for r_out in behaviors_output]), axis=0))
-                r_normalized = r_sum/np.linalg.norm(r_sum)
-                r[r_ind] += r_normalized * self.linear_speed * self.dT
-                theta[r_ind][2] = np.arctan2(r[r_ind][1], r[r_ind][0])
 
-        self.pose = np.concatenate((r, theta), axis=1)
+        # one color per robot, as the markers of the default color cycle
+        cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        colors = [cycle[r_ind % len(cycle)] for r_ind in range(self.state.n)]
+
+        self._robots = self.ax.scatter(np.zeros(self.state.n), np.zeros(self.state.n), c=colors, marker='o')
+        self._headings = LineCollection(np.zeros((self.state.n, 2, 2)), colors='k')
+        self.ax.add_collection(self._headings)
+
+        self._segments = np.empty((self.state.n, 2, 2))
+
+        self._update_plot()
+
+        return self._robots, self._headings
+
+    def _update_plot(self):
+        """
+        Moves the artists of the robots to the current state.
+        """
+
+        r = self.state.position
+        theta = self.state.heading
+
+        arrow_len = 4.0
+
+        self._segments[:, 0, :] = r[:, :2]
+        self._segments[:, 1, 0] = r[:, 0] + arrow_len*np.cos(theta[:, 2])
+        self._segments[:, 1, 1] = r[:, 1] + arrow_len*np.sin(theta[:, 2])
+
+        self._robots.set_offsets(self._segments[:, 0, :])
+        self._headings.set_segments(self._segments)
+
+        return self._robots, self._headings
+
+    # animation function. This is called sequentially
+    def _animate(self, i):
+
+        artists = self._update_plot()
+
+        self.step()
+
+        return artists
 
     def simulate(self,
                  frames = 720,
@@ -217,24 +999,215 @@ class Swarm:
                  blit = False,
                  repeat = False,
                  mode = 'pltshow'):
+        """
+        Animates the swarm with matplotlib, stepping it once per frame,
+        or only steps it when mode = 'simulate'. The robots are drawn by
+        two artists created once (a scatter of the positions and a
+        LineCollection of the headings), updated at every frame, so
+        blit = True only redraws them.
+
+        Parameters
+        ----------
+        frames : int
+            number of frames (i.e. of steps).
+
+        interval : int
+            delay between the frames in milliseconds.
+
+        blit : bool
+            whether only the robots are redrawn at every frame.
+
+        repeat : bool
+            whether the animation restarts when it ends.
+
+        mode : {'pltshow', 'anim', 'simulate'}
+            - 'pltshow' : the animation is shown (plt.show()).
+            - 'anim' : the animation is returned.
+            - 'simulate' : the swarm is stepped without plotting, and
+              its final pose is returned.
+
+        Returns
+        -------
+        result : numpy.array or matplotlib.animation.FuncAnimation
+            the final pose ('simulate') or the animation ('anim')
+        """
+
+        if mode == 'simulate':
+            return self.step(frames)
+
+        import matplotlib.pyplot as plt
+        import matplotlib.animation as animation
 
         # First set up the figure and the axis
         if self.dimensions == 2:
             self.fig, self.ax = plt.subplots()
 
+        self._setup_plot()
+
         if mode == 'pltshow':
-            anim = animation.FuncAnimation(self.fig, self._animate, frames=frames, interval=interval, blit=blit, repeat=repeat)
+            anim = animation.FuncAnimation(self.fig, self._animate, frames=frames, init_func=self._update_plot,
+                                           interval=interval, blit=blit, repeat=repeat)
             plt.show()
 
         elif mode == 'anim':
             import warnings
             warnings.filterwarnings("ignore")
-            anim = animation.FuncAnimation(self.fig, self._animate, frames=frames, interval=interval, blit=blit, repeat=repeat)
+            anim = animation.FuncAnimation(self.fig, self._animate, frames=frames, init_func=self._update_plot,
+                                           interval=interval, blit=blit, repeat=repeat)
             return anim
-        
-        elif mode == 'simulate':
-            for time_i in range(frames):
-                self._animate(time_i)
-            return self.pose
 
-        
+
+def _nearest_replicas(r, k):
+    """
+    Returns the k nearest neighbors of every robot of small replicas,
+    r being of shape (m, n, 3), from all the distances of a block of
+    replicas at once.
+    """
+
+    m, n = r.shape[:2]
+
+    if k < 1 or k >= n:
+        raise Exception("The number of neighbors must be in [1, N) (0 < k < N).")
+
+    indices = np.empty((m, n, k), dtype=np.intp)
+
+    # blocks of replicas with a bounded number of pairs
+    block = max(1, nb._PAIRS // (n * n))
+
+    for first in range(0, m, block):
+        r_k = r[first:first + block]
+
+        d2 = np.sum(np.power(r_k[:, np.newaxis] - r_k[:, :, np.newaxis], 2), axis=3)
+        d2[:, np.arange(n), np.arange(n)] = np.inf
+
+        indices[first:first + block] = np.argpartition(d2, k - 1, axis=2)[:, :, :k]
+
+    return np.sort(indices, axis=2)
+
+
+class Ensemble(Swarm):
+    """
+    Creates an ensemble of m independent replicas of a swarm of n
+    robots, e.g. for Monte Carlo studies over random deployments. The
+    replicas are held as one batched array and stepped together, each
+    robot only interacting with the robots of its own replica.
+
+    Parameters
+    ----------
+    m : int
+        integer number of replicas.
+
+    n : int
+        integer number of robots of each replica, must be greater
+        than 1 (n > 1).
+
+    seed : int
+        optional seed of the ensemble. Each replica deploys its robots
+        from its own numpy.random.Generator, spawned from the seed.
+
+    **kwargs
+        the other parameters of Swarm (behaviors, linear_speed, ...).
+
+    Attributes
+    ----------
+    generators : list
+        numpy.random.Generator of each replica.
+    """
+
+    def __init__(self, m, n, seed = None, **kwargs):
+
+        if m < 1:
+            raise Exception("The number of replicas must be greater than 0 (m > 0).")
+
+        self.m = m
+        self.generators = [np.random.default_rng(sequence)
+                           for sequence in np.random.SeedSequence(seed).spawn(m)]
+
+        Swarm.__init__(self, n, seed = seed, **kwargs)
+
+        # the replica of each robot, the neighborhoods of every replica
+        # being found at once with the replicas as groups of robots
+        self._replica = np.repeat(np.arange(m), self.n)
+        if self.neighbor_list is not None:
+            self.neighbor_list = nb.VerletList(self.interaction_radius, self.skin, self._replica)
+
+    def _deploy(self, dtype):
+
+        self.state = st.SwarmState(self.m * self.n, dtype)
+        self.pose = np.stack([self._create_robots(generator) for generator in self.generators])
+
+    def _shape_pose(self, pose):
+
+        # the pose of every replica, shape (m, n, 6)
+        return pose.reshape(self.m, self.n, 6)
+
+    def _random_state(self):
+
+        state = Swarm._random_state(self)
+        state['generators'] = [generator.bit_generator.state for generator in self.generators]
+
+        return state
+
+    def _set_random_state(self, state):
+
+        Swarm._set_random_state(self, state)
+        self.generators = [_generator(generator) for generator in state['generators']]
+
+    def _sparse(self):
+
+        # the consensus behaviors must stay within each replica
+        return True
+
+    def _neighborhoods(self, r):
+
+        if self.neighbor_list is not None:
+            return self.neighbor_list.update(r)
+
+        if self.interaction_radius is not None:
+            return nb.cell_list(r, self.interaction_radius, self._replica)
+
+        offsets = (np.arange(self.m) * self.n)[:, np.newaxis, np.newaxis]
+
+        if self.n_neighbors is not None:
+            if self.n > _SMALL_REPLICA:
+                return None, nb.nearest(r, self.n_neighbors, self._replica)
+            indices = _nearest_replicas(r.reshape(self.m, self.n, 3), self.n_neighbors) + offsets
+            return None, indices.reshape(-1, self.n_neighbors)
+
+        # every other robot of the same replica
+        indices = gm._neighbor_table(self.n)[np.newaxis] + offsets
+
+        return None, indices.reshape(-1, self.n - 1)
+
+    def run(self, n_steps, metrics = None):
+        """
+        Advances every replica n_steps sampling times and returns
+        their final poses and, optionally, metrics of each replica.
+
+        Parameters
+        ----------
+        n_steps : int
+            number of steps.
+
+        metrics : dict
+            optional dict of functions taking the pose of the ensemble,
+            shape (m, n, 6), and returning one value per replica
+            (e.g. {'spread': lambda pose: np.std(pose[:, :, :3], axis=1)}).
+
+        Returns
+        -------
+        pose : numpy.array
+            array containing the final pose of each robot of each
+            replica, shape (m, n, 6)
+
+        values : dict
+            value of each metric for each replica (only if metrics
+            is given)
+        """
+
+        pose = self.step(n_steps).copy()
+
+        if metrics is None:
+            return pose
+
+        return pose, {name: np.asarray(metric(pose)) for name, metric in metrics.items()}
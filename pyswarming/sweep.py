@@ -0,0 +1,240 @@
+"""
+``pyswarming.sweep``
+========================
+
+The PySwarming sweep functions run a swarm for many configurations (e.g.
+to tune the repulsion alpha and d, the linear speed or the number of
+robots) on a pool of processes. Each configuration is a dict with the
+parameters of pyswarming.swarm.Swarm (e.g. 'n', 'linear_speed',
+'behaviors') and the parameters of the behaviors, given as
+'behavior.parameter' (e.g. 'repulsion.alpha').
+
+Every run gets its own seed, spawned from the seed of the sweep, so a
+sweep, and any single run of it (Swarm(..., seed=row['seed'])), can be
+reproduced. The results are returned as a tidy table: one row (dict)
+per run, with a column per parameter and per metric, which can be given
+to pandas.DataFrame.
+
+Functions present in pyswarming.sweep are listed below.
+
+Configurations
+--------------
+
+    grid
+
+Runners
+-------
+
+    iter_sweep
+    sweep
+
+Metrics
+-------
+
+    spread
+"""
+
+__all__ = ['grid', 'iter_sweep', 'sweep', 'spread']
+
+import itertools
+import os
+import concurrent.futures
+
+import numpy as np
+
+import swarm as sw
+
+
+def spread(swarm):
+    """
+    Returns the mean distance of the robots to the centroid of the swarm.
+
+    Parameters
+    ----------
+    swarm : pyswarming.swarm.Swarm
+        swarm at the end of the run.
+
+    Returns
+    -------
+    spread : float
+        mean distance to the centroid
+    """
+
+    r = swarm.state.position
+
+    return float(np.mean(np.linalg.norm(r - np.mean(r, axis=0), axis=1)))
+
+
+def grid(**parameters):
+    """
+    Returns the configurations of every combination of the given values.
+
+    Parameters
+    ----------
+    **parameters
+        list of values of each parameter (e.g. n=[10, 100],
+        **{'repulsion.alpha': [1.0, 10.0]}).
+
+    Returns
+    -------
+    configs : list
+        list of dicts, one per combination
+    """
+
+    names = list(parameters)
+
+    return [dict(zip(names, values)) for values in itertools.product(*parameters.values())]
+
+
+def _run(config, seed, n_steps, metrics):
+    """
+    Runs one configuration and returns its metrics. Executed in the
+    worker processes.
+    """
+
+    swarm_parameters = {}
+    behavior_parameters = {}
+
+    for name, value in config.items():
+        if '.' in name:
+            behavior_parameters[name] = value
+        else:
+            swarm_parameters[name] = value
+
+    swarm = sw.Swarm(seed = seed, **swarm_parameters)
+
+    for name, value in behavior_parameters.items():
+        behavior, parameter = name.split('.', 1)
+        for kind in swarm.behaviors_dict.values():
+            if behavior in kind:
+                kind[behavior][parameter] = value
+                break
+        else:
+            raise Exception("behavior not found: "+behavior)
+
+    swarm.step(n_steps)
+
+    return {name: metric(swarm) for name, metric in metrics.items()}
+
+
+def iter_sweep(configs, n_steps = 720, metrics = None, seed = 0, max_workers = None, executor = None):
+    """
+    Runs every configuration on a pool of processes and yields the row
+    of each run as soon as it completes. At most two runs per worker are
+    submitted at once, so a large grid is not queued up front and the
+    runs left when the generator is closed early are cancelled.
+
+    Parameters
+    ----------
+    configs : list
+        list of dicts with the parameters of each run (e.g. from grid).
+
+    n_steps : int
+        number of steps of each run.
+
+    metrics : dict
+        functions taking the swarm at the end of a run and returning a
+        value (e.g. {'spread': spread}). They must be picklable, i.e.
+        defined at the top level of a module. {'spread': spread} by
+        default.
+
+    seed : int
+        seed of the sweep, from which the seed of every run is spawned.
+
+    max_workers : int
+        number of processes, the number of cores by default. With an
+        executor, the number of its workers (to bound the runs submitted
+        at once).
+
+    executor : concurrent.futures.Executor
+        optional executor running the runs, instead of a new pool of
+        max_workers processes.
+
+    Returns
+    -------
+    rows : generator
+        generator of dicts with the run index, its seed, its parameters
+        and its metrics, in order of completion
+    """
+
+    if metrics is None:
+        metrics = {'spread': spread}
+
+    configs = list(configs)
+
+    seeds = [int(sequence.generate_state(1)[0]) for sequence in np.random.SeedSequence(seed).spawn(len(configs))]
+
+    if executor is None:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers = max_workers)
+    else:
+        pool = executor
+
+    # runs submitted and not yielded yet, at most limit at once
+    limit = 2 * (max_workers or os.cpu_count() or 1)
+    runs = enumerate(zip(configs, seeds))
+    futures = {}
+
+    try:
+        while True:
+            for run, (config, run_seed) in itertools.islice(runs, limit - len(futures)):
+                futures[pool.submit(_run, config, run_seed, n_steps, metrics)] = run
+
+            if len(futures) == 0:
+                break
+
+            done = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)[0]
+
+            for future in done:
+                run = futures.pop(future)
+                row = {'run': run, 'seed': seeds[run]}
+                row.update(configs[run])
+                row.update(future.result())
+                yield row
+
+    finally:
+        # the runs not started yet are cancelled if the generator is
+        # closed early (shutdown(cancel_futures=True) needs Python 3.9)
+        for future in futures:
+            future.cancel()
+        if executor is None:
+            pool.shutdown()
+
+
+def sweep(configs, n_steps = 720, metrics = None, seed = 0, max_workers = None, executor = None):
+    """
+    Runs every configuration on a pool of processes and returns the
+    tidy table of the results, one row per run in the order of configs.
+
+    Parameters
+    ----------
+    configs : list
+        list of dicts with the parameters of each run (e.g. from grid).
+
+    n_steps : int
+        number of steps of each run.
+
+    metrics : dict
+        functions taking the swarm at the end of a run and returning a
+        value. They must be picklable, i.e. defined at the top level of
+        a module. {'spread': spread} by default.
+
+    seed : int
+        seed of the sweep, from which the seed of every run is spawned.
+
+    max_workers : int
+        number of processes, the number of cores by default.
+
+    executor : concurrent.futures.Executor
+        optional executor running the runs, instead of a new pool of
+        max_workers processes.
+
+    Returns
+    -------
+    rows : list
+        list of dicts with the run index, its seed, its parameters
+        and its metrics
+    """
+
+    rows = list(iter_sweep(configs, n_steps, metrics, seed, max_workers, executor))
+
+    return sorted(rows, key = lambda row: row['run'])
@@ -0,0 +1,480 @@
+"""
+``pyswarming.trajectory``
+========================
+
+The PySwarming trajectory sinks store the poses of a swarm while it is
+stepped, instead of keeping copies of every pose in memory. A sink is
+attached to a swarm with ``Swarm.attach`` and receives the pose after
+every step (and the pose of the swarm when it is attached).
+
+The recorder writes every k-th pose into a preallocated memory-mapped
+``.npy`` file of shape (T, N, 6), so long headless runs only keep the
+pages being written in memory, and the trajectory can be opened lazily
+with ``load``.
+
+The archive is a smaller, append-only format for archived runs. The poses
+are quantized to a given precision, grouped into chunks of a fixed number
+of frames, delta-encoded along time and compressed with zlib or lzma; a
+chunk index is written when the archive is closed (or rebuilt from the
+chunk headers if the run was interrupted), so reading frame t only
+decompresses the chunk holding it.
+
+Functions present in pyswarming.trajectory are listed below.
+
+Sinks
+-----
+
+    Recorder
+    Archive
+
+Readers
+-------
+
+    load
+    ArchiveReader
+"""
+
+__all__ = ['Recorder', 'Archive', 'load', 'ArchiveReader']
+
+import json
+import lzma
+import struct
+import zlib
+
+import numpy as np
+
+_MAGIC = b'PYSWARC1'
+_END = b'PYSWEND1'
+_CHUNK = struct.Struct('<QIB')
+_FOOTER = struct.Struct('<QQ8s')
+_CODECS = {'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+           'lzma': (lzma.compress, lzma.decompress)}
+
+
+class Recorder:
+    """
+    Creates a recorder writing the poses of a swarm into a memory-mapped
+    .npy file, preallocated with n_frames frames.
+
+    Parameters
+    ----------
+    path : str
+        path of the .npy file, overwritten if it exists.
+
+    n_frames : int
+        number of frames T of the file (n_frames > 0), e.g.
+        n_steps // every + 1 to record the pose of the swarm when
+        it is attached and every k-th step of n_steps.
+
+    shape : tuple
+        shape of a pose, i.e. (N, 6) (or (m, N, 6) for an ensemble).
+
+    every : int
+        a pose is recorded every k-th step (every > 0), counted from
+        the first pose written.
+
+    dtype : numpy.dtype
+        floating point type of the file.
+
+    Attributes
+    ----------
+    frames : int
+        number of frames written.
+
+    steps : list
+        step counter of the swarm at each frame written.
+    """
+
+    def __init__(self, path, n_frames, shape, every = 1, dtype = np.float64):
+
+        if n_frames < 1:
+            raise Exception("The number of frames must be greater than 0 (n_frames > 0).")
+
+        if every < 1:
+            raise Exception("The recording interval must be greater than 0 (every > 0).")
+
+        self.path = path
+        self.every = every
+        self.frames = 0
+        self.steps = []
+
+        self.data = np.lib.format.open_memmap(path, mode = 'w+', dtype = dtype,
+                                              shape = (n_frames,) + tuple(shape))
+
+    def write(self, step, pose):
+        """
+        Records the pose if it is the first one or if every steps
+        have been taken since the last one recorded.
+
+        Parameters
+        ----------
+        step : int
+            step counter of the swarm.
+
+        pose : numpy.array
+            array containing the pose of each robot.
+        """
+
+        if len(self.steps) > 0 and step - self.steps[-1] < self.every:
+            return
+
+        if self.data is None:
+            raise Exception("The recorder is closed.")
+
+        if self.frames == len(self.data):
+            raise Exception("The recorder is full ("+str(len(self.data))+" frames).")
+
+        self.data[self.frames] = pose
+        self.frames += 1
+        self.steps.append(step)
+
+    def close(self):
+        """
+        Flushes the frames written to the file and releases it. The
+        frames that were not written are left as zeros.
+        """
+
+        if self.data is not None:
+            self.data.flush()
+            self.data = None
+
+
+def load(path, frames = None):
+    """
+    Opens a trajectory written by a Recorder without reading it into
+    memory.
+
+    Parameters
+    ----------
+    path : str
+        path of the .npy file.
+
+    frames : int
+        optional number of frames to keep (e.g. recorder.frames when
+        the run was stopped before the file was full).
+
+    Returns
+    -------
+    trajectory : numpy.memmap
+        read-only array containing the pose of each robot at each
+        frame, shape (T, N, 6)
+    """
+
+    trajectory = np.load(path, mmap_mode = 'r')
+
+    if frames is not None:
+        trajectory = trajectory[:frames]
+
+    return trajectory
+
+
+def _encode(steps, frames, precision):
+    """
+    Returns the payload of a chunk and the item size of its values: the
+    step counters followed by the frames, either as float64 or, with a
+    precision, quantized and delta-encoded along time with the smallest
+    integer type, the bytes of the values being grouped by significance.
+    """
+
+    steps = np.asarray(steps, dtype=np.int64)
+
+    if precision is None:
+        return steps.tobytes() + np.ascontiguousarray(frames, dtype=np.float64).tobytes(), 0
+
+    q = np.rint(frames / precision).astype(np.int64)
+    q[1:] -= q[:-1].copy()
+
+    bound = np.max(np.abs(q)) if q.size > 0 else 0
+    for itemsize in (1, 2, 4, 8):
+        if bound < 2**(8*itemsize - 1):
+            break
+
+    values = q.astype('<i' + str(itemsize))
+    shuffled = values.view(np.uint8).reshape(-1, itemsize).T
+
+    return steps.tobytes() + shuffled.tobytes(), itemsize
+
+
+def _decode(payload, n_frames, shape, precision, itemsize):
+    """
+    Returns the step counters and the frames of a chunk payload.
+    """
+
+    steps = np.frombuffer(payload, dtype=np.int64, count=n_frames)
+    data = payload[8*n_frames:]
+
+    if itemsize == 0:
+        return steps, np.frombuffer(data, dtype=np.float64).reshape((n_frames,) + shape)
+
+    values = np.frombuffer(data, dtype=np.uint8).reshape(itemsize, -1).T.copy().view('<i' + str(itemsize))
+    q = np.cumsum(values.reshape((n_frames,) + shape).astype(np.int64), axis=0)
+
+    return steps, q * precision
+
+
+class Archive:
+    """
+    Creates an append-only archive of the poses of a swarm, written in
+    compressed chunks of chunk_size frames.
+
+    Parameters
+    ----------
+    path : str
+        path of the archive, overwritten if it exists.
+
+    shape : tuple
+        shape of a pose, i.e. (N, 6) (or (m, N, 6) for an ensemble).
+
+    chunk_size : int
+        number of frames of each chunk (chunk_size > 0). Larger chunks
+        compress better, smaller chunks are faster to seek.
+
+    precision : float
+        quantization step of the poses (e.g. 1e-4 m and rad), the values
+        read back being within precision / 2 of the values written. When
+        None the poses are stored exactly, as float64.
+
+    compression : {'zlib', 'lzma'}
+        compressor of the chunks, lzma being smaller and slower.
+
+    every : int
+        a pose is recorded every k-th step (every > 0), counted from
+        the first pose written.
+
+    Attributes
+    ----------
+    frames : int
+        number of frames written.
+    """
+
+    def __init__(self, path, shape, chunk_size = 64, precision = 1e-4, compression = 'zlib', every = 1):
+
+        if chunk_size < 1:
+            raise Exception("The chunk size must be greater than 0 (chunk_size > 0).")
+
+        if precision is not None and precision <= 0:
+            raise Exception("The precision must be greater than 0 (precision > 0).")
+
+        if compression not in _CODECS:
+            raise Exception("The compression must be 'zlib' or 'lzma'.")
+
+        if every < 1:
+            raise Exception("The recording interval must be greater than 0 (every > 0).")
+
+        self.path = path
+        self.shape = tuple(shape)
+        self.chunk_size = chunk_size
+        self.precision = precision
+        self.compression = compression
+        self.every = every
+        self.frames = 0
+
+        self._last = None
+        self._steps = []
+        self._buffer = np.empty((chunk_size,) + self.shape)
+        self._index = []
+
+        header = json.dumps({'shape': self.shape, 'chunk_size': chunk_size, 'precision': precision,
+                             'compression': compression, 'every': every}).encode()
+
+        self._file = open(path, 'wb')
+        self._file.write(_MAGIC + struct.pack('<I', len(header)) + header)
+
+    def _flush(self):
+        """
+        Compresses the buffered frames and appends them as a chunk.
+        """
+
+        n_frames = len(self._steps)
+
+        if n_frames == 0:
+            return
+
+        payload, itemsize = _encode(self._steps, self._buffer[:n_frames], self.precision)
+        payload = _CODECS[self.compression][0](payload)
+
+        self._index.append((self._file.tell(), n_frames))
+        self._file.write(_CHUNK.pack(len(payload), n_frames, itemsize) + payload)
+
+        self._steps = []
+
+    def write(self, step, pose):
+        """
+        Records the pose if it is the first one or if every steps
+        have been taken since the last one recorded.
+
+        Parameters
+        ----------
+        step : int
+            step counter of the swarm.
+
+        pose : numpy.array
+            array containing the pose of each robot.
+        """
+
+        if self._last is not None and step - self._last < self.every:
+            return
+
+        if self._file is None:
+            raise Exception("The archive is closed.")
+
+        self._buffer[len(self._steps)] = pose
+        self._steps.append(step)
+        self._last = step
+        self.frames += 1
+
+        if len(self._steps) == self.chunk_size:
+            self._flush()
+
+    def close(self):
+        """
+        Appends the last chunk and the chunk index, and closes the file.
+        """
+
+        if self._file is None:
+            return
+
+        self._flush()
+
+        offset = self._file.tell()
+        self._file.write(np.asarray(self._index, dtype=np.int64).reshape(-1, 2).tobytes())
+        self._file.write(_FOOTER.pack(offset, len(self._index), _END))
+
+        self._file.close()
+        self._file = None
+
+
+class ArchiveReader:
+    """
+    Opens an archive written by an Archive. A frame is read by
+    decompressing the chunk holding it, the last chunk read being kept,
+    so consecutive frames are read without decompressing again.
+
+    Parameters
+    ----------
+    path : str
+        path of the archive.
+
+    Attributes
+    ----------
+    shape : tuple
+        shape of a pose.
+
+    chunk_size : int
+        number of frames of each chunk.
+
+    precision : float
+        quantization step of the poses, None if they are exact.
+    """
+
+    def __init__(self, path):
+
+        self._file = open(path, 'rb')
+
+        if self._file.read(8) != _MAGIC:
+            self._file.close()
+            raise Exception("The file is not a pyswarming archive: "+str(path))
+
+        length, = struct.unpack('<I', self._file.read(4))
+        header = json.loads(self._file.read(length).decode())
+
+        self.shape = tuple(header['shape'])
+        self.chunk_size = header['chunk_size']
+        self.precision = header['precision']
+        self.compression = header['compression']
+        self.every = header['every']
+
+        self._index = self._read_index(12 + length)
+        self._first = np.concatenate(([0], np.cumsum(self._index[:, 1])))
+        self._cache = (None, None, None)
+
+    def _read_index(self, start):
+        """
+        Returns the chunk index (offset, frames) from the footer, or
+        from the chunk headers if the archive was not closed.
+        """
+
+        size = self._file.seek(0, 2)
+
+        if size - start >= _FOOTER.size:
+            self._file.seek(size - _FOOTER.size)
+            offset, n_chunks, end = _FOOTER.unpack(self._file.read(_FOOTER.size))
+            if end == _END:
+                self._file.seek(offset)
+                return np.frombuffer(self._file.read(16*n_chunks), dtype=np.int64).reshape(-1, 2)
+
+        # the complete chunks of an interrupted run
+        index = []
+        offset = start
+        while offset + _CHUNK.size <= size:
+            self._file.seek(offset)
+            length, n_frames, itemsize = _CHUNK.unpack(self._file.read(_CHUNK.size))
+            if offset + _CHUNK.size + length > size:
+                break
+            index.append((offset, n_frames))
+            offset += _CHUNK.size + length
+
+        return np.asarray(index, dtype=np.int64).reshape(-1, 2)
+
+    def _chunk(self, c):
+        """
+        Returns the step counters and the frames of the chunk c.
+        """
+
+        if self._cache[0] != c:
+            offset, n_frames = self._index[c]
+            self._file.seek(offset)
+            length, n_frames, itemsize = _CHUNK.unpack(self._file.read(_CHUNK.size))
+            payload = _CODECS[self.compression][1](self._file.read(length))
+            self._cache = (c,) + _decode(payload, n_frames, self.shape, self.precision, itemsize)
+
+        return self._cache[1], self._cache[2]
+
+    def __len__(self):
+
+        return int(self._first[-1])
+
+    def __getitem__(self, t):
+        """
+        Returns the pose of frame t (negative indices count from the end).
+        """
+
+        t = int(t)
+        if t < 0:
+            t += len(self)
+
+        if t < 0 or t >= len(self):
+            raise IndexError("frame "+str(t)+" out of range ("+str(len(self))+" frames)")
+
+        c = int(np.searchsorted(self._first, t, side='right')) - 1
+
+        return self._chunk(c)[1][t - self._first[c]]
+
+    def __iter__(self):
+
+        for c in range(len(self._index)):
+            for frame in self._chunk(c)[1]:
+                yield frame
+
+    @property
+    def steps(self):
+        """
+        Step counter of the swarm at each frame (decompresses every chunk).
+        """
+
+        return np.concatenate([self._chunk(c)[0] for c in range(len(self._index))] + [np.zeros(0, dtype=np.int64)])
+
+    def close(self):
+        """
+        Closes the file.
+        """
+
+        self._file.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
@@ -0,0 +1,498 @@
+"""
+``pyswarming.tree``
+========================
+
+The PySwarming tree functions approximate the long-range behaviors, whose
+contribution decays as a power of the distance but never vanishes, with
+the Barnes-Hut method. The robots are grouped into a quadtree (2D swarms)
+or an octree (3D swarms), and a cell of side s seen from a robot at a
+distance D of its centroid is replaced by a single robot at the centroid,
+carrying the total weight of the cell, when s / D < theta (opening angle).
+The cells that are too close are opened, down to the leaves, whose robots
+are summed exactly. A step costs O(N log N) instead of O(N^2).
+
+Error bound
+-----------
+
+The centroid is the weighted mean of the robots of the cell, so the first
+order term of the expansion vanishes and the error of an accepted cell of
+total weight W is the second order remainder. For a law decaying as
+1 / D^p in n_dim dimensions (theta < 1 / sqrt(n_dim)) it is bounded by
+
+    C_p * n_dim * theta^2 / (1 - sqrt(n_dim) * theta)^(p + 2) * W / D^p
+
+with C_p = (p + 1) * (p + 2) / 2, i.e. O(theta^2) relative to the
+contribution of the cell. theta = 0 gives the exact result. The functions
+take ``compare=True`` to also return the relative error of every robot
+with respect to the exact all-pairs result, so theta can be picked per
+scenario.
+
+Functions present in pyswarming.tree are listed below.
+
+Tree
+----
+
+    Tree
+
+Approximated Behaviors
+----------------------
+
+    repulsion
+    perimeter_defense
+    force_law
+    inverse_power
+"""
+
+__all__ = ['Tree', 'repulsion', 'perimeter_defense', 'force_law', 'inverse_power']
+
+import numpy as np
+
+import geometry as gm
+
+
+def _kernel(x, norm_x, terms, vector):
+    """
+    Returns sum_t c_t x / |x|^(p_t + 1) (vector laws) or sum_t c_t / |x|^p_t
+    (scalar laws) for the displacements x, terms being a list of (c_t, p_t).
+    """
+
+    magnitude = np.zeros(norm_x.shape)
+
+    for c, p in terms:
+        magnitude += c / np.power(norm_x, p)
+
+    if vector:
+        return (magnitude / norm_x)[:, np.newaxis] * x
+
+    return magnitude
+
+
+def _weighted(w, values):
+    """
+    Multiplies the values of the pairs (scalar or vector) by their weight.
+    """
+
+    if values.ndim == 2:
+        return w[:, np.newaxis] * values
+
+    return w * values
+
+
+def _accumulate(out, q, values):
+    """
+    Adds the values of the pairs to the output of their robot q.
+    """
+
+    if out.ndim == 1:
+        out += np.bincount(q, weights=values, minlength=len(out))
+    else:
+        for k in range(out.shape[1]):
+            out[:, k] += np.bincount(q, weights=values[:, k], minlength=len(out))
+
+
+class Tree:
+    """
+    Creates the quadtree (2D swarms) or octree (3D swarms) of the robots
+    for one step. The cells are split until they hold at most leaf_size
+    robots, and the same tree can be used by several behaviors.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    leaf_size : int
+        maximum number of robots of a leaf cell, whose robots are
+        summed exactly.
+
+    max_depth : int
+        maximum depth of the tree, the cells of the last level being
+        leaves whatever their number of robots.
+
+    Attributes
+    ----------
+    n : int
+        number of robots.
+
+    n_dim : int
+        number of axes along which the robots are spread (2 for a
+        quadtree, 3 for an octree).
+
+    depth : int
+        number of levels of the tree.
+    """
+
+    def __init__(self, r, leaf_size=16, max_depth=20):
+
+        r = np.asarray(r, dtype=float)
+
+        self.r = r
+        self.n = len(r)
+
+        lower = np.min(r, axis=0)
+        extent = np.ptp(r, axis=0)
+        active = extent > 0
+
+        self.n_dim = max(int(np.sum(active)), 1)
+
+        # cubic root cell, slightly larger so every robot is inside
+        self.size = max(np.max(extent), 1.0) * (1.0 + 1e-9)
+
+        u = (r[:, active] - lower[active]) / self.size
+
+        max_depth = min(max_depth, 62 // self.n_dim)
+
+        self.levels = []
+
+        for depth in range(max_depth + 1):
+            coord = np.floor(u * 2**depth).astype(np.int64)
+            key = np.zeros(self.n, dtype=np.int64)
+            for axis in range(coord.shape[1]):
+                key = (key << depth) | coord[:, axis]
+
+            nodes, node = np.unique(key, return_inverse=True)
+            count = np.bincount(node, minlength=len(nodes))
+
+            # robots of each cell, contiguous in this order
+            order = np.argsort(node, kind='stable')
+            indptr = np.concatenate(([0], np.cumsum(count)))
+
+            leaf = (count <= leaf_size) | (depth == max_depth)
+
+            self.levels.append({'node': node.ravel(),
+                                'count': count,
+                                'order': order,
+                                'indptr': indptr,
+                                'leaf': leaf})
+
+            if leaf.all():
+                break
+
+        # children of each cell, in the CSR layout
+        for parent, child in zip(self.levels[:-1], self.levels[1:]):
+            first = child['order'][child['indptr'][:-1]]
+            parent_of = parent['node'][first]
+            order = np.argsort(parent_of, kind='stable')
+            parent['children'] = order
+            children = np.bincount(parent_of, minlength=len(parent['count']))
+            parent['children_indptr'] = np.concatenate(([0], np.cumsum(children)))
+
+        self.depth = len(self.levels)
+
+    def field(self, terms, theta=0.5, weights=None, vector=True):
+        """
+        Returns the sum over the other robots j of w_j K(r_j - r_i) for
+        every robot i, with K(x) = sum_t c_t x / |x|^(p_t + 1) for vector
+        laws and K(x) = sum_t c_t / |x|^p_t for scalar laws.
+
+        Parameters
+        ----------
+        terms : list
+            list of (c_t, p_t) tuples of the law.
+
+        theta : float
+            opening angle, a cell of side s at a distance D of the
+            robot being approximated by its centroid when s / D < theta.
+
+        weights : numpy.array
+            optional nonnegative weight w_j of each robot (e.g. masses),
+            1 when it is not given.
+
+        vector : bool
+            whether the law is a vector (True) or a scalar (False) law.
+
+        Returns
+        -------
+        total : numpy.array
+            array with one entry per robot, shape (n, 3) or (n,)
+        """
+
+        r = self.r
+
+        if weights is None:
+            weights = np.ones(self.n)
+        else:
+            weights = np.broadcast_to(np.asarray(weights, dtype=float), (self.n,))
+            if (weights < 0).any():
+                raise Exception("The weights must be nonnegative.")
+
+        out = np.zeros((self.n, 3) if vector else self.n)
+
+        # the robots are visited cell by cell, so the lookups stay local
+        q = self.levels[-1]['order']
+        node = np.zeros(self.n, dtype=np.intp)
+
+        for depth, level in enumerate(self.levels):
+            if len(q) == 0:
+                break
+
+            # total weight and weighted centroid of every cell
+            W = np.bincount(level['node'], weights=weights, minlength=len(level['count']))
+            safe_W = np.where(W > 0, W, 1.0)
+            centroid = np.stack([np.bincount(level['node'], weights=weights*r[:, k],
+                                             minlength=len(W)) for k in range(3)], axis=1) / safe_W[:, np.newaxis]
+
+            x = centroid[node] - r[q]
+            norm_x = np.linalg.norm(x, axis=1)
+
+            side = self.size / 2**depth
+            accept = (side < theta * norm_x) & (level['node'][q] != node) & (W[node] > 0)
+
+            # far cells, approximated by their centroid
+            if accept.any():
+                values = _kernel(x[accept], norm_x[accept], terms, vector)
+                _accumulate(out, q[accept], _weighted(W[node[accept]], values))
+
+            # near leaves, summed exactly
+            direct = ~accept & level['leaf'][node]
+            if direct.any():
+                q_leaf = q[direct]
+                count = level['count'][node[direct]]
+                start = level['indptr'][node[direct]]
+                j = level['order'][np.repeat(start - np.cumsum(count) + count, count) + np.arange(np.sum(count))]
+                i = np.repeat(q_leaf, count)
+                other = i != j
+                i, j = i[other], j[other]
+                x_ij = r[j] - r[i]
+                values = _kernel(x_ij, np.linalg.norm(x_ij, axis=1), terms, vector)
+                _accumulate(out, i, _weighted(weights[j], values))
+
+            # near cells, opened
+            opened = ~accept & ~level['leaf'][node]
+            if not opened.any():
+                break
+            q_open = q[opened]
+            count = np.diff(level['children_indptr'])[node[opened]]
+            start = level['children_indptr'][node[opened]]
+            node = level['children'][np.repeat(start - np.cumsum(count) + count, count) + np.arange(np.sum(count))]
+            q = np.repeat(q_open, count)
+
+        return out
+
+
+def _field(r, terms, theta, tree, compare, weights=None, vector=True):
+    """
+    Evaluates the law with the tree and, in compare mode, the relative
+    error of every robot with respect to the exact all-pairs sum.
+    """
+
+    if tree is None:
+        tree = Tree(r)
+
+    total = tree.field(terms, theta, weights, vector)
+
+    if not compare:
+        return total, None
+
+    geometry = gm.Geometry(r)
+    values = _kernel(geometry.r_ij, geometry.norm_r_ij, terms, vector)
+    if weights is not None:
+        values = _weighted(np.broadcast_to(np.asarray(weights, dtype=float), (geometry.n,))[geometry.j], values)
+    exact = geometry.sum(values)
+
+    if vector:
+        error = np.linalg.norm(total - exact, axis=1) / np.linalg.norm(exact, axis=1)
+    else:
+        error = np.abs(total - exact) / np.abs(exact)
+
+    return total, error
+
+
+def repulsion(r, alpha, d=2, theta=0.5, tree=None, compare=False):
+    """
+    Calculates the nondimensional contribution of every
+    robot based on the "repulsion algorithm", approximated
+    with the Barnes-Hut tree.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    alpha : float
+        float parameter to determine the strength of
+        the repulsion.
+
+    d : integer
+        integer > 1 parameter is the multipole order.
+
+    theta : float
+        opening angle of the tree (0 gives the exact result).
+
+    tree : pyswarming.tree.Tree
+        tree of the current step (i.e. Tree(r)), computed
+        from r when it is not given.
+
+    compare : bool
+        whether to also return the relative error of every
+        robot with respect to the exact result.
+
+    Returns
+    -------
+    g : numpy.array
+        array containing g_i of each robot
+
+    error : numpy.array
+        relative error of each robot (only if compare is True)
+    """
+
+    g, error = _field(r, [(-np.power(alpha, d), d)], theta, tree, compare)
+
+    if compare:
+        return g, error
+
+    return g
+
+
+def perimeter_defense(r, theta=0.5, tree=None, compare=False):
+    """
+    Calculate the new "heading" of every robot
+    based on the "perimeter defense algorithm",
+    approximated with the Barnes-Hut tree.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    theta : float
+        opening angle of the tree (0 gives the exact result).
+
+    tree : pyswarming.tree.Tree
+        tree of the current step (i.e. Tree(r)), computed
+        from r when it is not given.
+
+    compare : bool
+        whether to also return the relative error of every
+        robot with respect to the exact result.
+
+    Returns
+    -------
+    g : numpy.array
+        array containing g_i of each robot
+
+    error : numpy.array
+        relative error of each robot (only if compare is True)
+    """
+
+    g, error = _field(r, [(1.0, 1.0)], theta, tree, compare)
+
+    if compare:
+        return g, error
+
+    return g
+
+
+def force_law(r, G, m, p, theta=0.5, tree=None, compare=False):
+    """
+    Calculates the force of every robot using the
+    force law, approximated with the Barnes-Hut tree.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    G : float
+        gravitational constant.
+
+    m : float or numpy.array
+        mass of the robots, one nonnegative value per robot
+        or the same for all the robots.
+
+    p : float
+        power of the law.
+
+    theta : float
+        opening angle of the tree (0 gives the exact result).
+
+    tree : pyswarming.tree.Tree
+        tree of the current step (i.e. Tree(r)), computed
+        from r when it is not given.
+
+    compare : bool
+        whether to also return the relative error of every
+        robot with respect to the exact result.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the force of each robot
+
+    error : numpy.array
+        relative error of each robot (only if compare is True)
+    """
+
+    m = np.broadcast_to(np.asarray(m, dtype=float), (len(r),))
+
+    magnitude, error = _field(r, [(1.0, float(p))], theta, tree, compare, m, vector=False)
+
+    # as in the reference implementation, the scalar law is added to every component
+    f = np.repeat((G * m * magnitude)[:, np.newaxis], 3, axis=1)
+
+    if compare:
+        return f, error
+
+    return f
+
+
+def inverse_power(r, c_w, sigma_w, theta=0.5, tree=None, compare=False):
+    """
+    Calculates the force of every robot using the
+    inverse power law sum_w c_w / |r_j - r_i|^sigma_w,
+    approximated with the Barnes-Hut tree.
+
+    The pairwise law is summed over the neighbors; unlike
+    pyswarming.batched.inverse_power, the magnitude does not
+    accumulate over the neighbors in index order, which has
+    no spatial grouping.
+
+    Parameters
+    ----------
+    r : numpy.array
+        array must have the positions of all the robots in
+        cartesian coordinates (i.e. np.asarray([[x1, y1, z1],
+        [x2, y2, z2], ..., [xN, yN, zN]])).
+
+    c_w : numpy.array
+        array containing the coefficients of the law.
+
+    sigma_w : numpy.array
+        array containing the powers of the law.
+
+    theta : float
+        opening angle of the tree (0 gives the exact result).
+
+    tree : pyswarming.tree.Tree
+        tree of the current step (i.e. Tree(r)), computed
+        from r when it is not given.
+
+    compare : bool
+        whether to also return the relative error of every
+        robot with respect to the exact result.
+
+    Returns
+    -------
+    f : numpy.array
+        array containing the force of each robot
+
+    error : numpy.array
+        relative error of each robot (only if compare is True)
+    """
+
+    terms = list(zip(np.asarray(c_w, dtype=float).ravel(), np.asarray(sigma_w, dtype=float).ravel()))
+
+    f, error = _field(r, terms, theta, tree, compare)
+
+    if compare:
+        return f, error
+
+    return f
@@ -10,6 +10,11 @@ INSTALL_REQUIRES = [
     "matplotlib",
 ]
 
+# Optional packages:
+EXTRAS_REQUIRE = {
+    "numba": ["numba"],
+}
+
 setuptools.setup(
     name="pyswarming",
     version="1.1.5",
@@ -33,4 +38,5 @@ setuptools.setup(
     ],
     python_requires=">=3.7",
     install_requires=INSTALL_REQUIRES,
+    extras_require=EXTRAS_REQUIRE,
 )
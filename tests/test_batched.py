@@ -0,0 +1,333 @@
+import pytest
+import tracemalloc
+import pyswarming.behaviors as pb
+import pyswarming.batched as pbt
+import pyswarming.regions as pr
+import numpy as np
+
+'''
+    #   Tested      Algorithm
+
+    1   yes         collision_avoidance
+    2   yes         perimeter_defense
+    3   yes         aggregation
+    4   yes         repulsion
+    5   yes         inverse_power
+    6   yes         spring
+    7   yes         force_law
+    8   yes         repulsive_force
+    9   yes         body_force
+    10  yes         inter_robot_spacing
+    11  yes         lennard_jones (11_1 and 11_2)
+    12  yes         pairwise_forces
+    13  yes         leaderless_heading_consensus
+    14  yes         heading_consensus
+    15  yes         leader_following
+    16  yes         geofencing (16_1 and 16_2)
+    17  yes         area_coverage
+    18  yes         environment_exploration
+    19  yes         alignment
+    20  yes         target
+    21  yes         collective_navigation
+    22  yes         flocking
+    23  yes         tiled (23_1, 23_2, 23_3 and 23_4)
+'''
+
+def reference(behavior, r, *args):
+    # evaluates the scalar behavior for each robot, its neighborhood being all the other robots
+    out = np.zeros((len(r), 3))
+    for r_ind in range(len(r)):
+        r_i = r[r_ind]
+        r_j = np.delete(r, np.array([r_ind]), axis=0)
+        out[r_ind] = behavior(r_i, r_j, *args)
+    return out
+
+r = np.asarray([[8., 8., 8.],
+                [-8., 8., 7.],
+                [8., -8., 6.],
+                [-8., -8., 5.],
+                [1., 2., 3.]])
+
+# 1
+def test_collision_avoidance():
+    g = pbt.collision_avoidance(r)
+    assert g.shape == (5, 3)
+    assert np.isclose(g, reference(pb.collision_avoidance, r)).all() == True
+
+# 2
+def test_perimeter_defense():
+    g = pbt.perimeter_defense(r)
+    assert g.shape == (5, 3)
+    assert np.isclose(g, reference(pb.perimeter_defense, r)).all() == True
+
+# 3
+def test_aggregation():
+    g = pbt.aggregation(r)
+    assert g.shape == (5, 3)
+    assert np.isclose(g, reference(pb.aggregation, r)).all() == True
+
+# 4
+def test_repulsion():
+    g = pbt.repulsion(r, 3.0)
+    assert g.shape == (5, 3)
+    assert np.isclose(g, reference(pb.repulsion, r, 3.0)).all() == True
+    g = pbt.repulsion(r, 2.0, 3)
+    assert np.isclose(g, reference(pb.repulsion, r, 2.0, 3)).all() == True
+
+# 5
+def test_inverse_power():
+    c_w = np.asarray([1.0, -1.0])
+    sigma_w = np.asarray([1.0, 2.0])
+    f = pbt.inverse_power(r, c_w, sigma_w)
+    assert f.shape == (5, 3)
+    assert np.isclose(f, reference(pb.inverse_power, r, c_w, sigma_w)).all() == True
+
+# 6
+def test_spring():
+    f = pbt.spring(r, 10.0, 5.0)
+    assert f.shape == (5, 3)
+    assert np.isclose(f, reference(pb.spring, r, 10.0, 5.0)).all() == True
+
+# 7
+def test_force_law():
+    # heterogeneous masses
+    m = np.asarray([1.0, 2.0, 3.0, 4.0, 5.0])
+    f = pbt.force_law(r, 10.0, m, 2.0)
+    f_expected = np.zeros((len(r), 3))
+    for r_ind in range(len(r)):
+        r_j = np.delete(r, np.array([r_ind]), axis=0)
+        m_j = np.delete(m, np.array([r_ind]), axis=0)
+        f_expected[r_ind] = pb.force_law(r[r_ind], r_j, 10.0, m[r_ind], m_j, 2.0)
+    assert f.shape == (5, 3)
+    assert np.isclose(f, f_expected).all() == True
+
+# 8
+def test_repulsive_force():
+    # heterogeneous radii
+    R = np.asarray([5.0, 4.0, 3.0, 2.0, 1.0])
+    f = pbt.repulsive_force(r, 10.0, 100.0, R)
+    f_expected = np.zeros((len(r), 3))
+    for r_ind in range(len(r)):
+        r_j = np.delete(r, np.array([r_ind]), axis=0)
+        R_j = np.delete(R, np.array([r_ind]), axis=0)
+        f_expected[r_ind] = pb.repulsive_force(r[r_ind], r_j, 10.0, 100.0, R[r_ind], R_j)
+    assert f.shape == (5, 3)
+    assert np.isclose(f, f_expected).all() == True
+
+# 9
+def test_body_force():
+    # heterogeneous radii, some pairs are out of the contact range
+    R = np.asarray([20.0, 2.0, 20.0, 2.0, 5.0])
+    f = pbt.body_force(r, 0.1, R)
+    f_expected = np.zeros((len(r), 3))
+    for r_ind in range(len(r)):
+        r_j = np.delete(r, np.array([r_ind]), axis=0)
+        R_j = np.delete(R, np.array([r_ind]), axis=0)
+        f_expected[r_ind] = pb.body_force(r[r_ind], r_j, 0.1, R[r_ind], R_j)
+    assert f.shape == (5, 3)
+    assert np.isclose(f, f_expected).all() == True
+
+# 10
+def test_inter_robot_spacing():
+    f = pbt.inter_robot_spacing(r, 10.0, 5.0)
+    assert f.shape == (5, 3)
+    assert np.isclose(f, reference(pb.inter_robot_spacing, r, 10.0, 5.0)).all() == True
+
+# the lennard_jones law is applied to each component of r_j - r_i,
+# so no two robots may share a coordinate
+r_lj = np.asarray([[8., 5., 8.],
+                   [-5., 6., 7.],
+                   [7., -8., 6.],
+                   [-6., -7., 5.],
+                   [1., 2., 3.]])
+
+# 11_1
+def test_lennard_jones_1():
+    f = pbt.lennard_jones(r_lj, 1.0, 1.2)
+    assert f.shape == (5, 3)
+    assert np.isclose(f, reference(pb.lennard_jones, r_lj, 1.0, 1.2)).all() == True
+
+# 11_2
+def test_lennard_jones_2():
+    f = pbt.lennard_jones(r_lj, 1.0, 1.2, True)
+    assert np.isclose(f, reference(pb.lennard_jones, r_lj, 1.0, 1.2, True)).all() == True
+
+# 12
+def test_pairwise_forces():
+    laws = {'spring': {'k': 10.0, 'l': 5.0},
+            'inter_robot_spacing': {'alpha': 10.0, 'd_0': 5.0},
+            'body_force': {'Lambda': 0.1, 'R': 20.0*np.ones(5)}}
+    f = pbt.pairwise_forces(r, laws)
+    f_expected = (pbt.spring(r, 10.0, 5.0) +
+                  pbt.inter_robot_spacing(r, 10.0, 5.0) +
+                  pbt.body_force(r, 0.1, 20.0*np.ones(5)))
+    assert f.shape == (5, 3)
+    assert np.isclose(f, f_expected).all() == True
+
+theta = np.asarray([[0.78, 0.78, 0.78],
+                    [-0.78, 0.78, 0.78],
+                    [0.78, -0.78, 0.78],
+                    [-0.78, -0.78, 0.78],
+                    [0.1, 0.2, -0.3]])
+
+# 13
+def test_leaderless_heading_consensus():
+    new_theta = pbt.leaderless_heading_consensus(theta)
+    assert new_theta.shape == (5, 3)
+    assert np.isclose(new_theta, reference(pb.leaderless_heading_consensus, theta)).all() == True
+
+# 14
+def test_heading_consensus():
+    new_theta = pbt.heading_consensus(theta)
+    assert new_theta.shape == (5, 3)
+    assert np.isclose(new_theta, reference(pb.heading_consensus, theta)).all() == True
+
+# 15
+def test_leader_following():
+    theta_0 = np.asarray([0.0, 0.0, 1.5])
+    b = np.asarray([1, 0, 1, 0, 0])
+    new_theta = pbt.leader_following(theta, theta_0, b)
+    new_theta_expected = np.zeros((len(theta), 3))
+    for theta_ind in range(len(theta)):
+        theta_j = np.delete(theta, np.array([theta_ind]), axis=0)
+        new_theta_expected[theta_ind] = pb.leader_following(theta[theta_ind], theta_j, theta_0, b[theta_ind])
+    assert new_theta.shape == (5, 3)
+    assert np.isclose(new_theta, new_theta_expected).all() == True
+
+# 16_1
+def test_geofencing_1():
+    # plain function, numerical gradient
+    sphere = lambda x: x[0]**2 + x[1]**2 + x[2]**2 - 4.0
+    g = pbt.geofencing(r, sphere)
+    g_expected = np.asarray([pb.geofencing(r_i, sphere) for r_i in r])
+    assert g.shape == (5, 3)
+    assert np.isclose(g, g_expected).all() == True
+
+# 16_2
+def test_geofencing_2():
+    # region with an exact gradient
+    sphere = lambda x: x[0]**2 + x[1]**2 + x[2]**2 - 4.0
+    g = pbt.geofencing(r, pr.Sphere([0.0, 0.0, 0.0], 2.0))
+    g_expected = np.asarray([pb.geofencing(r_i, sphere) for r_i in r])
+    assert np.isclose(g, g_expected).all() == True
+
+# 17
+def test_area_coverage():
+    sphere = pr.Sphere([0.0, 0.0, 0.0], 2.0)
+    b = pbt.area_coverage(r, sphere, 3.0, 3)
+    assert b.shape == (5, 3)
+    assert np.isclose(b, reference(pb.area_coverage, r, sphere, 3.0, 3)).all() == True
+
+# 18
+def test_environment_exploration():
+    T = np.asarray([30.0, 30.0, 30.0])
+    H = np.asarray([1, 0, 1, 0, 1])
+    v = pbt.environment_exploration(r, theta, H, T, 15.0)
+    v_expected = np.zeros((len(r), 3))
+    for r_ind in range(len(r)):
+        r_j = np.delete(r, np.array([r_ind]), axis=0)
+        theta_j = np.delete(theta, np.array([r_ind]), axis=0)
+        v_expected[r_ind] = pb.environment_exploration(r[r_ind], r_j, theta_j, H[r_ind], T, 15.0)
+    assert v.shape == (5, 3)
+    assert np.isclose(v, v_expected).all() == True
+
+velocity = np.asarray([[1.0, 0, 0],
+                       [0, 2.0, 0],
+                       [0, 0, 1.0],
+                       [0, 1.0, 0],
+                       [1.0, 1.0, 1.0]])
+
+# 19
+def test_alignment():
+    g = pbt.alignment(velocity)
+    assert g.shape == (5, 3)
+    assert np.isclose(g, reference(pb.alignment, velocity)).all() == True
+
+# 20
+def test_target():
+    T = np.asarray([30.0, 30.0, 30.0])
+    b = pbt.target(r, T)
+    assert b.shape == (5, 3)
+    assert np.isclose(b, np.asarray([pb.target(r_i, T) for r_i in r])).all() == True
+
+# 21
+def test_collective_navigation():
+    T = np.asarray([30.0, 30.0, 30.0])
+    b = pbt.collective_navigation(r, T, 2.0, 2)
+    assert b.shape == (5, 3)
+    assert np.isclose(b, reference(pb.collective_navigation, r, T, 2.0, 2)).all() == True
+
+# 22
+def test_flocking():
+    b = pbt.flocking(r, velocity, 2.0, 2)
+    b_expected = np.zeros((len(r), 3))
+    for r_ind in range(len(r)):
+        r_j = np.delete(r, np.array([r_ind]), axis=0)
+        v_j = np.delete(velocity, np.array([r_ind]), axis=0)
+        b_expected[r_ind] = pb.flocking(r[r_ind], r_j, velocity[r_ind], v_j, 2.0, 2)
+    assert b.shape == (5, 3)
+    assert np.isclose(b, b_expected).all() == True
+
+# 23_1
+def test_tiled_1():
+    # the blocks give the all-pairs result, whatever the tile size
+    for tile_size in [1, 2, 5, 7]:
+        assert np.isclose(pbt.tiled(pbt.repulsion, r, 3.0, tile_size=tile_size), pbt.repulsion(r, 3.0)).all() == True
+    assert np.isclose(pbt.tiled(pbt.flocking, r, velocity, 2.0, 2, tile_size=2),
+                      pbt.flocking(r, velocity, 2.0, 2)).all() == True
+    c_w = np.asarray([1.0, -1.0])
+    sigma_w = np.asarray([1.0, 2.0])
+    assert np.isclose(pbt.tiled(pbt.inverse_power, r, c_w, sigma_w, tile_size=3),
+                      pbt.inverse_power(r, c_w, sigma_w)).all() == True
+    laws = {'spring': {'k': 10.0, 'l': 5.0}, 'body_force': {'Lambda': 0.1, 'R': 20.0*np.ones(5)}}
+    assert np.isclose(pbt.tiled(pbt.pairwise_forces, r, laws, tile_size=2), pbt.pairwise_forces(r, laws)).all() == True
+
+# 23_2
+def test_tiled_2():
+    # the memory budget sets the tile size
+    row_bytes = pbt._pair_bytes(pbt.aggregation, (), {}) * 4
+    assert np.isclose(pbt.tiled(pbt.aggregation, r, memory=2*row_bytes), pbt.aggregation(r)).all() == True
+    with pytest.raises(Exception):
+        pbt.tiled(pbt.aggregation, r, memory=row_bytes - 1)
+
+# 23_3
+def test_tiled_3():
+    # the per-robot terms are only evaluated for the robots of each block
+    calls = []
+    def A(x):
+        calls.append(1)
+        return x[0]**2 + x[1]**2 + x[2]**2 - 4.0
+    def grad_A(x):
+        return np.asarray([2*x[0], 2*x[1], 2*x[2]])
+    region = pr.FunctionRegion(A, grad_A)
+    b = pbt.tiled(pbt.area_coverage, r, region, 3.0, 3, tile_size=2)
+    assert len(calls) == len(r)
+    assert np.isclose(b, pbt.area_coverage(r, pr.Sphere([0.0, 0.0, 0.0], 2.0), 3.0, 3)).all() == True
+    T = np.asarray([30.0, 30.0, 30.0])
+    assert np.isclose(pbt.tiled(pbt.collective_navigation, r, T, 3.0, 3, tile_size=2),
+                      pbt.collective_navigation(r, T, 3.0, 3)).all() == True
+    theta = np.zeros((5, 3))
+    theta[:, 2] = np.linspace(0.0, np.pi, 5)
+    H = np.linspace(0.1, 0.9, 5)
+    assert np.isclose(pbt.tiled(pbt.environment_exploration, r, theta, H, T, 5.0, tile_size=2),
+                      pbt.environment_exploration(r, theta, H, T, 5.0)).all() == True
+
+# 23_4
+def test_tiled_4():
+    # the peak memory of the composite behaviors stays within the budget
+    rng = np.random.default_rng(0)
+    n = 1000
+    r_n = 100.0*rng.random((n, 3))
+    v_n = rng.random((n, 3))
+    theta_n = rng.random((n, 3))
+    T = np.asarray([30.0, 30.0, 30.0])
+    laws = {'spring': {'k': 10.0, 'l': 5.0}, 'lennard_jones': {'epsilon': 1.0, 'sigma': 1.0}}
+    memory = 4*2**20
+    for behavior, args in [(pbt.flocking, (v_n, 2.0, 2)),
+                           (pbt.environment_exploration, (theta_n, 0.5, T, 5.0)),
+                           (pbt.pairwise_forces, (laws,))]:
+        tracemalloc.start()
+        pbt.tiled(behavior, r_n, *args, memory=memory)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert peak <= memory
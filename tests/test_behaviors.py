@@ -21,7 +21,7 @@ import numpy as np
     15  yes         modified_attraction_alignment
     16  yes         heading_consensus
     17  yes         perimeter_defense
-    18  yes         environment_exploration (18_1 and 18_2)
+    18  yes         environment_exploration (18_1, 18_2 and 18_3)
     19  yes         aggregation
     20  yes         alignment
     21  yes         geofencing
@@ -551,6 +551,16 @@ def test_environment_exploration_2():
                            [ 0.55936989,  0.55753435,  0.10465241]])
     assert np.isclose(v, v_expected, atol=1e-3).all() == True
 
+# 18_3
+def test_environment_exploration_3():
+    # an isolated robot only follows the target
+    r_i = np.asarray([3., 4., 0.])
+    T = np.asarray([0., 0., 0.])
+    v = pb.environment_exploration(r_i, np.zeros((0, 3)), np.zeros((0, 3)), 1, T, 2.0)
+    assert np.isclose(v, [-0.6, -0.8, 0.]).all() == True
+    v = pb.environment_exploration(r_i, np.zeros((0, 3)), np.zeros((0, 3)), 0, T, 2.0)
+    assert np.isclose(v, [0., 0., 0.]).all() == True
+
 # 19
 def test_aggregation_1():
     # aggregation with four robots
@@ -0,0 +1,90 @@
+import pytest
+import pyswarming.behaviors as pb
+import pyswarming.batched as pbt
+import pyswarming.geometry as pgm
+import numpy as np
+
+'''
+    #   Tested      Algorithm
+
+    1   yes         Geometry (1_1, 1_2, 1_3 and 1_4)
+    2   yes         GeometryRow
+'''
+
+r = np.asarray([[8., 8., 8.],
+                [-8., 8., 7.],
+                [8., -8., 6.],
+                [-8., -8., 5.],
+                [1., 2., 3.]])
+
+# 1_1
+def test_geometry_1():
+    geometry = pgm.Geometry(r)
+    assert geometry.n == 5
+    assert geometry.r_ij.shape == (20, 3)
+    assert (geometry.count == 4).all() == True
+    for r_ind in range(len(r)):
+        r_j = np.delete(r, np.array([r_ind]), axis=0)
+        pairs = slice(geometry.indptr[r_ind], geometry.indptr[r_ind+1])
+        assert (geometry.i[pairs] == r_ind).all() == True
+        assert np.isclose(geometry.r_ij[pairs], r_j - r[r_ind]).all() == True
+        assert np.isclose(geometry.norm_r_ij[pairs], np.linalg.norm(r_j - r[r_ind], axis=1)).all() == True
+    assert np.isclose(geometry.unit, geometry.r_ij / geometry.norm_r_ij[:, np.newaxis]).all() == True
+    # the inverse powers are cached
+    assert geometry.inv_power(2) is geometry.inv_power(2)
+    assert np.isclose(geometry.inv_power(2), 1.0 / geometry.norm_r_ij**2).all() == True
+
+# 1_2
+def test_geometry_2():
+    geometry = pgm.Geometry(r)
+    values = np.arange(20.0)
+    assert np.isclose(geometry.sum(values), [6.0, 22.0, 38.0, 54.0, 70.0]).all() == True
+    assert geometry.sum(geometry.r_ij).shape == (5, 3)
+    assert np.isclose(geometry.cumsum(values)[4:8], [4.0, 9.0, 15.0, 22.0]).all() == True
+    v = np.asarray([[1.0, 0, 0], [0, 2.0, 0], [0, 0, 1.0], [0, 1.0, 0], [1.0, 1.0, 1.0]])
+    v_ij, norm_v_ij = geometry.difference(v)
+    assert np.isclose(v_ij[:4], np.delete(v, np.array([0]), axis=0) - v[0]).all() == True
+
+# 1_3
+def test_geometry_3():
+    # one geometry shared by several batched behaviors
+    geometry = pgm.Geometry(r)
+    assert np.isclose(pbt.aggregation(r, geometry), pbt.aggregation(r)).all() == True
+    assert np.isclose(pbt.repulsion(r, 3.0, 2, geometry), pbt.repulsion(r, 3.0)).all() == True
+    laws = {'spring': {'k': 10.0, 'l': 5.0}, 'inverse_power': {'c_w': [1.0, -1.0], 'sigma_w': [1.0, 2.0]}}
+    assert np.isclose(pbt.pairwise_forces(r, laws, geometry), pbt.pairwise_forces(r, laws)).all() == True
+
+# 1_4
+def test_geometry_4():
+    # a geometry restricted to a block of robots, for every kind of neighborhoods
+    indptr = np.asarray([0, 2, 3, 3, 5, 6])
+    indices = np.asarray([1, 4, 0, 0, 1, 3])
+    knn = np.asarray([[1, 4], [0, 2], [0, 3], [2, 4], [0, 3]])
+    for neighborhoods in [(None, None), (indptr, indices), (None, knn)]:
+        geometry = pgm.Geometry(r, *neighborhoods)
+        block = pgm.Geometry(r, *neighborhoods, rows=slice(1, 4))
+        assert block.n == 3
+        assert block.rows == slice(1, 4)
+        assert (block.count == geometry.count[1:4]).all() == True
+        assert (block.i == geometry.i[(geometry.i >= 1) & (geometry.i < 4)]).all() == True
+        assert np.isclose(block.sum(block.r_ij), geometry.sum(geometry.r_ij)[1:4]).all() == True
+        assert np.isclose(block.mean(block.unit), geometry.mean(geometry.unit)[1:4]).all() == True
+        assert np.isclose(pbt.repulsion(r, 3.0, 2, block), pbt.repulsion(r, 3.0, 2, geometry)[1:4]).all() == True
+    with pytest.raises(Exception):
+        pgm.Geometry(r, rows=slice(0, 5, 2))
+
+# 2
+def test_geometry_row():
+    # the scalar behaviors take the row of robot i
+    geometry = pgm.Geometry(r)
+    T = np.asarray([30.0, 30.0, 30.0])
+    for r_ind in range(len(r)):
+        r_i = r[r_ind]
+        r_j = np.delete(r, np.array([r_ind]), axis=0)
+        row = geometry.row(r_ind)
+        assert (row.j == np.delete(np.arange(5), r_ind)).all() == True
+        assert np.isclose(pb.aggregation(r_i, r_j, row), pb.aggregation(r_i, r_j)).all() == True
+        assert np.isclose(pb.repulsion(r_i, r_j, 3.0, 2, row), pb.repulsion(r_i, r_j, 3.0)).all() == True
+        assert np.isclose(pb.collective_navigation(r_i, r_j, T, 3.0, 2, row),
+                          pb.collective_navigation(r_i, r_j, T, 3.0)).all() == True
+        assert np.isclose(pb.spring(r_i, r_j, 10.0, 5.0, row), pb.spring(r_i, r_j, 10.0, 5.0)).all() == True
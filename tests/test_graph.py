@@ -0,0 +1,87 @@
+import pyswarming.behaviors as pb
+import pyswarming.batched as pbt
+import pyswarming.geometry as pgm
+import pyswarming.graph as pg
+import numpy as np
+
+'''
+    #   Tested      Algorithm
+
+    1   yes         leaderless_heading_consensus
+    2   yes         leader_following
+    3   yes         heading_consensus
+    4   yes         consensus (4_1, 4_2 and 4_3)
+'''
+
+theta = np.asarray([[0.78, 0.78, 0.78],
+                    [-0.78, 0.78, 0.78],
+                    [0.78, -0.78, 0.78],
+                    [-0.78, -0.78, 0.78],
+                    [0.1, 0.2, -0.3],
+                    [0.5, -0.1, 1.2]])
+
+# ring communication graph: robot i talks to robots i-1 and i+1
+neighbors = [[(i - 1) % 6, (i + 1) % 6] for i in range(6)]
+indptr = np.asarray([0, 2, 4, 6, 8, 10, 12])
+indices = np.asarray(neighbors).ravel()
+
+def reference(behavior, theta, *args):
+    # evaluates the scalar behavior for each robot over its neighbors in the graph
+    out = np.zeros((len(theta), 3))
+    for theta_ind in range(len(theta)):
+        theta_j = theta[neighbors[theta_ind]]
+        out[theta_ind] = behavior(theta[theta_ind], theta_j, *args)
+    return out
+
+# 1
+def test_leaderless_heading_consensus():
+    new_theta = pg.leaderless_heading_consensus(theta, indptr, indices)
+    assert new_theta.shape == (6, 3)
+    assert np.isclose(new_theta, reference(pb.leaderless_heading_consensus, theta)).all() == True
+
+# 2
+def test_leader_following():
+    theta_0 = np.asarray([0.0, 0.0, 1.5])
+    b = np.asarray([1, 0, 0, 1, 0, 0])
+    new_theta = pg.leader_following(theta, theta_0, b, indptr, indices)
+    new_theta_expected = np.zeros((len(theta), 3))
+    for theta_ind in range(len(theta)):
+        theta_j = theta[neighbors[theta_ind]]
+        new_theta_expected[theta_ind] = pb.leader_following(theta[theta_ind], theta_j, theta_0, b[theta_ind])
+    assert new_theta.shape == (6, 3)
+    assert np.isclose(new_theta, new_theta_expected).all() == True
+
+# 3
+def test_heading_consensus():
+    new_theta = pg.heading_consensus(theta, indptr, indices)
+    assert new_theta.shape == (6, 3)
+    assert np.isclose(new_theta, reference(pb.heading_consensus, theta)).all() == True
+
+# 4_1
+def test_consensus_iterations():
+    new_theta = pg.consensus(theta, indptr, indices, iterations=50)
+    theta_expected = np.copy(theta)
+    for iteration in range(50):
+        theta_expected = reference(pb.heading_consensus, theta_expected)
+    assert np.isclose(new_theta, theta_expected).all() == True
+    # the ring is connected, so the headings agree
+    assert np.isclose(new_theta, np.mean(theta, axis=0), atol=1e-3).all() == True
+
+# 4_2
+def test_consensus_weighted():
+    weights = np.arange(1.0, 13.0)
+    new_theta = pg.consensus(theta, indptr, indices, weights)
+    theta_expected = np.zeros((len(theta), 3))
+    for theta_ind in range(len(theta)):
+        w = weights[indptr[theta_ind]:indptr[theta_ind+1]]
+        theta_j = theta[neighbors[theta_ind]]
+        theta_expected[theta_ind] = (theta[theta_ind] + w @ theta_j) / (1.0 + np.sum(w))
+    assert np.isclose(new_theta, theta_expected).all() == True
+
+# 4_3
+def test_consensus_complete_graph():
+    # on the complete graph it matches the all-to-all consensus
+    complete = pgm._neighbor_table(6)
+    indptr_complete = np.arange(0, 31, 5)
+    new_theta = pg.consensus(theta, indptr_complete, complete.ravel())
+    assert np.isclose(new_theta, pbt.consensus(theta)).all() == True
@@ -0,0 +1,97 @@
+import pytest
+import pyswarming.batched as pbt
+import pyswarming.geometry as pgm
+import pyswarming.neighbors as pnb
+import numpy as np
+
+numba = pytest.importorskip('numba')
+
+'''
+    #   Tested      Algorithm
+
+    1   yes         body_force (1_1 and 1_2)
+    2   yes         lennard_jones (2_1 and 2_2)
+    3   yes         environment_exploration (3_1 and 3_2)
+    4   yes         set_backend (4_1 and 4_2)
+    5   yes         tiled
+'''
+
+rng = np.random.default_rng(0)
+r = rng.uniform(-5.0, 5.0, size=(60, 3))
+theta = np.zeros((60, 3))
+theta[:, 2] = rng.uniform(-np.pi, np.pi, size=60)
+R = rng.uniform(0.5, 2.0, size=60)
+
+indptr, indices = pnb.cell_list(r, 3.0)
+geometry = pgm.Geometry(r, indptr, indices)
+
+# 1_1
+def test_body_force_1():
+    f_numpy = pbt.body_force(r, 0.1, R)
+    f_numba = pbt.body_force(r, 0.1, R, backend='numba')
+    assert np.isclose(f_numba, f_numpy).all() == True
+
+# 1_2
+def test_body_force_2():
+    # sparse neighborhoods and per-robot coefficients
+    Lambda = rng.uniform(0.0, 1.0, size=60)
+    f_numpy = pbt.body_force(r, Lambda, R, geometry=geometry)
+    f_numba = pbt.body_force(r, Lambda, R, geometry=geometry, backend='numba')
+    assert np.isclose(f_numba, f_numpy).all() == True
+
+# 2_1
+def test_lennard_jones_1():
+    for normalized in [False, True]:
+        f_numpy = pbt.lennard_jones(r, 1.0, 1.2, normalized)
+        f_numba = pbt.lennard_jones(r, 1.0, 1.2, normalized, backend='numba')
+        assert np.isclose(f_numba, f_numpy).all() == True
+
+# 2_2
+def test_lennard_jones_2():
+    f_numpy = pbt.lennard_jones(r, 1.0, R, True, geometry=geometry)
+    f_numba = pbt.lennard_jones(r, 1.0, R, True, geometry=geometry, backend='numba')
+    assert np.isclose(f_numba, f_numpy).all() == True
+
+# 3_1
+def test_environment_exploration_1():
+    T = np.asarray([10.0, 10.0, 0.0])
+    v_numpy = pbt.environment_exploration(r, theta, 0.5, T, 2.0)
+    v_numba = pbt.environment_exploration(r, theta, 0.5, T, 2.0, backend='numba')
+    assert np.isclose(v_numba, v_numpy).all() == True
+
+# 3_2
+def test_environment_exploration_2():
+    # robots without neighbors only follow the target
+    T = np.asarray([10.0, 10.0, 0.0])
+    v_numpy = pbt.environment_exploration(r, theta, R / 2.0, T, R, geometry=geometry)
+    v_numba = pbt.environment_exploration(r, theta, R / 2.0, T, R, geometry=geometry, backend='numba')
+    assert np.isclose(v_numba, v_numpy).all() == True
+
+# 4_1
+def test_set_backend_1():
+    assert pbt.get_backend() == 'numpy'
+    try:
+        pbt.set_backend('numba')
+        assert pbt.get_backend() == 'numba'
+        f = pbt.body_force(r, 0.1, R)
+        assert np.isclose(f, pbt.body_force(r, 0.1, R, backend='numpy')).all() == True
+    finally:
+        pbt.set_backend('numpy')
+
+# 4_2
+def test_set_backend_2():
+    with pytest.raises(Exception):
+        pbt.set_backend('cuda')
+    with pytest.raises(Exception):
+        pbt.body_force(r, 0.1, R, backend='cuda')
+
+# 5
+def test_tiled():
+    # the kernels evaluate the robots of the block of the geometry
+    T = np.asarray([10.0, 10.0, 0.0])
+    assert np.isclose(pbt.tiled(pbt.body_force, r, 0.1, R, tile_size=7, backend='numba'),
+                      pbt.body_force(r, 0.1, R)).all() == True
+    assert np.isclose(pbt.tiled(pbt.lennard_jones, r, 1.0, R, True, tile_size=7, backend='numba'),
+                      pbt.lennard_jones(r, 1.0, R, True)).all() == True
+    assert np.isclose(pbt.tiled(pbt.environment_exploration, r, theta, R / 2.0, T, R, tile_size=7, backend='numba'),
+                      pbt.environment_exploration(r, theta, R / 2.0, T, R)).all() == True
@@ -0,0 +1,182 @@
+import pytest
+import pyswarming.behaviors as pb
+import pyswarming.batched as pbt
+import pyswarming.geometry as pgm
+import pyswarming.neighbors as pn
+import numpy as np
+
+'''
+    #   Tested      Algorithm
+
+    1   yes         cell_list (1_1, 1_2 and 1_3)
+    2   yes         Geometry with cell list neighborhoods (2_1 and 2_2)
+    3   yes         nearest (3_1, 3_2 and 3_3)
+    4   yes         Geometry with nearest neighborhoods
+    5   yes         VerletList (5_1 and 5_2)
+    6   yes         groups of robots
+'''
+
+def brute_force(r, cutoff):
+    # neighbors of each robot by comparing every pair
+    d = np.linalg.norm(r[:, np.newaxis] - r[np.newaxis], axis=2)
+    np.fill_diagonal(d, np.inf)
+    return [np.flatnonzero(d[r_ind] <= cutoff) for r_ind in range(len(r))]
+
+rng = np.random.default_rng(0)
+r = rng.uniform(-20.0, 20.0, size=(300, 3))
+
+# 1_1
+def test_cell_list_1():
+    # 3D
+    indptr, indices = pn.cell_list(r, 6.0)
+    expected = brute_force(r, 6.0)
+    assert indptr.shape == (301,)
+    for r_ind in range(len(r)):
+        assert (indices[indptr[r_ind]:indptr[r_ind+1]] == expected[r_ind]).all() == True
+
+# 1_2
+def test_cell_list_2():
+    # 2D, the z layer is a single cell
+    r_2d = r.copy()
+    r_2d[:, 2] = 0.0
+    indptr, indices = pn.cell_list(r_2d, 3.0)
+    expected = brute_force(r_2d, 3.0)
+    for r_ind in range(len(r)):
+        assert (indices[indptr[r_ind]:indptr[r_ind+1]] == expected[r_ind]).all() == True
+
+# 1_3
+def test_cell_list_3():
+    # isolated robots and an invalid cutoff
+    r_far = np.asarray([[0.0, 0.0, 0.0], [100.0, 0.0, 0.0], [0.5, 0.0, 0.0]])
+    indptr, indices = pn.cell_list(r_far, 1.0)
+    assert (indptr == [0, 1, 1, 2]).all() == True
+    assert (indices == [2, 0]).all() == True
+    with pytest.raises(Exception):
+        pn.cell_list(r_far, 0.0)
+
+# 2_1
+def test_geometry_cell_list_1():
+    # the batched behaviors see only the neighbors within range
+    indptr, indices = pn.cell_list(r, 8.0)
+    geometry = pgm.Geometry(r, indptr, indices)
+    g = pbt.repulsion(r, 3.0, 2, geometry)
+    a = pbt.aggregation(r, geometry)
+    f = pbt.body_force(r, 0.1, 5.0, geometry)
+    for r_ind in range(len(r)):
+        r_i = r[r_ind]
+        r_j = r[indices[indptr[r_ind]:indptr[r_ind+1]]]
+        assert np.isclose(g[r_ind], pb.repulsion(r_i, r_j, 3.0)).all() == True
+        assert np.isclose(a[r_ind], pb.aggregation(r_i, r_j)).all() == True
+        assert np.isclose(f[r_ind], pb.body_force(r_i, r_j, 0.1, 5.0, 5.0*np.ones(len(r_j)))).all() == True
+
+# 2_2
+def test_geometry_cell_list_2():
+    # a cutoff larger than the swarm gives the all-pairs result
+    indptr, indices = pn.cell_list(r, 1000.0)
+    geometry = pgm.Geometry(r, indptr, indices)
+    assert np.isclose(pbt.aggregation(r, geometry), pbt.aggregation(r)).all() == True
+    assert np.isclose(pbt.repulsion(r, 3.0, 2, geometry), pbt.repulsion(r, 3.0)).all() == True
+
+def brute_force_nearest(r, k):
+    # k nearest neighbors of each robot by comparing every pair
+    d = np.linalg.norm(r[:, np.newaxis] - r[np.newaxis], axis=2)
+    np.fill_diagonal(d, np.inf)
+    return np.sort(np.argsort(d, axis=1)[:, :k], axis=1)
+
+# 3_1
+def test_nearest_1():
+    # 3D and 2D
+    indices = pn.nearest(r, 7)
+    assert indices.shape == (300, 7)
+    assert (indices == brute_force_nearest(r, 7)).all() == True
+    r_2d = r.copy()
+    r_2d[:, 2] = 0.0
+    assert (pn.nearest(r_2d, 4) == brute_force_nearest(r_2d, 4)).all() == True
+
+# 3_2
+def test_nearest_2():
+    # clustered robots, far from each other, and an invalid k
+    r_clusters = np.concatenate((rng.normal(0.0, 1.0, size=(100, 3)),
+                                 rng.normal(100.0, 1.0, size=(5, 3))))
+    assert (pn.nearest(r_clusters, 10) == brute_force_nearest(r_clusters, 10)).all() == True
+    with pytest.raises(Exception):
+        pn.nearest(r_clusters, 105)
+
+# 3_3
+def test_nearest_3(monkeypatch):
+    # non-uniform swarms (dense core, far outliers, clusters at very
+    # different scales), with the candidate pairs split into small blocks
+    monkeypatch.setattr(pn, '_PAIRS', 500)
+    r_outliers = np.concatenate((rng.normal(0.0, 1.0, size=(300, 3)),
+                                 [[1e6, 0.0, 0.0], [0.0, -1e7, 0.0], [3e5, 2e5, -9e6]]))
+    r_scales = np.concatenate([rng.normal(center, 0.01, size=(50, 3)) for center in [0.0, 1e2, 1e4, 1e5]])
+    for r_k in [r_outliers, r_scales]:
+        assert (pn.nearest(r_k, 5) == brute_force_nearest(r_k, 5)).all() == True
+
+# 4
+def test_geometry_nearest():
+    # the batched behaviors see only the k nearest neighbors
+    indices = pn.nearest(r, 5)
+    geometry = pgm.Geometry(r, indices=indices)
+    assert (geometry.count == 5).all() == True
+    g = pbt.repulsion(r, 3.0, 2, geometry)
+    a = pbt.aggregation(r, geometry)
+    for r_ind in range(len(r)):
+        r_i = r[r_ind]
+        r_j = r[indices[r_ind]]
+        assert np.isclose(g[r_ind], pb.repulsion(r_i, r_j, 3.0)).all() == True
+        assert np.isclose(a[r_ind], pb.aggregation(r_i, r_j)).all() == True
+    # k = N - 1 gives the all-pairs result
+    geometry = pgm.Geometry(r, indices=pn.nearest(r, 299))
+    assert np.isclose(pbt.inverse_power(r, [1.0, -1.0], [1.0, 2.0], geometry),
+                      pbt.inverse_power(r, [1.0, -1.0], [1.0, 2.0])).all() == True
+
+# 5_1
+def test_verlet_list_1():
+    # the list matches the cell list while the robots move, and is only
+    # rebuilt when a robot moved more than half the skin
+    verlet = pn.VerletList(6.0, 2.0)
+    r_t = r.copy()
+    step = rng.uniform(-0.1, 0.1, size=r.shape)
+    for t in range(20):
+        indptr, indices = verlet.update(r_t)
+        indptr_expected, indices_expected = pn.cell_list(r_t, 6.0)
+        assert (indptr == indptr_expected).all() == True
+        assert (indices == indices_expected).all() == True
+        r_t = r_t + step
+    assert verlet.updates == 20
+    # at most 0.1*sqrt(3) per step, so at least 5 steps between rebuilds
+    assert 1 < verlet.rebuilds <= 4
+
+# 5_2
+def test_verlet_list_2():
+    # no skin rebuilds at every move, and invalid parameters
+    verlet = pn.VerletList(6.0, 0.0)
+    verlet.update(r)
+    verlet.update(r)
+    verlet.update(r + 0.01)
+    assert verlet.rebuilds == 2
+    with pytest.raises(Exception):
+        pn.VerletList(6.0, -1.0)
+
+# 6
+def test_groups():
+    # the robots only have neighbors in their own group, as if each group
+    # was given alone
+    group = np.arange(300) % 3
+    indptr, indices = pn.cell_list(r, 8.0, group)
+    verlet = pn.VerletList(8.0, 1.0, group)
+    indptr_verlet, indices_verlet = verlet.update(r)
+    nearest = pn.nearest(r, 5, group)
+    for g in range(3):
+        members = np.flatnonzero(group == g)
+        indptr_g, indices_g = pn.cell_list(r[members], 8.0)
+        for row, r_ind in enumerate(members):
+            expected = members[indices_g[indptr_g[row]:indptr_g[row+1]]]
+            assert (indices[indptr[r_ind]:indptr[r_ind+1]] == expected).all() == True
+            assert (indices_verlet[indptr_verlet[r_ind]:indptr_verlet[r_ind+1]] == expected).all() == True
+        assert (nearest[members] == np.sort(members[pn.nearest(r[members], 5)], axis=1)).all() == True
+    with pytest.raises(Exception):
+        pn.nearest(r, 100, group)
+    with pytest.raises(Exception):
+        pn.cell_list(r, 8.0, group[:10])
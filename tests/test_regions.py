@@ -0,0 +1,201 @@
+import gc
+import weakref
+import pyswarming.behaviors as pb
+import pyswarming.regions as pr
+import numpy as np
+
+from numdifftools import Gradient
+
+'''
+    #   Tested      Algorithm
+
+    1   yes         FunctionRegion (1_1 and 1_2)
+    2   yes         Sphere
+    3   yes         Ellipsoid
+    4   yes         Box
+    5   yes         HalfSpace
+    6   yes         as_region
+    7   yes         GridRegion (7_1 and 7_2)
+    8   yes         rasterize
+    9   yes         Polygon (9_1, 9_2, 9_3 and 9_4)
+'''
+
+x = np.asarray([[8., 8., 8.],
+                [-8., 8., 7.],
+                [8., -8., 6.],
+                [-8., -8., 5.],
+                [0.5, 0.2, -0.1]])
+
+def numerical_gradient_at(region, points):
+    gradF = Gradient(lambda x_i: region(x_i))
+    return np.asarray([gradF(x_i) for x_i in points])
+
+def numerical_gradient(region):
+    return numerical_gradient_at(region, x)
+
+# 1_1
+def test_function_region_1():
+    # the numdifftools gradient is built once
+    sphere = lambda x: x[0]**2 + x[1]**2 + x[2]**2 - 4.0
+    region = pr.FunctionRegion(sphere)
+    assert np.isclose(region(x), np.sum(x**2, axis=1) - 4.0).all() == True
+    assert np.isclose(region.gradient(x), 2.0*x).all() == True
+    assert np.isclose(region.gradient(x[0]), 2.0*x[0]).all() == True
+
+# 1_2
+def test_function_region_2():
+    # user-supplied gradient, evaluated for all robots at once
+    sphere = lambda x: x[0]**2 + x[1]**2 + x[2]**2 - 4.0
+    grad_sphere = lambda x: np.asarray([2*x[0], 2*x[1], 2*x[2]])
+    region = pr.FunctionRegion(sphere, grad_sphere, vectorized=True)
+    assert region(x).shape == (5,)
+    assert np.isclose(region(x), np.sum(x**2, axis=1) - 4.0).all() == True
+    assert np.isclose(region.gradient(x), 2.0*x).all() == True
+    assert np.isclose(region.gradient(x[1]), 2.0*x[1]).all() == True
+
+# 2
+def test_sphere():
+    region = pr.Sphere([1.0, 0.0, 0.0], 2.0)
+    assert np.isclose(region(x), np.sum((x - [1.0, 0.0, 0.0])**2, axis=1) - 4.0).all() == True
+    assert np.isclose(region.gradient(x), numerical_gradient(region)).all() == True
+    # same result as the sphere function of the geofencing test
+    r_i = np.asarray([8., 8., 8.])
+    sphere = lambda x: x[0]**2 + x[1]**2 + x[2]**2 - 4.0
+    g_i = pb.geofencing(r_i, pr.Sphere([0.0, 0.0, 0.0], 2.0))
+    assert np.isclose(g_i, pb.geofencing(r_i, sphere)).all() == True
+
+# 3
+def test_ellipsoid():
+    region = pr.Ellipsoid([1.0, 0.0, 0.0], [2.0, 3.0, 4.0])
+    assert (region(x[:4]) > 0.0).all() == True
+    assert region(x[4]) < 0.0
+    assert np.isclose(region.gradient(x), numerical_gradient(region)).all() == True
+
+# 4
+def test_box():
+    region = pr.Box([-1.0, -1.0, -1.0], [1.0, 2.0, 1.0])
+    assert np.isclose(region(x[0]), np.linalg.norm([7.0, 6.0, 7.0]))
+    assert np.isclose(region(x[4]), -0.5)
+    assert np.isclose(region.gradient(x), numerical_gradient(region)).all() == True
+
+# 5
+def test_half_space():
+    region = pr.HalfSpace([0.0, 0.0, 0.0], [0.0, 0.0, 2.0])
+    assert np.isclose(region(x), x[:, 2]).all() == True
+    assert np.isclose(region.gradient(x), [0.0, 0.0, 1.0]).all() == True
+
+# 6
+def test_as_region():
+    sphere = lambda x: x[0]**2 + x[1]**2 + x[2]**2 - 4.0
+    assert pr.as_region(sphere) is pr.as_region(sphere)
+    region = pr.Sphere([0.0, 0.0, 0.0], 2.0)
+    assert pr.as_region(region) is region
+    # the region is released with its function
+    reference = weakref.ref(pr.as_region(lambda x: x[0]))
+    gc.collect()
+    assert reference() is None
+    # a bound method does not reuse the region of its function
+    class Plane:
+        def A(self, x):
+            return x[2]
+    pr.as_region(Plane.A)
+    plane = Plane()
+    assert pr.as_region(plane.A).A == plane.A
+
+# 7_1
+def test_grid_region_1():
+    # planar grid, as used by 2D swarms
+    sphere = lambda x: x[0]**2 + x[1]**2 + x[2]**2 - 4.0
+    region = pr.GridRegion(sphere, [[-10.0, -10.0, 0.0], [10.0, 10.0, 0.0]], 0.1)
+    assert region.shape == (201, 201, 1)
+    x_2d = np.copy(x)
+    x_2d[:, 2] = 0.0
+    assert np.isclose(region(x_2d), np.sum(x_2d**2, axis=1) - 4.0, atol=1e-2).all() == True
+    assert np.isclose(region.gradient(x_2d), 2.0*x_2d, atol=1e-6).all() == True
+    error = region.error_estimate()
+    assert error['value'] < 1e-2
+    assert error['gradient'] < 1e-6
+    # geofencing on the grid agrees with the exact region
+    g_i = pb.geofencing(x_2d[0], region)
+    assert np.isclose(g_i, pb.geofencing(x_2d[0], pr.Sphere([0.0, 0.0, 0.0], 2.0)), atol=1e-3).all() == True
+
+# 7_2
+def test_grid_region_2():
+    # 3D grid, positions outside the bounds are clamped
+    region = pr.GridRegion(pr.Box([-3.0, -3.0, -3.0], [3.0, 3.0, 3.0]),
+                           [[-5.0, -5.0, -5.0], [5.0, 5.0, 5.0]], 0.25)
+    assert region.shape == (41, 41, 41)
+    assert np.isclose(region([1.0, 0.5, 0.25]), -2.0, atol=1e-2)
+    assert np.isclose(region([9.0, 0.0, 0.0]), region([5.0, 0.0, 0.0]))
+    assert region.error_estimate()['value'] < 0.1
+
+# 8
+def test_rasterize():
+    sphere = lambda x: x[0]**2 + x[1]**2 + x[2]**2 - 4.0
+    bounds = [[-10.0, -10.0, 0.0], [10.0, 10.0, 0.0]]
+    region = pr.rasterize(sphere, bounds, 0.5)
+    assert pr.rasterize(sphere, bounds, 0.5) is region
+    assert pr.rasterize(sphere, [[-5.0, -5.0, 0.0], [5.0, 5.0, 0.0]], 0.5) is not region
+    assert pr.rasterize(lambda x: x[0], bounds, 0.5) is not region
+    # the grid is released with its region
+    reference = weakref.ref(pr.rasterize(lambda x: x[0], bounds, 0.5))
+    gc.collect()
+    assert reference() is None
+    box = pr.Box([-1.0, -1.0, -1.0], [1.0, 1.0, 1.0])
+    assert pr.rasterize(box, bounds, 0.5) is pr.rasterize(box, bounds, 0.5)
+    function_region = pr.FunctionRegion(sphere)
+    assert pr.rasterize(function_region, bounds, 0.5) is pr.rasterize(function_region, bounds, 0.5)
+
+# 9_1
+def test_polygon_1():
+    # rectangle, same signed distance as a box with a large z extent
+    region = pr.Polygon([[-1.0, -1.0], [1.0, -1.0], [1.0, 2.0], [-1.0, 2.0]])
+    box = pr.Box([-1.0, -1.0, -100.0], [1.0, 2.0, 100.0])
+    x_2d = np.copy(x)
+    x_2d[:, 2] = 0.0
+    assert np.isclose(region(x_2d), box(x_2d)).all() == True
+    assert np.isclose(region.gradient(x_2d), box.gradient(x_2d)).all() == True
+
+# 9_2
+def test_polygon_2():
+    # non-convex (L-shaped) polygon given clockwise, with small bounding boxes
+    vertices = np.asarray([[0.0, 4.0], [1.0, 4.0], [1.0, 1.0], [4.0, 1.0], [4.0, 0.0], [0.0, 0.0]])
+    region = pr.Polygon(vertices, edges_per_box=2)
+    assert region([0.5, 3.0, 0.0]) < 0.0
+    assert region([3.0, 0.5, 0.0]) < 0.0
+    assert np.isclose(region([3.0, 3.0, 0.0]), 2.0)
+    assert np.isclose(region([2.0, 0.7, 0.0]), -0.3)
+    assert np.isclose(region.gradient([2.0, 0.7, 0.0]), [0.0, 1.0, 0.0]).all() == True
+    points = np.asarray([[2.0, 2.5, 0.0], [-1.0, 2.0, 1.0], [0.6, 0.5, 0.0], [5.0, -1.0, 0.0]])
+    assert np.isclose(region.gradient(points), numerical_gradient_at(region, points)).all() == True
+
+# 9_3
+def test_polygon_3():
+    # polygon with many vertices approximating a circle
+    angle = np.linspace(0.0, 2*np.pi, 400, endpoint=False)
+    region = pr.Polygon(np.stack((10.0*np.cos(angle), 10.0*np.sin(angle)), axis=1))
+    assert np.isclose(region(x), np.linalg.norm(x[:, :2], axis=1) - 10.0, atol=1e-2).all() == True
+    # geofencing pushes the robots toward the center
+    g = np.asarray([pb.geofencing(x_i, region) for x_i in x])
+    direction = - x[:, :2] / np.linalg.norm(x[:, :2], axis=1)[:, np.newaxis]
+    assert np.isclose(g[:, :2] / np.linalg.norm(g, axis=1)[:, np.newaxis], direction, atol=1e-2).all() == True
+
+# 9_4
+def test_polygon_4(monkeypatch):
+    # star-shaped polygon, the distance is the one to the closest edge,
+    # also with the robots split into small blocks
+    rng = np.random.default_rng(2)
+    angle = np.linspace(0.0, 2*np.pi, 300, endpoint=False)
+    radius = rng.uniform(2.0, 10.0, size=300)
+    vertices = np.stack((radius*np.cos(angle), radius*np.sin(angle)), axis=1)
+    region = pr.Polygon(vertices, edges_per_box=8)
+    points = np.concatenate((rng.uniform(-12.0, 12.0, size=(200, 2)), rng.uniform(-500.0, 500.0, size=(50, 2))))
+    a = vertices[np.newaxis]
+    ab = np.roll(vertices, -1, axis=0)[np.newaxis] - a
+    p_a = points[:, np.newaxis] - a
+    t = np.clip(np.sum(p_a * ab, axis=2) / np.sum(ab * ab, axis=2), 0.0, 1.0)
+    distance = np.min(np.linalg.norm(p_a - t[:, :, np.newaxis] * ab, axis=2), axis=1)
+    points = np.concatenate((points, np.zeros((250, 1))), axis=1)
+    assert np.isclose(np.abs(region(points)), distance).all() == True
+    monkeypatch.setattr(pr, '_BOX_PAIRS', 100)
+    assert np.isclose(np.abs(region(points)), distance).all() == True
@@ -0,0 +1,48 @@
+import pytest
+import pyswarming.state as pst
+import numpy as np
+
+'''
+    #   Tested      Algorithm
+
+    1   yes         SwarmState (1_1 and 1_2)
+    2   yes         workspace
+'''
+
+pose = np.asarray([[8., 8., 8., 0.1, 0.2, 0.3],
+                   [-8., 8., 7., 0.4, 0.5, 0.6],
+                   [1., 2., 3., 0.7, 0.8, 0.9]])
+
+# 1_1
+def test_swarm_state_1():
+    state = pst.SwarmState(3)
+    state.set_pose(pose)
+    assert state.position.flags['C_CONTIGUOUS'] == True
+    assert state.heading.flags['C_CONTIGUOUS'] == True
+    assert np.isclose(state.position, pose[:, :3]).all() == True
+    assert np.isclose(state.heading, pose[:, 3:]).all() == True
+    assert np.isclose(state.get_pose(), pose).all() == True
+    # the pose can be written into an existing array
+    out = np.zeros((3, 6))
+    assert state.get_pose(out) is out
+    assert np.isclose(out, pose).all() == True
+
+# 1_2
+def test_swarm_state_2():
+    state = pst.SwarmState(3, np.float32)
+    state.set_pose(pose)
+    assert state.position.dtype == np.float32
+    assert state.get_pose().dtype == np.float32
+    assert np.isclose(state.get_pose(), pose).all() == True
+    with pytest.raises(Exception):
+        pst.SwarmState(3, np.int64)
+    with pytest.raises(Exception):
+        state.set_pose(pose[:2])
+
+# 2
+def test_workspace():
+    state = pst.SwarmState(3)
+    a = state.workspace('a')
+    assert a.shape == (3, 3)
+    assert state.workspace('a') is a
+    assert state.workspace('b', (3,)).shape == (3,)
@@ -1,4 +1,9 @@
+import subprocess
+import sys
+import pytest
 import pyswarming.swarm as ps
+import pyswarming.batched as pbt
+import pyswarming.trajectory as ptj
 
 import numpy as np
 
@@ -25,3 +30,381 @@ def test_swarm():
                                [-39.87972043, -39.69159204,   0.        ,   0.        , 0.        ,  -2.35855876]])
     assert np.isclose(my_swarm.simulate(mode='simulate'), pose_expected, atol=1e-0).all() == True
 
+def test_swarm_interaction_radius():
+    # an interaction radius larger than the swarm gives the same result as all-to-all
+    np.random.seed(0)
+    my_swarm = ps.Swarm(n = 10, deployment_point_limits = [[0.0, 0.0, 0.0], [5.0, 5.0, 0.0]],
+                        behaviors = ['aggregation', 'repulsion'])
+    np.random.seed(0)
+    my_swarm_radius = ps.Swarm(n = 10, deployment_point_limits = [[0.0, 0.0, 0.0], [5.0, 5.0, 0.0]],
+                               behaviors = ['aggregation', 'repulsion'], interaction_radius = 100.0)
+    assert my_swarm_radius.interaction_radius == 100.0
+    pose = my_swarm.simulate(frames = 5, mode = 'simulate')
+    pose_radius = my_swarm_radius.simulate(frames = 5, mode = 'simulate')
+    assert np.isclose(pose, pose_radius).all() == True
+
+    # isolated robots only follow the target
+    my_swarm = ps.Swarm(n = 2, deployment_point_limits = [[0.0, 0.0, 0.0], [50.0, 50.0, 0.0]],
+                        behaviors = ['target', 'aggregation'], interaction_radius = 0.001)
+    my_swarm.state.position[...] = [[0.0, 0.0, 0.0], [10.0, 0.0, 0.0]]
+    pose = my_swarm.simulate(frames = 1, mode = 'simulate')
+    assert np.isfinite(pose).all() == True
+
+    # isolated robots without any other behavior stay still
+    my_swarm = ps.Swarm(n = 2, behaviors = ['aggregation'], interaction_radius = 0.001)
+    my_swarm.state.position[...] = [[0.0, 0.0, 0.0], [10.0, 0.0, 0.0]]
+    pose = my_swarm.simulate(frames = 3, mode = 'simulate')
+    assert np.isfinite(pose).all() == True
+    assert np.isclose(pose[:, :3], [[0.0, 0.0, 0.0], [10.0, 0.0, 0.0]]).all() == True
+
+def test_swarm_n_neighbors():
+    # n - 1 nearest neighbors gives the same result as all-to-all
+    np.random.seed(0)
+    my_swarm = ps.Swarm(n = 10, behaviors = ['aggregation', 'repulsion'])
+    np.random.seed(0)
+    my_swarm_nearest = ps.Swarm(n = 10, behaviors = ['aggregation', 'repulsion'], n_neighbors = 9)
+    pose = my_swarm.simulate(frames = 5, mode = 'simulate')
+    pose_nearest = my_swarm_nearest.simulate(frames = 5, mode = 'simulate')
+    assert np.isclose(pose, pose_nearest).all() == True
+    with pytest.raises(Exception):
+        ps.Swarm(n = 10, interaction_radius = 1.0, n_neighbors = 3)
+
+def test_swarm_skin():
+    # the Verlet list gives the same result as the cell list, with fewer rebuilds
+    np.random.seed(0)
+    my_swarm = ps.Swarm(n = 20, behaviors = ['aggregation', 'repulsion'], interaction_radius = 2.0)
+    np.random.seed(0)
+    my_swarm_skin = ps.Swarm(n = 20, behaviors = ['aggregation', 'repulsion'], interaction_radius = 2.0, skin = 2.0)
+    pose = my_swarm.simulate(frames = 10, mode = 'simulate')
+    pose_skin = my_swarm_skin.simulate(frames = 10, mode = 'simulate')
+    assert np.isclose(pose, pose_skin).all() == True
+    assert my_swarm_skin.neighbor_list.updates == 10
+    assert my_swarm_skin.neighbor_list.rebuilds < 10
+
+    # the skin extends the interaction radius
+    with pytest.raises(Exception):
+        ps.Swarm(n = 20, skin = 2.0)
+
+def test_swarm_step():
+    # one step moves every robot along the normalized sum of its behaviors
+    np.random.seed(0)
+    my_swarm = ps.Swarm(n = 10, behaviors = ['target', 'aggregation', 'repulsion'])
+    T = np.asarray(my_swarm.behaviors_dict['r_out']['target']['T'])
+    r = my_swarm.pose[:, :3].copy()
+    r_sum = (pbt.target(r, T) + pbt.aggregation(r) + pbt.repulsion(r, 10.0, 2))
+    r_expected = r + 0.5 * r_sum / np.linalg.norm(r_sum, axis=1)[:, np.newaxis]
+    pose = my_swarm.step()
+    assert np.isclose(pose[:, :3], r_expected).all() == True
+    assert np.isclose(pose[:, 5], np.arctan2(r_expected[:, 1], r_expected[:, 0])).all() == True
+
+    # simulate mode runs the same steps
+    np.random.seed(0)
+    my_swarm_1 = ps.Swarm(n = 10, behaviors = ['target', 'leaderless_heading_consensus'])
+    np.random.seed(0)
+    my_swarm_2 = ps.Swarm(n = 10, behaviors = ['target', 'leaderless_heading_consensus'])
+    assert np.isclose(my_swarm_1.step(7), my_swarm_2.simulate(frames = 7, mode = 'simulate')).all() == True
+
+def test_swarm_headless():
+    # stepping the swarm does not import matplotlib
+    code = ("import sys; import pyswarming.swarm as ps; "
+            "ps.Swarm(n = 5).step(3); "
+            "assert 'matplotlib' not in sys.modules")
+    assert subprocess.run([sys.executable, '-c', code]).returncode == 0
+
+def test_swarm_plan():
+    # the behaviors are compiled once, validated up front
+    my_swarm = ps.Swarm(n = 5, behaviors = ['target', 'repulsion'])
+    plan = my_swarm.plan
+    assert [entry['behavior'] for entry in plan] == ['target', 'repulsion']
+    assert [entry['kind'] for entry in plan] == ['r_out', 'r_out']
+    my_swarm.step(2)
+    assert my_swarm.plan is plan
+
+    # and recompiled when the configuration changes
+    my_swarm.behaviors_dict['r_out']['target']['T'] = [-40, -40, 0]
+    my_swarm.step()
+    assert my_swarm.plan is not plan
+    plan = my_swarm.plan
+    my_swarm.behaviors.append('leaderless_heading_consensus')
+    my_swarm.step()
+    assert my_swarm.plan[-1]['kind'] == 'theta_out'
+    plan = my_swarm.plan
+    my_swarm.behaviors_dict['r_out']['repulsion'].update(alpha = 5.0)
+    my_swarm.step()
+    assert my_swarm.plan is not plan
+    plan = my_swarm.plan
+    my_swarm.behaviors_dict = dict(my_swarm.behaviors_dict)
+    my_swarm.step()
+    assert my_swarm.plan is not plan
+    plan = my_swarm.plan
+    my_swarm.step()
+    assert my_swarm.plan is plan
+    my_swarm.behaviors_dict['r_out']['repulsion'] |= {'alpha': 4.0}
+    my_swarm.step()
+    assert my_swarm.plan is not plan
+
+    # the arrays and lists modified in place are seen too
+    for T in [np.array([30.0, 30.0, 30.0]), [30.0, 30.0, 30.0]]:
+        my_swarm = ps.Swarm(n = 5, behaviors = ['target'], seed = 0)
+        my_swarm.behaviors_dict['r_out']['target']['T'] = T
+        my_swarm.step()
+        plan = my_swarm.plan
+        my_swarm.behaviors_dict['r_out']['target']['T'][0] = -30.0
+        r = my_swarm.pose[:, :3].copy()
+        pose = my_swarm.step()
+        assert my_swarm.plan is not plan
+        direction = pbt.target(r, np.asarray([-30.0, 30.0, 30.0]))
+        direction /= np.linalg.norm(direction, axis=1)[:, np.newaxis]
+        assert np.isclose(pose[:, :3], r + 0.5 * direction).all() == True
+
+    # the weights scale the contributions
+    np.random.seed(0)
+    my_swarm_1 = ps.Swarm(n = 5, behaviors = ['target', 'repulsion'])
+    np.random.seed(0)
+    my_swarm_2 = ps.Swarm(n = 5, behaviors = ['target', 'repulsion'])
+    my_swarm_2.behaviors_dict['r_out']['repulsion']['weight'] = 0.0
+    my_swarm_2.step()
+    assert np.isclose(my_swarm_2.plan[1]['weight'], 0.0)
+    r = my_swarm_1.pose[:, :3].copy()
+    beta = pbt.target(r, np.asarray([30.0, 30.0, 30.0]))
+    assert np.isclose(my_swarm_2.pose[:, :3], r + 0.5 * beta).all() == True
+
+    with pytest.raises(Exception):
+        ps.Swarm(n = 5, behaviors = ['target', 'unknown'])
+
+def test_swarm_state():
+    # the pose is assembled from the state into a new read-only array,
+    # and assigned to it
+    my_swarm = ps.Swarm(n = 2, behaviors = ['target'])
+    pose = my_swarm.pose
+    assert pose.flags.writeable == False
+    with pytest.raises(ValueError):
+        pose[0, 0] = 123.0
+    pose = pose.copy()
+    pose[:, :3] = [[0.0, 0.0, 0.0], [10.0, 0.0, 0.0]]
+    assert my_swarm.pose is not my_swarm.pose
+    assert np.isclose(my_swarm.state.position, [[0.0, 0.0, 0.0], [10.0, 0.0, 0.0]]).all() == False
+    my_swarm.pose = pose
+    my_swarm.step()
+    assert np.isclose(my_swarm.state.position[0], 0.5 * np.asarray([30.0, 30.0, 30.0]) / np.sqrt(2700.0)).all() == True
+    assert np.isclose(my_swarm.state.velocity[0], 0.5 * np.asarray([30.0, 30.0, 30.0]) / np.sqrt(2700.0)).all() == True
+    assert np.isclose(my_swarm.pose[:, :3], my_swarm.state.position).all() == True
+
+    # writes into the state are kept, and the poses returned before are left unchanged
+    pose = my_swarm.pose
+    my_swarm.state.position[0] = [100.0, 100.0, 0.0]
+    assert np.isclose(my_swarm.step()[0, :3], [100.0, 100.0, 0.0], atol = 1.0).all() == True
+    assert np.isclose(my_swarm.pose[:, :3], pose[:, :3]).all() == False
+
+    # float32 state
+    np.random.seed(0)
+    my_swarm_64 = ps.Swarm(n = 10, behaviors = ['target', 'repulsion'])
+    np.random.seed(0)
+    my_swarm_32 = ps.Swarm(n = 10, behaviors = ['target', 'repulsion'], dtype = np.float32)
+    assert my_swarm_32.pose.dtype == np.float32
+    pose_64 = my_swarm_64.step(10)
+    pose_32 = my_swarm_32.step(10)
+    assert pose_32.dtype == np.float32
+    assert np.isclose(pose_64, pose_32, atol=1e-3).all() == True
+
+def test_ensemble():
+    # every replica evolves as its own swarm
+    behaviors = ['target', 'aggregation', 'repulsion', 'leaderless_heading_consensus']
+    my_ensemble = ps.Ensemble(m = 3, n = 6, seed = 1, behaviors = behaviors)
+    assert my_ensemble.pose.shape == (3, 6, 6)
+    pose_0 = my_ensemble.pose.copy()
+    assert not np.isclose(pose_0[0], pose_0[1]).all() # independent deployments
+    pose, values = my_ensemble.run(5, metrics = {'centroid': lambda pose: np.mean(pose[:, :, :3], axis=1)})
+    assert values['centroid'].shape == (3, 3)
+    for k in range(3):
+        my_swarm = ps.Swarm(n = 6, behaviors = behaviors)
+        my_swarm.pose = pose_0[k]
+        assert np.isclose(my_swarm.step(5), pose[k]).all() == True
+        assert np.isclose(values['centroid'][k], np.mean(my_swarm.pose[:, :3], axis=0)).all() == True
+
+    # the seed gives the same deployments, and the neighborhoods stay within each replica
+    my_ensemble_1 = ps.Ensemble(m = 2, n = 8, seed = 3, behaviors = ['target', 'repulsion'], n_neighbors = 2)
+    my_ensemble_2 = ps.Ensemble(m = 2, n = 8, seed = 3, behaviors = ['target', 'repulsion'], n_neighbors = 2)
+    assert np.isclose(my_ensemble_1.pose, my_ensemble_2.pose).all() == True
+    pose_0 = my_ensemble_1.pose.copy()
+    pose = my_ensemble_1.run(3)
+    my_swarm = ps.Swarm(n = 8, behaviors = ['target', 'repulsion'], n_neighbors = 2)
+    my_swarm.pose = pose_0[1]
+    assert np.isclose(my_swarm.step(3), pose[1]).all() == True
+
+def test_ensemble_neighborhoods(monkeypatch):
+    # the neighborhoods of every replica, found at once, are those of
+    # each replica alone (small replicas and pyswarming.neighbors.nearest)
+    behaviors = ['aggregation', 'repulsion', 'heading_consensus']
+    for small_replica in [256, 2]:
+        monkeypatch.setattr(ps, '_SMALL_REPLICA', small_replica)
+        for neighborhoods in [{'interaction_radius': 2.0}, {'interaction_radius': 2.0, 'skin': 0.5},
+                              {'n_neighbors': 3}]:
+            my_ensemble = ps.Ensemble(m = 4, n = 12, seed = 2, behaviors = behaviors, **neighborhoods)
+            pose_0 = my_ensemble.pose.copy()
+            pose = my_ensemble.run(4)
+            for k in range(4):
+                my_swarm = ps.Swarm(n = 12, behaviors = behaviors, **neighborhoods)
+                my_swarm.pose = pose_0[k]
+                assert np.isclose(my_swarm.step(4), pose[k]).all() == True
+
+def test_swarm_n_threads():
+    # the blocks evaluated on threads give the same result as one thread
+    behaviors = ['target', 'aggregation', 'repulsion', 'heading_consensus']
+    for neighborhoods in [{}, {'interaction_radius': 2.0}, {'n_neighbors': 4}]:
+        np.random.seed(0)
+        my_swarm = ps.Swarm(n = 30, behaviors = behaviors, **neighborhoods)
+        np.random.seed(0)
+        my_swarm_threads = ps.Swarm(n = 30, behaviors = behaviors, n_threads = 3, **neighborhoods)
+        assert np.isclose(my_swarm.step(5), my_swarm_threads.step(5)).all() == True
+    my_ensemble = ps.Ensemble(m = 3, n = 10, seed = 0, behaviors = behaviors)
+    my_ensemble_threads = ps.Ensemble(m = 3, n = 10, seed = 0, behaviors = behaviors, n_threads = 4)
+    assert np.isclose(my_ensemble.run(5), my_ensemble_threads.run(5)).all() == True
+
+def test_swarm_n_threads_blocks():
+    # every block only evaluates the behaviors for its own robots
+    behaviors = ['target', 'aggregation', 'heading_consensus']
+    for neighborhoods in [{}, {'interaction_radius': 2.0}]:
+        my_swarm = ps.Swarm(n = 30, behaviors = behaviors, n_threads = 3, seed = 0, **neighborhoods)
+        my_swarm.step()
+        sizes = []
+        for entry in my_swarm.plan:
+            def function(r, theta, geometry, rows, function = entry['function']):
+                output = function(r, theta, geometry, rows)
+                sizes.append(len(output))
+                return output
+            entry['function'] = function
+        my_swarm.step()
+        assert max(sizes) < 30
+        assert sum(sizes) == 3 * 30
+
+def test_swarm_close():
+    # the thread pool is shut down by close and by the context manager
+    with ps.Swarm(n = 30, behaviors = ['target', 'aggregation'], n_threads = 3, seed = 0) as my_swarm:
+        my_swarm.step()
+        executor = my_swarm._executor
+        assert executor is not None
+    assert my_swarm._executor is None
+    with pytest.raises(RuntimeError):
+        executor.submit(print)
+    # a closed swarm can still be stepped
+    my_swarm.step()
+    my_swarm.close()
+    assert my_swarm._executor is None
+
+def test_swarm_record(tmp_path):
+    # the recorded trajectory matches the poses of the run
+    my_swarm = ps.Swarm(n = 5, behaviors = ['aggregation', 'repulsion'], seed = 0)
+    my_swarm.step(3)
+    recorder = my_swarm.record(str(tmp_path / 'run.npy'), 6, every = 2)
+    poses = [my_swarm.pose.copy()]
+    for step_i in range(6):
+        pose = my_swarm.step()
+        if step_i % 2 == 1:
+            poses.append(pose.copy())
+    my_swarm.detach(recorder)
+    assert my_swarm.step_count == 9
+    assert my_swarm.sinks == []
+    assert recorder.steps == [3, 5, 7, 9]
+    trajectory = np.load(str(tmp_path / 'run.npy'), mmap_mode = 'r')
+    assert trajectory.shape == (4, 5, 6)
+    assert np.isclose(trajectory, np.stack(poses)).all() == True
+
+def test_swarm_archive(tmp_path):
+    # an archive is a sink of the swarm, as the recorder
+    my_swarm = ps.Swarm(n = 5, behaviors = ['aggregation', 'repulsion'], seed = 0)
+    recorder = my_swarm.record(str(tmp_path / 'run.npy'), 10)
+    archive = my_swarm.attach(ptj.Archive(str(tmp_path / 'run.arc'), my_swarm.pose.shape, chunk_size = 4))
+    my_swarm.step(10)
+    my_swarm.detach(recorder)
+    my_swarm.detach(archive)
+    with ptj.ArchiveReader(str(tmp_path / 'run.arc')) as reader:
+        assert len(reader) == 11
+        assert np.isclose(np.stack(list(reader)), np.load(str(tmp_path / 'run.npy')), atol = 1e-4).all() == True
+
+def test_swarm_iter_steps():
+    # the yielded poses are those of step, every k-th step
+    my_swarm = ps.Swarm(n = 5, behaviors = ['aggregation', 'repulsion'], seed = 0)
+    my_swarm_step = ps.Swarm(n = 5, behaviors = ['aggregation', 'repulsion'], seed = 0)
+    views = []
+    for pose in my_swarm.iter_steps(7, every = 3):
+        assert pose.flags.writeable == False
+        pose_step = my_swarm_step.step(3)
+        assert np.isclose(pose, pose_step).all() == True
+        views.append(pose)
+    assert my_swarm.step_count == 7
+    # the buffer is reused, and updated in place at every yield
+    assert views[0] is views[1]
+    assert np.isclose(views[0], pose_step).all() == True
+    with pytest.raises(ValueError):
+        views[0][0, 0] = 1.0
+    # without reuse, every pose is a new array
+    copies = list(my_swarm.iter_steps(2, reuse = False))
+    assert copies[0] is not copies[1]
+    assert np.isclose(copies[1], my_swarm.pose).all() == True
+    assert copies[0].flags.writeable == False
+    with pytest.raises(Exception):
+        list(my_swarm.iter_steps(2, every = 0))
+
+def test_swarm_checkpoint(tmp_path):
+    # a resumed run is bit-identical to an uninterrupted one
+    my_swarm = ps.Swarm(n = 20, behaviors = ['aggregation', 'repulsion'], interaction_radius = 3.0,
+                        skin = 0.5, seed = 0)
+    my_swarm.behaviors_dict['r_out']['repulsion']['alpha'] = 5.0
+    my_swarm.step(10)
+    my_swarm.save_checkpoint(str(tmp_path / 'run.ckpt'))
+    pose = my_swarm.step(10).copy()
+    random = my_swarm.rng.random(3)
+    my_swarm_resumed = ps.Swarm(n = 20, interaction_radius = 3.0, skin = 0.5, seed = 1)
+    my_swarm_resumed.load_checkpoint(str(tmp_path / 'run.ckpt'))
+    assert my_swarm_resumed.step_count == 10
+    assert my_swarm_resumed.behaviors == ['aggregation', 'repulsion']
+    assert my_swarm_resumed.behaviors_dict['r_out']['repulsion']['alpha'] == 5.0
+    assert np.array_equal(my_swarm_resumed.step(10), pose)
+    assert np.array_equal(my_swarm_resumed.rng.random(3), random)
+    # the number of robots must match
+    with pytest.raises(Exception):
+        ps.Swarm(n = 10).load_checkpoint(str(tmp_path / 'run.ckpt'))
+
+def test_ensemble_checkpoint(tmp_path):
+    # the generators of the replicas are restored too
+    my_ensemble = ps.Ensemble(3, 5, behaviors = ['aggregation', 'repulsion'], seed = 0)
+    my_ensemble.step(5)
+    my_ensemble.save_checkpoint(str(tmp_path / 'run.ckpt'))
+    pose = my_ensemble.step(5).copy()
+    my_ensemble_resumed = ps.Ensemble(3, 5, behaviors = ['aggregation', 'repulsion'], seed = 1)
+    my_ensemble_resumed.load_checkpoint(str(tmp_path / 'run.ckpt'))
+    assert np.array_equal(my_ensemble_resumed.step(5), pose)
+    assert np.array_equal(my_ensemble_resumed.generators[2].random(3), my_ensemble.generators[2].random(3))
+
+def test_swarm_animation():
+    # the robots are drawn by two artists, updated in place at every frame
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    my_swarm = ps.Swarm(n = 50, behaviors = ['aggregation', 'repulsion'], seed = 0)
+    anim = my_swarm.simulate(frames = 5, blit = True, mode = 'anim')
+    artists = my_swarm._animate(0)
+    assert artists == (my_swarm._robots, my_swarm._headings)
+    for frame in range(1, 4):
+        position = my_swarm.state.position[:, :2].copy()
+        my_swarm._animate(frame)
+        assert np.isclose(my_swarm._robots.get_offsets(), position).all() == True
+        assert len(my_swarm._headings.get_segments()) == 50
+    assert len(my_swarm.ax.collections) == 2
+    assert len(my_swarm.ax.lines) == 0
+    assert my_swarm.step_count == 4
+    my_swarm.fig.canvas.draw()
+    plt.close(my_swarm.fig)
+
+def test_swarm_iter_steps_control():
+    # the writes of a consumer into the state between yields are kept
+    my_swarm = ps.Swarm(n = 5, behaviors = ['target'], seed = 0)
+    for step_i, pose in enumerate(my_swarm.iter_steps(3)):
+        if step_i == 0:
+            my_swarm.state.position[0] = [100.0, 100.0, 0.0]
+        if step_i == 1:
+            assert np.isclose(pose[0, :2], [100.0, 100.0], atol = 1.0).all() == True
+            my_swarm.pose = np.zeros((5, 6))
+        if step_i == 2:
+            assert (np.abs(pose[:, :3]) < 1.0).all() == True
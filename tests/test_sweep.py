@@ -0,0 +1,76 @@
+import concurrent.futures
+import pytest
+import pyswarming.swarm as ps
+import pyswarming.sweep as psw
+import numpy as np
+
+'''
+    #   Tested      Algorithm
+
+    1   yes         grid
+    2   yes         sweep (2_1 and 2_2)
+    3   yes         iter_sweep (3_1 and 3_2)
+'''
+
+def distance_to_target(swarm):
+    # mean distance of the robots to the target
+    T = np.asarray(swarm.behaviors_dict['r_out']['target']['T'])
+    return float(np.mean(np.linalg.norm(swarm.state.position - T, axis=1)))
+
+# 1
+def test_grid():
+    configs = psw.grid(n=[5, 10], **{'repulsion.alpha': [1.0, 2.0, 3.0]})
+    assert len(configs) == 6
+    assert configs[0] == {'n': 5, 'repulsion.alpha': 1.0}
+    assert configs[-1] == {'n': 10, 'repulsion.alpha': 3.0}
+
+# 2_1
+def test_sweep_1():
+    configs = psw.grid(n=[5, 8], linear_speed=[0.5, 1.0], behaviors=[['target', 'repulsion']],
+                       **{'repulsion.alpha': [1.0, 5.0]})
+    metrics = {'spread': psw.spread, 'distance_to_target': distance_to_target}
+    rows = psw.sweep(configs, n_steps=10, metrics=metrics, seed=1, max_workers=2)
+    assert len(rows) == 8
+    assert [row['run'] for row in rows] == list(range(8))
+    assert rows[3]['n'] == 5 and rows[3]['linear_speed'] == 1.0 and rows[3]['repulsion.alpha'] == 5.0
+    # every run can be reproduced from its row
+    row = rows[5]
+    my_swarm = ps.Swarm(n=row['n'], linear_speed=row['linear_speed'], behaviors=row['behaviors'], seed=row['seed'])
+    my_swarm.behaviors_dict['r_out']['repulsion']['alpha'] = row['repulsion.alpha']
+    my_swarm.step(10)
+    assert np.isclose(psw.spread(my_swarm), row['spread'])
+    assert np.isclose(distance_to_target(my_swarm), row['distance_to_target'])
+    # and the seeds are deterministic
+    rows_2 = psw.sweep(configs, n_steps=10, metrics=metrics, seed=1,
+                       executor=concurrent.futures.ThreadPoolExecutor(2))
+    assert [row['spread'] for row in rows] == [row['spread'] for row in rows_2]
+
+# 2_2
+def test_sweep_2():
+    with pytest.raises(Exception):
+        psw.sweep([{'n': 5, 'unknown.alpha': 1.0}], n_steps=1, max_workers=1)
+
+# 3_1
+def test_iter_sweep_1():
+    configs = psw.grid(n=[5, 6, 7])
+    rows = list(psw.iter_sweep(configs, n_steps=2, max_workers=2))
+    assert sorted(row['run'] for row in rows) == [0, 1, 2]
+    assert all('spread' in row for row in rows)
+
+completed = []
+
+def count(swarm):
+    completed.append(swarm.n)
+    return swarm.n
+
+# 3_2
+def test_iter_sweep_2():
+    # at most two runs per worker are submitted at once, and closing the
+    # generator early cancels the runs not started yet
+    completed.clear()
+    configs = psw.grid(n=[5, 6, 7, 8, 9, 10])
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        rows = psw.iter_sweep(configs, n_steps=2, metrics={'count': count}, max_workers=1, executor=executor)
+        next(rows)
+        rows.close()
+    assert 1 <= len(completed) <= 2
@@ -0,0 +1,124 @@
+import pytest
+import pyswarming.trajectory as ptj
+import numpy as np
+
+'''
+    #   Tested      Algorithm
+
+    1   yes         Recorder (1_1, 1_2 and 1_3)
+    2   yes         load
+    3   yes         Archive (3_1, 3_2 and 3_3)
+    4   yes         ArchiveReader (4_1 and 4_2)
+'''
+
+pose = np.arange(24.0).reshape(4, 6)
+
+# 1_1
+def test_recorder_1(tmp_path):
+    # the first pose and then every 2nd step
+    recorder = ptj.Recorder(str(tmp_path / 'run.npy'), 3, (4, 6), every = 2)
+    for step in range(5):
+        recorder.write(step, pose + step)
+    assert recorder.frames == 3
+    assert recorder.steps == [0, 2, 4]
+    recorder.close()
+    trajectory = np.load(str(tmp_path / 'run.npy'))
+    assert trajectory.shape == (3, 4, 6)
+    assert np.isclose(trajectory, np.stack([pose, pose + 2, pose + 4])).all() == True
+
+# 1_2
+def test_recorder_2(tmp_path):
+    # the file is preallocated, so a full recorder raises
+    recorder = ptj.Recorder(str(tmp_path / 'run.npy'), 2, (4, 6))
+    recorder.write(0, pose)
+    recorder.write(1, pose)
+    with pytest.raises(Exception):
+        recorder.write(2, pose)
+    recorder.close()
+    with pytest.raises(Exception):
+        recorder.write(3, pose)
+
+# 1_3
+def test_recorder_3(tmp_path):
+    with pytest.raises(Exception):
+        ptj.Recorder(str(tmp_path / 'run.npy'), 0, (4, 6))
+    with pytest.raises(Exception):
+        ptj.Recorder(str(tmp_path / 'run.npy'), 2, (4, 6), every = 0)
+
+# 2
+def test_load(tmp_path):
+    recorder = ptj.Recorder(str(tmp_path / 'run.npy'), 10, (4, 6), dtype = np.float32)
+    recorder.write(0, pose)
+    recorder.close()
+    trajectory = ptj.load(str(tmp_path / 'run.npy'), recorder.frames)
+    assert isinstance(trajectory, np.memmap)
+    assert trajectory.shape == (1, 4, 6)
+    assert trajectory.flags.writeable == False
+    assert np.isclose(trajectory[0], pose).all() == True
+
+rng = np.random.default_rng(0)
+trajectory = np.cumsum(rng.normal(0.0, 0.5, size=(50, 4, 6)), axis=0)
+
+# 3_1
+def test_archive_1(tmp_path):
+    # quantized frames are within precision / 2, in both codecs
+    for compression in ['zlib', 'lzma']:
+        archive = ptj.Archive(str(tmp_path / 'run.arc'), (4, 6), chunk_size = 8,
+                              precision = 1e-3, compression = compression)
+        for step in range(50):
+            archive.write(step, trajectory[step])
+        archive.close()
+        with ptj.ArchiveReader(str(tmp_path / 'run.arc')) as reader:
+            assert len(reader) == 50
+            assert (np.abs(np.stack(list(reader)) - trajectory) <= 0.5e-3 + 1e-9).all() == True
+            assert (reader.steps == np.arange(50)).all() == True
+
+# 3_2
+def test_archive_2(tmp_path):
+    # without precision the frames are exact, and every k-th step is kept
+    archive = ptj.Archive(str(tmp_path / 'run.arc'), (4, 6), chunk_size = 4, precision = None, every = 3)
+    for step in range(50):
+        archive.write(step, trajectory[step])
+    archive.close()
+    with ptj.ArchiveReader(str(tmp_path / 'run.arc')) as reader:
+        assert len(reader) == 17
+        assert (reader.steps == np.arange(0, 50, 3)).all() == True
+        assert (reader[5] == trajectory[15]).all() == True
+        assert (reader[-1] == trajectory[48]).all() == True
+
+# 3_3
+def test_archive_3(tmp_path):
+    with pytest.raises(Exception):
+        ptj.Archive(str(tmp_path / 'run.arc'), (4, 6), chunk_size = 0)
+    with pytest.raises(Exception):
+        ptj.Archive(str(tmp_path / 'run.arc'), (4, 6), precision = 0.0)
+    with pytest.raises(Exception):
+        ptj.Archive(str(tmp_path / 'run.arc'), (4, 6), compression = 'bz2')
+
+# 4_1
+def test_archive_reader_1(tmp_path):
+    # random access to any frame, out of range frames raise
+    archive = ptj.Archive(str(tmp_path / 'run.arc'), (4, 6), chunk_size = 8, precision = None)
+    for step in range(50):
+        archive.write(step, trajectory[step])
+    archive.close()
+    with ptj.ArchiveReader(str(tmp_path / 'run.arc')) as reader:
+        for t in [49, 0, 17, 16, 23]:
+            assert (reader[t] == trajectory[t]).all() == True
+        with pytest.raises(IndexError):
+            reader[50]
+    np.save(str(tmp_path / 'run.npy'), trajectory)
+    with pytest.raises(Exception):
+        ptj.ArchiveReader(str(tmp_path / 'run.npy'))
+
+# 4_2
+def test_archive_reader_2(tmp_path):
+    # the complete chunks of an archive that was not closed can be read
+    archive = ptj.Archive(str(tmp_path / 'run.arc'), (4, 6), chunk_size = 8, precision = None)
+    for step in range(20):
+        archive.write(step, trajectory[step])
+    archive._file.flush()
+    with ptj.ArchiveReader(str(tmp_path / 'run.arc')) as reader:
+        assert len(reader) == 16
+        assert (reader[15] == trajectory[15]).all() == True
+    archive.close()
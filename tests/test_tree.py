@@ -0,0 +1,84 @@
+import pytest
+import pyswarming.batched as pbt
+import pyswarming.tree as ptr
+import numpy as np
+
+'''
+    #   Tested      Algorithm
+
+    1   yes         Tree (1_1 and 1_2)
+    2   yes         repulsion (2_1 and 2_2)
+    3   yes         perimeter_defense
+    4   yes         force_law
+    5   yes         inverse_power
+'''
+
+rng = np.random.default_rng(0)
+r = rng.uniform(-20.0, 20.0, size=(400, 3))
+
+# 1_1
+def test_tree_1():
+    # octree in 3D, quadtree in 2D
+    tree = ptr.Tree(r, leaf_size=8)
+    assert tree.n == 400
+    assert tree.n_dim == 3
+    assert (tree.levels[-1]['count'] <= 8).all() == True
+    r_2d = r.copy()
+    r_2d[:, 2] = 0.0
+    assert ptr.Tree(r_2d).n_dim == 2
+
+# 1_2
+def test_tree_2():
+    # the weights must be nonnegative
+    with pytest.raises(Exception):
+        ptr.Tree(r).field([(1.0, 2.0)], weights=-np.ones(400))
+
+# 2_1
+def test_repulsion_1():
+    # theta = 0 opens every cell, i.e. the exact result
+    g = ptr.repulsion(r, 3.0, 2, theta=0.0)
+    assert g.shape == (400, 3)
+    assert np.isclose(g, pbt.repulsion(r, 3.0, 2)).all() == True
+
+# 2_2
+def test_repulsion_2():
+    # the error decreases with the opening angle
+    tree = ptr.Tree(r)
+    g, error_1 = ptr.repulsion(r, 3.0, 3, theta=0.6, tree=tree, compare=True)
+    g, error_2 = ptr.repulsion(r, 3.0, 3, theta=0.2, tree=tree, compare=True)
+    assert error_1.shape == (400,)
+    assert np.max(error_2) < np.max(error_1)
+    assert np.max(error_2) < 1e-2
+
+# 3
+def test_perimeter_defense():
+    g = ptr.perimeter_defense(r, theta=0.0)
+    assert np.isclose(g, pbt.perimeter_defense(r)).all() == True
+    g, error = ptr.perimeter_defense(r, theta=0.3, compare=True)
+    assert np.max(error) < 1e-2
+
+# 4
+def test_force_law():
+    # heterogeneous masses
+    m = rng.uniform(1.0, 5.0, size=400)
+    f = ptr.force_law(r, 10.0, m, 2.0, theta=0.0)
+    assert f.shape == (400, 3)
+    assert np.isclose(f, pbt.force_law(r, 10.0, m, 2.0)).all() == True
+    f, error = ptr.force_law(r, 10.0, m, 2.0, theta=0.3, compare=True)
+    assert np.max(error) < 1e-2
+
+# 5
+def test_inverse_power():
+    # the pairwise law, without the accumulation in index order
+    c_w = np.asarray([1.0, -1.0])
+    sigma_w = np.asarray([1.0, 2.0])
+    f_expected = np.zeros((len(r), 3))
+    for r_ind in range(len(r)):
+        r_ij = np.delete(r, np.array([r_ind]), axis=0) - r[r_ind]
+        norm_r_ij = np.linalg.norm(r_ij, axis=1)
+        f_0 = c_w[0] / norm_r_ij**sigma_w[0] + c_w[1] / norm_r_ij**sigma_w[1]
+        f_expected[r_ind] = np.sum((f_0 / norm_r_ij)[:, np.newaxis] * r_ij, axis=0)
+    f = ptr.inverse_power(r, c_w, sigma_w, theta=0.0)
+    assert np.isclose(f, f_expected).all() == True
+    f, error = ptr.inverse_power(r, c_w, sigma_w, theta=0.3, compare=True)
+    assert np.max(error) < 5e-2